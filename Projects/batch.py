@@ -0,0 +1,244 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Batch processing of many sessions : the dataset of each session (build_dataset) is computed in a
+# process pool and saved in its own file, finished sessions are skipped when the batch is run again,
+# and all the sessions are gathered in one dataset for cross-subject training
+#   python batch.py <sessions directory or manifest> <output directory> --n-jobs 4
+#####################################################################################################
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from pipeline import build_dataset
+from profiling import max_rss_mb
+
+
+"""--------------------------------------------------------------------------------------------------
+SESSIONS OF A DIRECTORY
+Every folder (at any depth) that contains the EEG file and the target file is a session, named by its
+path relative to the directory (e.g. "S01/run2", saved as S01/run2.npz in the output folder), its
+subject being the first folder.
+INPUTS:
+    - directory : root folder of the sessions
+    - eeg_name : name of the EEG csv file of a session
+    - target_name : name of the target csv file of a session
+OUTPUT:
+    - list of dictionaries with name, subject, eeg and target (paths), sorted by name
+--------------------------------------------------------------------------------------------------"""
+def find_sessions(directory, eeg_name="EEG_data.csv", target_name="target.csv"):
+    directory = Path(directory)
+    sessions  = []
+    for eeg_path in sorted(directory.rglob(eeg_name)):
+        folder = eeg_path.parent
+        if not (folder / target_name).exists():
+            continue
+        parts = folder.relative_to(directory).parts or (folder.name,)
+        sessions.append({"name": "/".join(parts), "subject": parts[0],
+                         "eeg": str(eeg_path), "target": str(folder / target_name)})
+    return sessions
+
+
+"""--------------------------------------------------------------------------------------------------
+SESSIONS OF A MANIFEST
+A csv file with the columns name, eeg, target (and optionally subject), or a json list of objects
+with the same keys. Relative paths are relative to the manifest.
+INPUTS:
+    - manifest_path : path of the manifest
+OUTPUT:
+    - list of dictionaries with name, subject, eeg and target
+--------------------------------------------------------------------------------------------------"""
+def read_manifest(manifest_path):
+    manifest_path = Path(manifest_path)
+    with open(manifest_path, newline="") as f:
+        rows = json.load(f) if manifest_path.suffix == ".json" else list(csv.DictReader(f))
+
+    sessions = []
+    for row in rows:
+        missing = {"name", "eeg", "target"} - set(row)
+        if missing:
+            raise KeyError("manifest entry {} has no {}".format(row, ", ".join(sorted(missing))))
+        sessions.append({"name": row["name"], "subject": row.get("subject") or row["name"],
+                         "eeg": str(manifest_path.parent / row["eeg"]),
+                         "target": str(manifest_path.parent / row["target"])})
+    names = [session["name"] for session in sessions]
+    if len(set(names)) != len(names):
+        raise ValueError("the names of the sessions of {} are not unique".format(manifest_path))
+    return sessions
+
+
+"""--------------------------------------------------------------------------------------------------
+RUN THE PIPELINE ON ALL THE SESSIONS
+The features of a session are saved in <output_dir>/<name>.npz (X, y, features_name) with its report
+in <name>.json (a "/" in the name is a subfolder, so two sessions never share a file), both written
+at the end of the session : a session whose files exist and were made with the same params is
+finished and is skipped (unless force), so an interrupted batch is resumed by running it again.
+INPUTS:
+    - sessions : output of find_sessions or read_manifest
+    - output_dir : folder of the feature files
+    - n_jobs : number of worker processes (-1 for all cores)
+    - force : True to run the finished sessions again
+    - verbose : True to print each session when it is done
+    - params : parameters of pipeline.build_dataset (e.g. chunk_size=2**16, compact=True)
+OUTPUT:
+    - dictionary with the reports of the sessions (name, status "done", "skipped" or "failed",
+      n_segments, time, pid and max_rss_mb of the worker, error), the number of sessions run, the
+      total time, the throughput in sessions per hour and the max RSS of each worker
+--------------------------------------------------------------------------------------------------"""
+def run_sessions(sessions, output_dir, n_jobs=-1, force=False, verbose=True, **params):
+    output_dir = Path(output_dir)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    reports, todo = [], []
+    for session in sessions:
+        if not force and _is_finished(output_dir, session["name"], params):
+            reports.append({"name": session["name"], "status": "skipped"})
+        else:
+            todo.append(session)
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    start  = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(min(n_jobs, len(todo))) as pool:
+            futures = [pool.submit(_run_session, session, str(output_dir), params) for session in todo]
+            for i, future in enumerate(as_completed(futures)):
+                report = future.result()
+                reports.append(report)
+                if verbose:
+                    detail = "({:.1f} s, {} segments)".format(report["time"], report["n_segments"]) \
+                             if report["status"] == "done" else report.get("error", "")
+                    print("[{}/{}] {} {} {}".format(i + 1, len(todo), report["name"], report["status"],
+                                                    detail))
+    elapsed = time.perf_counter() - start
+
+    workers = {}
+    for report in reports:
+        if "pid" in report and report["max_rss_mb"] is not None:
+            workers[report["pid"]] = max(workers.get(report["pid"], 0), report["max_rss_mb"])
+    n_run  = sum(report["status"] != "skipped" for report in reports)
+    n_done = sum(report["status"] == "done" for report in reports)
+    return {"sessions": sorted(reports, key=lambda r: r["name"]), "n_run": n_run, "time": elapsed,
+            "sessions_per_hour": 3600 * n_done / elapsed if elapsed > 0 else 0.0,
+            "worker_max_rss_mb": workers}
+
+
+"""--------------------------------------------------------------------------------------------------
+AGGREGATED DATASET OF ALL THE SESSIONS
+INPUTS:
+    - sessions : output of find_sessions or read_manifest
+    - output_dir : folder of the feature files (output_dir of run_sessions)
+    - path : path of the aggregated npz file (not saved if None)
+OUTPUT:
+    - X : feature matrix of all the segments of all the finished sessions
+    - y : target of each segment
+    - groups : dictionary with the session and the subject of each segment (for a GroupKFold
+               across subjects)
+    - features_name : name of each column of X
+--------------------------------------------------------------------------------------------------"""
+def aggregate(sessions, output_dir, path=None):
+    X, y, session_of, subject_of, features_name = [], [], [], [], None
+    for session in sessions:
+        file_path = Path(output_dir) / (session["name"] + ".npz")
+        if not file_path.exists():
+            continue
+        with np.load(file_path) as data:
+            names = list(data["features_name"])
+            if features_name is not None and names != features_name:
+                raise ValueError("the features of {} are not the ones of the other sessions".format(
+                    session["name"]))
+            features_name = names
+            X.append(data["X"])
+            y.append(data["y"])
+        session_of.append(np.full(len(X[-1]), session["name"]))
+        subject_of.append(np.full(len(X[-1]), session["subject"]))
+    if not X:
+        raise ValueError("no finished session in {}".format(output_dir))
+
+    X, y = np.concatenate(X), np.concatenate(y)
+    groups = {"session": np.concatenate(session_of), "subject": np.concatenate(subject_of)}
+    if path is not None:
+        np.savez(path, X=X, y=y, session=groups["session"], subject=groups["subject"],
+                 features_name=np.array(features_name))
+    return X, y, groups, features_name
+
+
+def _is_finished(output_dir, name, params):
+    if not (output_dir / (name + ".npz")).exists() or not (output_dir / (name + ".json")).exists():
+        return False
+    with open(output_dir / (name + ".json")) as f:
+        return json.load(f).get("params") == json.loads(json.dumps(params))
+
+
+# One session in a worker, the files are written under a temporary name and renamed when complete
+def _run_session(session, output_dir, params):
+    start  = time.perf_counter()
+    report = {"name": session["name"], "subject": session["subject"], "pid": os.getpid(), "params": params}
+    try:
+        X, y, features_name = build_dataset(session["eeg"], session["target"], **params)
+        report.update({"status": "done", "n_segments": int(len(X)), "n_features": int(X.shape[1])})
+        base = os.path.join(output_dir, session["name"])
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        with open(base + ".tmp.npz", "wb") as f:
+            np.savez(f, X=X, y=y, features_name=np.array(features_name))
+        os.replace(base + ".tmp.npz", base + ".npz")
+    except Exception as error:
+        report.update({"status": "failed", "error": "{}: {}".format(type(error).__name__, error),
+                       "traceback": traceback.format_exc()})
+    report["time"]       = time.perf_counter() - start
+    report["max_rss_mb"] = max_rss_mb()
+    if report["status"] == "done":
+        with open(os.path.join(output_dir, session["name"] + ".tmp.json"), "w") as f:
+            json.dump(report, f, indent=1)
+        os.replace(os.path.join(output_dir, session["name"] + ".tmp.json"),
+                   os.path.join(output_dir, session["name"] + ".json"))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Features of many EEG sessions")
+    parser.add_argument("sessions", help="directory of the sessions or manifest (.csv or .json)")
+    parser.add_argument("output", help="directory of the feature files")
+    parser.add_argument("--n-jobs", type=int, default=-1,
+                        help="number of worker processes (default : all cores)")
+    parser.add_argument("--eeg-name", default="EEG_data.csv")
+    parser.add_argument("--target-name", default="target.csv")
+    parser.add_argument("--chunk-size", type=int, help="out-of-core processing with chunks of this size")
+    parser.add_argument("--compact", action="store_true", help="float32 signals and int8 labels")
+    parser.add_argument("--force", action="store_true", help="run the finished sessions again")
+    parser.add_argument("--aggregate", default="dataset.npz", help="name of the aggregated dataset in output")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.sessions):
+        sessions = find_sessions(args.sessions, args.eeg_name, args.target_name)
+    else:
+        sessions = read_manifest(args.sessions)
+    print("{} sessions".format(len(sessions)))
+
+    summary = run_sessions(sessions, args.output, args.n_jobs, args.force,
+                           chunk_size=args.chunk_size, compact=args.compact)
+    print("{} sessions run in {:.1f} s ({:.1f} sessions/hour)".format(summary["n_run"], summary["time"],
+                                                                      summary["sessions_per_hour"]))
+    for pid, rss in sorted(summary["worker_max_rss_mb"].items()):
+        print("worker {} : max RSS {:.0f} MB".format(pid, rss))
+
+    failed = [report for report in summary["sessions"] if report["status"] == "failed"]
+    for report in failed:
+        print("FAILED {} : {}".format(report["name"], report["error"]))
+
+    if any(report["status"] != "failed" for report in summary["sessions"]):
+        X, y, _, _ = aggregate(sessions, args.output, os.path.join(args.output, args.aggregate))
+        print("aggregated dataset : {} segments x {} features".format(*X.shape))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Compact mode of the pipeline : float32 signals, int8 labels with a bitmask of the valid samples
+# instead of a float64 target with NaN, time vector computed from the frequence of acquisition (the
+# effect on the features and the accuracy is measured by evaluation.precision_report)
+#####################################################################################################
+
+import numpy as np
+
+from segmentation import nan_mask
+
+
+"""--------------------------------------------------------------------------------------------------
+TARGET AS INT8 LABELS AND A BITMASK OF THE VALID SAMPLES
+1 byte + 1 bit per sample instead of 8 bytes for a float64 target with NaN.
+ATTRIBUTES:
+    - labels : int8 vector of [m] length (0 where the target is unknown)
+    - valid_bits : np.packbits of the valid samples
+    - n_samples : m
+--------------------------------------------------------------------------------------------------"""
+class CompactTarget:
+
+    def __init__(self, labels, valid_bits, n_samples):
+        self.labels     = labels
+        self.valid_bits = valid_bits
+        self.n_samples  = n_samples
+
+    # From a float target with NaN (target.csv)
+    @classmethod
+    def from_float(cls, target):
+        target = np.asarray(target)
+        valid  = nan_mask(target)
+        labels = np.zeros(len(target), dtype=np.int8)
+        labels[valid] = target[valid]
+        if not np.array_equal(labels[valid], target[valid]):
+            raise ValueError("the target has values that are not integers in [-128, 127]")
+        return cls(labels, np.packbits(valid), len(target))
+
+    def __len__(self):
+        return self.n_samples
+
+    @property
+    def nbytes(self):
+        return self.labels.nbytes + self.valid_bits.nbytes
+
+    # Boolean vector of [m] length, False where the target is unknown
+    def valid(self):
+        return np.unpackbits(self.valid_bits, count=self.n_samples).view(bool)
+
+    # Float target with NaN where it is unknown, like target.csv
+    def to_float(self):
+        target = self.labels.astype(np.float64)
+        target[~self.valid()] = np.nan
+        return target
+
+
+"""--------------------------------------------------------------------------------------------------
+VALID SAMPLES AND THEIR LABELS, FOR A FLOAT TARGET WITH NaN OR A CompactTarget
+INPUTS:
+    - target : vector of [m] length or CompactTarget
+OUTPUT:
+    - valid : boolean vector of [m] length
+    - labels : target of the valid samples (target_numpy_deleted in the notebook)
+--------------------------------------------------------------------------------------------------"""
+def target_parts(target):
+    if isinstance(target, CompactTarget):
+        valid = target.valid()
+        return valid, target.labels[valid]
+    target = np.asarray(target)
+    valid  = nan_mask(target)
+    return valid, target[valid]
+
+
+"""--------------------------------------------------------------------------------------------------
+TIME VECTOR COMPUTED FROM THE FREQUENCE OF ACQUISITION
+Used like the time vector of the notebooks (time[i], time[start:stop], len(time), np.asarray(time))
+without storing the m values.
+INPUTS:
+    - n_samples : m
+    - freq_acquisition : frequence of acquisition
+    - start : time of the first sample in seconds
+--------------------------------------------------------------------------------------------------"""
+class TimeAxis:
+
+    def __init__(self, n_samples, freq_acquisition=1000, start=0.0):
+        self.n_samples        = n_samples
+        self.freq_acquisition = freq_acquisition
+        self.start            = start
+
+    def __len__(self):
+        return self.n_samples
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.start + np.arange(*index.indices(self.n_samples)) / self.freq_acquisition
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        index = np.where(index < 0, index + self.n_samples, index)
+        if np.any((index < 0) | (index >= self.n_samples)):
+            raise IndexError("index out of range for a time axis of {} samples".format(self.n_samples))
+        value = self.start + index / self.freq_acquisition
+        return float(value) if value.ndim == 0 else value
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:].astype(dtype) if dtype is not None else self[:]
@@ -0,0 +1,220 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Binary EEG store : the CSV recording is converted once into a channel-major binary file and
+# opened afterwards with np.memmap (no text parsing, no extra copy in memory)
+#####################################################################################################
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compact import TimeAxis
+from profiling import profiled
+
+# File layout : MAGIC | header length (uint32, little endian) | JSON header | padding | data
+# The data block is a C-ordered [n_channels x n_samples] matrix, so one channel is contiguous.
+STORE_MAGIC   = b"LGBIOEEG"
+STORE_VERSION = 1
+DATA_ALIGN    = 64
+
+
+"""--------------------------------------------------------------------------------------------------
+CONVERT A CSV RECORDING INTO A BINARY STORE
+INPUTS:
+    - csv_path : path of the csv file, one row per sample and one column per channel
+                 (first row is the header, like ../../Data/EEG_data.csv)
+    - store_path : path of the binary file to create
+    - freq_acquisition : frequence of acquisition
+    - ch_names : list of n strings with channel names (header of the csv if None)
+    - dtype : dtype of the stored samples
+    - chunksize : number of csv rows parsed at once (bounds the memory used by the conversion)
+OUTPUT:
+    - the opened EEGStore
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def csv_to_store(csv_path, store_path, freq_acquisition, ch_names=None, dtype="float64", chunksize=65536):
+    dtype     = np.dtype(dtype)
+    n_samples = _count_csv_rows(csv_path)
+
+    if ch_names is None:
+        ch_names = [str(name) for name in pd.read_csv(csv_path, nrows=0).columns]
+    n_channels = len(ch_names)
+
+    header = {
+        "version"          : STORE_VERSION,
+        "ch_names"         : list(ch_names),
+        "freq_acquisition" : freq_acquisition,
+        "dtype"            : dtype.str,
+        "shape"            : [n_channels, n_samples],
+    }
+    if not os.path.exists(Path(store_path).parent):
+        os.makedirs(Path(store_path).parent)
+    tmp    = Path(store_path).with_name(Path(store_path).name + ".tmp")
+    offset = _write_header(tmp, header)
+    try:
+        data = np.memmap(tmp, dtype=dtype, mode="r+", offset=offset, shape=(n_channels, n_samples))
+        pos  = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            values = chunk.to_numpy(dtype=dtype)
+            if values.shape[1] != n_channels:
+                raise ValueError("csv has {} columns but {} channel names were given".format(values.shape[1], n_channels))
+            data[:, pos:pos + len(values)] = values.T
+            pos += len(values)
+        data.flush()
+        del data
+
+        if pos != n_samples:
+            raise ValueError("csv has {} data rows, expected {}".format(pos, n_samples))
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, store_path)                     # never leave a partial store under a valid name
+    return EEGStore(store_path)
+
+
+"""--------------------------------------------------------------------------------------------------
+OPEN THE BINARY STORE OF A CSV RECORDING, CONVERTING IT FIRST IF NEEDED
+The store is (re)built when it does not exist or when the csv file is more recent.
+INPUTS:
+    - csv_path : path of the csv file
+    - store_path : path of the binary file (csv_path with the .eeg extension if None, .float32.eeg
+                   for a float32 store...)
+    - freq_acquisition : frequence of acquisition
+    - ch_names : list of n strings with channel names (header of the csv if None)
+    - dtype : dtype of the stored samples ("float32" halves the size of the store)
+OUTPUT:
+    - the opened EEGStore
+--------------------------------------------------------------------------------------------------"""
+def load_eeg(csv_path, store_path=None, freq_acquisition=1000, ch_names=None, dtype="float64"):
+    dtype = np.dtype(dtype)
+    if store_path is None:
+        suffix     = ".eeg" if dtype == np.float64 else ".{}.eeg".format(dtype.name)
+        store_path = Path(csv_path).with_suffix(suffix)
+    if not os.path.exists(store_path) or os.path.getmtime(store_path) < os.path.getmtime(csv_path) \
+            or np.dtype(_read_header(store_path)[0]["dtype"]) != dtype:
+        return csv_to_store(csv_path, store_path, freq_acquisition, ch_names, dtype)
+    return EEGStore(store_path)
+
+
+"""--------------------------------------------------------------------------------------------------
+EEG RECORDING BACKED BY A MEMORY-MAPPED BINARY STORE
+ATTRIBUTES:
+    - data : np.memmap of [nxm] dimensions where n (nb of channels) << m
+    - ch_names : list of n strings with channel names
+    - freq_acquisition : frequence of acquisition
+Opening the store only reads the header, samples are loaded from disk when they are accessed.
+--------------------------------------------------------------------------------------------------"""
+class EEGStore:
+
+    def __init__(self, store_path, mode="r"):
+        header, offset        = _read_header(store_path)
+        self.path             = Path(store_path)
+        self.ch_names         = header["ch_names"]
+        self.freq_acquisition = header["freq_acquisition"]
+        self.dtype            = np.dtype(header["dtype"])
+        self.data             = np.memmap(store_path, dtype=self.dtype, mode=mode, offset=offset,
+                                          shape=tuple(header["shape"]))
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def n_samples(self):
+        return self.data.shape[1]
+
+    # Indexes of the channels (names or integers) in the store
+    def channel_index(self, channels):
+        index = []
+        for ch in channels:
+            if isinstance(ch, str):
+                if ch not in self.ch_names:
+                    raise KeyError("unknown channel {}".format(ch))
+                index.append(self.ch_names.index(ch))
+            else:
+                index.append(int(ch))
+        return index
+
+    # Samples of the channels (all if None) between start and stop (indexes of samples).
+    # The result is a view on the file whenever the channels are evenly spaced (a single channel,
+    # a contiguous block, all channels...), otherwise the selected rows are copied in memory.
+    # Use rows() to get one view per channel without any copy.
+    def get(self, channels=None, start=None, stop=None):
+        samples = slice(start, stop)
+        if channels is None:
+            return self.data[:, samples]
+        index = self.channel_index(channels)
+        rows  = _as_slice(index)
+        if rows is not None:
+            return self.data[rows, samples]
+        return self.data[index, samples]
+
+    # List of views (one per channel) between start and stop, never copies the samples
+    def rows(self, channels=None, start=None, stop=None):
+        if channels is None:
+            channels = range(len(self.ch_names))
+        return [self.data[i, start:stop] for i in self.channel_index(channels)]
+
+    # Time vector (in seconds) of the samples between start and stop, computed from the frequence of
+    # acquisition when it is indexed (TimeAxis, np.asarray for the values)
+    def time(self, start=None, stop=None):
+        start, stop, _ = slice(start, stop).indices(self.n_samples)
+        return TimeAxis(max(stop - start, 0), self.freq_acquisition, start / self.freq_acquisition)
+
+
+# Number of data rows of a csv file (the header is not counted)
+def _count_csv_rows(csv_path, block_size=1 << 22):
+    n_lines = 0
+    last    = b"\n"
+    with open(csv_path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            n_lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        n_lines += 1
+    return n_lines - 1
+
+
+def _write_header(store_path, header):
+    text   = json.dumps(header).encode("utf-8")
+    offset = len(STORE_MAGIC) + 4 + len(text)
+    offset = -(-offset // DATA_ALIGN) * DATA_ALIGN
+    n_channels, n_samples = header["shape"]
+    with open(store_path, "wb") as f:
+        f.write(STORE_MAGIC)
+        f.write(np.uint32(len(text)).astype("<u4").tobytes())
+        f.write(text)
+        f.write(b"\0" * (offset - f.tell()))
+        f.truncate(offset + n_channels * n_samples * np.dtype(header["dtype"]).itemsize)
+    return offset
+
+
+def _read_header(store_path):
+    with open(store_path, "rb") as f:
+        if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+            raise ValueError("{} is not an EEG store".format(store_path))
+        length = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+        header = json.loads(f.read(length).decode("utf-8"))
+    if header["version"] > STORE_VERSION:
+        raise ValueError("EEG store version {} is not supported".format(header["version"]))
+    offset = len(STORE_MAGIC) + 4 + length
+    offset = -(-offset // DATA_ALIGN) * DATA_ALIGN
+    return header, offset
+
+
+# Slice equivalent to a list of evenly spaced indexes (None if there is none)
+def _as_slice(index):
+    if len(index) == 0:
+        return None
+    if len(index) == 1:
+        return slice(index[0], index[0] + 1)
+    step = index[1] - index[0]
+    if step <= 0 or any(b - a != step for a, b in zip(index, index[1:])):
+        return None
+    return slice(index[0], index[-1] + 1, step)
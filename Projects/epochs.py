@@ -0,0 +1,162 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Epochs locked on the changes of the target : the changes are found in one pass, the window of
+# every change is a view of the signals (stride tricks) gathered in a (events x channels x samples)
+# tensor, and the average, the variance and the cross-correlation delay between the EEG and the target
+# are computed on it (delay_plot draws one figure per change, here the delays are measured)
+#####################################################################################################
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft as sp_fft
+
+from compact import CompactTarget
+from segmentation import nan_mask
+
+
+"""--------------------------------------------------------------------------------------------------
+CHANGES OF THE TARGET
+A change is at i when target[i] and target[i+1] are both known and different (same test as
+delay_plot).
+INPUTS:
+    - target : vector of [m] length (NaN where unknown) or CompactTarget
+OUTPUT:
+    - events : indexes i of the changes
+    - before : label at i
+    - after : label at i+1
+--------------------------------------------------------------------------------------------------"""
+def find_transitions(target):
+    if isinstance(target, CompactTarget):
+        valid, labels = target.valid(), target.labels
+    else:
+        labels = np.asarray(target)
+        valid  = nan_mask(labels)
+    events = np.flatnonzero(valid[:-1] & valid[1:] & (labels[:-1] != labels[1:]))
+    return events, labels[events], labels[events + 1]
+
+
+"""--------------------------------------------------------------------------------------------------
+EPOCHS OF THE SIGNALS AROUND EVENTS
+The epoch of the event i is signals[:, i-before:i+after] (delay_plot plots [i-6000:i+6000]), the
+events too close to the ends of the recording are left out.
+INPUTS:
+    - signals : a matrix of [nxm] dimensions or a vector of [m] length
+    - events : indexes of the events
+    - before : number of samples before the event
+    - after : number of samples from the event
+OUTPUT:
+    - epochs : array of [(nb of events) x n x (before+after)] dimensions ([(nb of events) x
+               (before+after)] for a vector)
+    - kept : events of the epochs
+--------------------------------------------------------------------------------------------------"""
+def extract_epochs(signals, events, before=6000, after=6000):
+    signals = np.asarray(signals)
+    events  = np.asarray(events)
+    kept    = events[(events >= before) & (events + after <= signals.shape[-1])]
+    windows = sliding_window_view(signals, before + after, axis=-1)          # (..., m-w+1, w)
+    return np.moveaxis(windows, -2, 0)[kept - before], kept                # (events, ..., w)
+
+
+"""--------------------------------------------------------------------------------------------------
+AVERAGE AND VARIANCE OF THE EPOCHS
+The epochs are gathered batch_size events at a time, so long windows of many events never have to
+be in memory at once.
+INPUTS:
+    - signals : a matrix of [nxm] dimensions
+    - events : indexes of the events
+    - before, after : window of the epochs (see extract_epochs)
+    - batch_size : number of events gathered at once
+OUTPUT:
+    - mean : matrix of [n x (before+after)] dimensions (event-locked average)
+    - var : matrix of [n x (before+after)] dimensions (unbiased variance over the events)
+    - kept : events used
+--------------------------------------------------------------------------------------------------"""
+def epoch_statistics(signals, events, before=6000, after=6000, batch_size=64):
+    signals = np.asarray(signals)
+    kept    = np.asarray(events)
+    kept    = kept[(kept >= before) & (kept + after <= signals.shape[-1])]
+    count, mean, m2 = 0, np.zeros(signals.shape[:-1] + (before + after,)), np.zeros(signals.shape[:-1] + (before + after,))
+    for start in range(0, len(kept), batch_size):
+        epochs, _ = extract_epochs(signals, kept[start:start + batch_size], before, after)
+        epochs    = epochs.astype(np.float64)
+        n, batch_mean = len(epochs), epochs.mean(axis=0)
+        delta = batch_mean - mean
+        total = count + n
+        m2    = m2 + ((epochs - batch_mean) ** 2).sum(axis=0) + delta ** 2 * count * n / total
+        mean  = mean + delta * n / total
+        count = total
+    var = m2 / (count - 1) if count > 1 else np.full_like(m2, np.nan)
+    return mean, var, kept
+
+
+"""--------------------------------------------------------------------------------------------------
+DELAY BY CROSS-CORRELATION
+Normalized cross-correlation (FFT, all epochs and channels at once) of each epoch with its reference,
+the delay is the lag of the largest |correlation|. A positive delay means that the epoch follows the
+reference.
+INPUTS:
+    - epochs : array of [(nb of events) x n x w] dimensions (or [n x w] for one event)
+    - reference : array of [(nb of events) x w] dimensions (e.g. epochs of the target) or vector of
+                  [w] length (same reference for every event)
+    - max_lag : largest lag tested (in samples)
+    - fs : frequence of acquisition (the delays are in ms), None for delays in samples
+OUTPUT:
+    - delays : array of [(nb of events) x n] dimensions
+    - peaks : correlation at the delay (between -1 and 1)
+--------------------------------------------------------------------------------------------------"""
+def xcorr_delay(epochs, reference, max_lag=1000, fs=None):
+    epochs    = np.asarray(epochs, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    reference = reference[..., None, :] if reference.ndim == epochs.ndim - 1 else reference
+    width     = epochs.shape[-1]
+    max_lag   = min(max_lag, width - 1)
+
+    x = epochs - epochs.mean(axis=-1, keepdims=True)
+    r = reference - reference.mean(axis=-1, keepdims=True)
+    n = sp_fft.next_fast_len(width + max_lag)
+    corr = sp_fft.irfft(sp_fft.rfft(x, n, axis=-1) * np.conj(sp_fft.rfft(r, n, axis=-1)), n, axis=-1)
+    corr = np.concatenate((corr[..., n - max_lag:], corr[..., :max_lag + 1]), axis=-1)   # lags -max_lag..max_lag
+    norm = np.sqrt((x ** 2).sum(axis=-1) * (r ** 2).sum(axis=-1))
+    corr = np.divide(corr, norm[..., None], out=np.zeros_like(corr), where=norm[..., None] > 0)
+
+    best   = np.argmax(np.abs(corr), axis=-1)
+    peaks  = np.take_along_axis(corr, best[..., None], axis=-1)[..., 0]
+    delays = best - max_lag
+    return (delays * 1000 / fs if fs else delays), peaks
+
+
+"""--------------------------------------------------------------------------------------------------
+EEG-TARGET LAG OVER ALL THE CHANGES OF THE TARGET
+INPUTS:
+    - signals : a matrix of [nxm] dimensions
+    - target : vector of [m] length or CompactTarget
+    - fs : frequence of acquisition
+    - before, after : window of the epochs (see extract_epochs)
+    - max_lag : largest lag tested (in samples)
+    - batch_size : number of events processed at once
+OUTPUT:
+    - dictionary with events, from and to (labels of each kept change), mean and var of the epochs
+      ([n x (before+after)]), delays and peaks ([(nb of events) x n], ms), median_delay per channel
+--------------------------------------------------------------------------------------------------"""
+def transition_delays(signals, target, fs=1000, before=6000, after=6000, max_lag=1000, batch_size=64):
+    events, label_before, label_after = find_transitions(target)
+    target_values = target.to_float() if isinstance(target, CompactTarget) else np.asarray(target, dtype=np.float64)
+    mean, var, kept = epoch_statistics(signals, events, before, after, batch_size)
+    keep = np.isin(events, kept)
+
+    delays, peaks = [], []
+    for start in range(0, len(kept), batch_size):
+        epochs, _    = extract_epochs(signals, kept[start:start + batch_size], before, after)
+        reference, _ = extract_epochs(target_values, kept[start:start + batch_size], before, after)
+        # the target is NaN around some changes, these samples do not contribute
+        unknown = np.isnan(reference)
+        reference = np.where(unknown, np.nanmean(reference, axis=-1, keepdims=True), reference)
+        d, p = xcorr_delay(epochs, reference, max_lag, fs)
+        delays.append(d)
+        peaks.append(p)
+    n_channels = np.shape(signals)[0]
+    delays = np.concatenate(delays) if delays else np.empty((0, n_channels))
+    peaks  = np.concatenate(peaks) if peaks else np.empty((0, n_channels))
+    return {"events": kept, "from": label_before[keep], "to": label_after[keep], "mean": mean, "var": var,
+            "delays": delays, "peaks": peaks,
+            "median_delay": np.median(delays, axis=0) if len(delays) else np.full(n_channels, np.nan)}
@@ -0,0 +1,292 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Evaluation of the classifiers : K-fold cross-validation of all the hyperparameter candidates in a
+# process pool, the preprocessing (scaler, PCA, correlation-based feature dropping) is fitted inside
+# each fold and cached, and the precision report of the float32 compact mode
+#####################################################################################################
+
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from sklearn import preprocessing as sk_preprocessing
+from sklearn.base import clone
+from sklearn.decomposition import PCA
+from sklearn.model_selection import KFold, ParameterGrid
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from compact import CompactTarget, target_parts
+from features import LST_ONDE, band_power_features
+from profiling import profiled
+from segmentation import segment_starts
+
+
+"""--------------------------------------------------------------------------------------------------
+DROP THE FEATURES WEAKLY CORRELATED WITH THE TARGET (no_keep in the notebook)
+INPUTS:
+    - threshold : features with |corr(feature, target)| < threshold are removed
+--------------------------------------------------------------------------------------------------"""
+class CorrelationDrop:
+
+    def __init__(self, threshold=0.70):
+        self.threshold = threshold
+
+    def fit(self, X, y):
+        Xc   = X - X.mean(axis=0)
+        yc   = y - y.mean()
+        norm = np.sqrt((Xc ** 2).sum(axis=0) * (yc ** 2).sum())
+        corr = np.divide(Xc.T @ yc, norm, out=np.zeros(X.shape[1]), where=norm > 0)
+        self.keep_    = np.flatnonzero(np.abs(corr) >= self.threshold)
+        self.no_keep_ = np.flatnonzero(np.abs(corr) < self.threshold)
+        return self
+
+    def transform(self, X):
+        return X[:, self.keep_]
+
+
+# Preprocessing steps that can be used in a pipeline specification
+PREPROCESSING = {
+    "scaler"    : sk_preprocessing.StandardScaler,
+    "pca"       : PCA,
+    "corr_drop" : CorrelationDrop,
+}
+
+
+"""--------------------------------------------------------------------------------------------------
+K-FOLD SCORE OF A MODEL (drop-in replacement of Kfold_function of the notebooks)
+INPUTS:
+    - model : classifier (not fitted)
+    - X_set : matrix of [(nb of samples) x (nb of features)] dimensions
+    - Y_set : vector of [nb of samples] length
+    - K : number of folds (KFold without shuffling, like the notebooks)
+    - preprocessing : pipeline specification fitted on the training part of each fold, list of
+                      (name, params) with name in PREPROCESSING,
+                      e.g. [("scaler", {}), ("pca", {"n_components": 2})]
+    - n_jobs : number of processes (-1 for all cores)
+OUTPUT:
+    - mean of the scores over the folds
+--------------------------------------------------------------------------------------------------"""
+def Kfold_function(model, X_set, Y_set, K=10, preprocessing=(), n_jobs=1):
+    results = evaluate_models({"model": (model, {})}, X_set, Y_set, K, preprocessing, n_jobs)
+    return results[0]["mean_score"]
+
+
+"""--------------------------------------------------------------------------------------------------
+CROSS-VALIDATION OF SEVERAL MODELS AND THEIR HYPERPARAMETERS
+Every (candidate, fold) pair is an independent job of a process pool. X and y are copied once in
+shared memory and mapped by the workers (they are not pickled for every job). Each worker keeps the
+preprocessing fitted on a fold, keyed on (fold, specification), so it is fitted once per fold and
+not once per candidate : jobs are sent fold by fold to make the workers reuse it.
+INPUTS:
+    - models : dictionary name -> (estimator, param_grid) (same param_grid as GridSearchCV)
+    - X : matrix of [(nb of samples) x (nb of features)] dimensions
+    - y : vector of [nb of samples] length
+    - cv : number of folds (KFold without shuffling) or a splitter of sklearn.model_selection
+    - preprocessing : pipeline specification, see Kfold_function
+    - n_jobs : number of processes (-1 for all cores, 1 to run in the current process)
+OUTPUT:
+    - list of dictionaries (one per candidate, best first) with the name of the model, params,
+      fold_scores, mean_score, std_score, fit_time (mean time to fit the model on a fold),
+      preprocessing_time (mean time to fit the preprocessing, 0 when it came from the cache)
+      and candidate_time (total time of the candidate over all folds)
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def evaluate_models(models, X, y, cv=10, preprocessing=(), n_jobs=-1):
+    X = np.ascontiguousarray(X)
+    y = np.ascontiguousarray(y).ravel()
+    splitter   = KFold(n_splits=cv) if isinstance(cv, int) else cv
+    folds      = list(splitter.split(X, y))
+    candidates = [(name, estimator, params) for name, (estimator, grid) in models.items()
+                  for params in ParameterGrid(grid)]
+    jobs       = [(c, f) for f in range(len(folds)) for c in range(len(candidates))]
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if n_jobs == 1:
+        _init_worker(X, y, folds, candidates, preprocessing)
+        outputs = [_run_job(job) for job in jobs]
+    else:
+        blocks = [_to_shared(X), _to_shared(y)]
+        try:
+            specs = [(b.name, a.shape, a.dtype.str) for b, a in zip(blocks, (X, y))]
+            with ProcessPoolExecutor(n_jobs, initializer=_init_worker,
+                                     initargs=(specs[0], specs[1], folds, candidates, preprocessing)) as pool:
+                outputs = list(pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (4 * n_jobs))))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    results = []
+    for c, (name, _, params) in enumerate(candidates):
+        runs   = [out for job, out in zip(jobs, outputs) if job[0] == c]
+        scores = np.array([run[0] for run in runs])
+        results.append({
+            "model"              : name,
+            "params"             : params,
+            "fold_scores"        : scores,
+            "mean_score"         : scores.mean(),
+            "std_score"          : scores.std(),
+            "fit_time"           : np.mean([run[1] for run in runs]),
+            "preprocessing_time" : np.mean([run[2] for run in runs]),
+            "candidate_time"     : sum(run[1] + run[2] + run[3] for run in runs),
+        })
+    results.sort(key=lambda r: -r["mean_score"])
+    return results
+
+
+"""--------------------------------------------------------------------------------------------------
+PRINT THE RESULTS OF evaluate_models
+INPUTS:
+    - results : output of evaluate_models
+    - best_only : True to print only the best candidate of each model
+--------------------------------------------------------------------------------------------------"""
+def print_results(results, best_only=True):
+    seen = set()
+    for r in results:
+        if best_only and r["model"] in seen:
+            continue
+        seen.add(r["model"])
+        print("{:10s} score {:.2f} (+/- {:.2f})  fit {:7.3f} s  candidate {:7.3f} s  {}".format(
+            r["model"], r["mean_score"], r["std_score"], r["fit_time"], r["candidate_time"], r["params"]))
+
+
+"""--------------------------------------------------------------------------------------------------
+PRECISION REPORT : FLOAT32 COMPACT MODE AGAINST FLOAT64
+The dataset is built twice (float64 signals and float target, float32 signals and CompactTarget) and
+the difference of the filtered signals, of the features and of the K-fold accuracy is measured.
+INPUTS:
+    - signals : a matrix of [nxm] dimensions where n (nb of channels) << m
+    - target : vector of [m] length (with NaN)
+    - freq_acquisition : frequence of acquisition
+    - models : dictionary name -> classifier (SVC, KNN and a decision tree if None)
+    - cv : number of folds
+    - window, step, guard, bands : parameters of the segmentation and of the features
+OUTPUT:
+    - dictionary with the memory of the arrays (MB) in both modes, the relative error of the filtered
+      signals and of the features, same_segments (True when the segments and their labels are the
+      same) and, for each model, the accuracy in both modes
+--------------------------------------------------------------------------------------------------"""
+def precision_report(signals, target, freq_acquisition=1000, models=None, cv=10, window=500, step=100,
+                     guard=1500, bands=LST_ONDE):
+    if models is None:
+        models = {"SVC": SVC(), "KNN": KNeighborsClassifier(), "tree": DecisionTreeClassifier(random_state=0)}
+    from wavelet_filter import WaveletBandFilter                      # pywt only for this report
+
+    band_filter = WaveletBandFilter()
+    datasets    = {}
+    for name, dtype, labels in (("float64", np.float64, np.asarray(target, dtype=np.float64)),
+                                ("float32", np.float32, CompactTarget.from_float(target))):
+        raw          = np.asarray(signals, dtype=dtype)
+        filtered     = band_filter.filter(raw)
+        valid, kept  = target_parts(labels)
+        starts       = segment_starts(kept, window, step, guard)
+        X            = band_power_features(np.compress(valid, filtered, axis=1), freq_acquisition, window,
+                                           bands=bands, starts=starts)
+        memory = raw.nbytes + filtered.nbytes + labels.nbytes
+        if name == "float64":
+            memory += len(labels) * 8                                      # time vector of the notebook
+        datasets[name] = {"filtered": filtered, "starts": starts, "X": X, "y": kept[starts], "memory": memory}
+
+    full, compact = datasets["float64"], datasets["float32"]
+    report = {"memory_float64_mb": full["memory"] / 2 ** 20, "memory_float32_mb": compact["memory"] / 2 ** 20,
+              "filtered_error": _relative_error(compact["filtered"], full["filtered"]),
+              "same_segments": bool(np.array_equal(full["starts"], compact["starts"]) and
+                                    np.array_equal(full["y"], compact["y"]))}
+    error = np.abs(compact["X"] - full["X"]) / np.maximum(np.abs(full["X"]), np.finfo(np.float64).tiny)
+    report["features_max_error"]    = float(error.max()) if error.size else 0.0
+    report["features_median_error"] = float(np.median(error)) if error.size else 0.0
+
+    report["accuracy"] = {}
+    for name, model in models.items():
+        scores = [Kfold_function(model, datasets[mode]["X"], datasets[mode]["y"], cv, [("scaler", {})])
+                  for mode in ("float64", "float32")]
+        report["accuracy"][name] = {"float64": scores[0], "float32": scores[1], "difference": scores[1] - scores[0]}
+    return report
+
+
+def print_precision_report(report):
+    print("memory          : {:.1f} MB (float64) -> {:.1f} MB (float32)".format(
+        report["memory_float64_mb"], report["memory_float32_mb"]))
+    print("filtered signals: relative error {:.2e}".format(report["filtered_error"]))
+    print("features        : relative error max {:.2e}, median {:.2e}".format(
+        report["features_max_error"], report["features_median_error"]))
+    print("segments        : {}".format("same" if report["same_segments"] else "DIFFERENT"))
+    for name, scores in report["accuracy"].items():
+        print("{:16s}: accuracy {:.4f} (float64) {:.4f} (float32) difference {:+.4f}".format(
+            name, scores["float64"], scores["float32"], scores["difference"]))
+
+
+# Norm of the difference relative to the norm of the reference
+def _relative_error(value, reference):
+    norm = np.linalg.norm(reference)
+    return float(np.linalg.norm(value.astype(np.float64) - reference) / norm) if norm > 0 else 0.0
+
+
+# State of a worker : data mapped from shared memory and cache of the fitted preprocessing
+_WORKER      = {}
+_CACHE_SIZE  = 16
+
+
+def _to_shared(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block
+
+
+def _from_shared(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _init_worker(X, y, folds, candidates, preprocessing):
+    _WORKER.clear()
+    if isinstance(X, tuple):
+        (bx, X), (by, y) = _from_shared(X), _from_shared(y)
+        _WORKER["blocks"] = (bx, by)                   # keep the mappings alive
+    _WORKER.update(X=X, y=y, folds=folds, candidates=candidates,
+                   preprocessing=[(name, dict(params)) for name, params in preprocessing],
+                   cache=OrderedDict())
+
+
+# Fit of one candidate on one fold : (score, fit time, preprocessing time, score time)
+def _run_job(job):
+    c, f = job
+    name, estimator, params = _WORKER["candidates"][c]
+    X_train, X_test, y_train, y_test, prep_time = _fold_data(f)
+
+    start = time.perf_counter()
+    model = clone(estimator).set_params(**params)
+    model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score = model.score(X_test, y_test)
+    return score, fit_time, prep_time, time.perf_counter() - start
+
+
+# Training and test sets of a fold after the preprocessing (cached per worker)
+def _fold_data(f):
+    cache = _WORKER["cache"]
+    key   = (f, repr(_WORKER["preprocessing"]))
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key][:4] + (0.0,)
+
+    start = time.perf_counter()
+    X, y  = _WORKER["X"], _WORKER["y"]
+    train, test = _WORKER["folds"][f]
+    X_train, X_test = X[train], X[test]
+    for name, params in _WORKER["preprocessing"]:
+        step    = PREPROCESSING[name](**params).fit(X_train, y[train])
+        X_train = step.transform(X_train)
+        X_test  = step.transform(X_test)
+    cache[key] = (X_train, X_test, y[train], y[test], time.perf_counter() - start)
+    if len(cache) > _CACHE_SIZE:
+        cache.popitem(last=False)
+    return cache[key]
@@ -0,0 +1,297 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Batch export of the figures of make_graphs (eeg_target_plot, delay_plot, eeg32_freq_plot and
+# comparison_filtering_plot) : each worker builds one figure per kind of plot and only updates the
+# data of its lines for every file, lines much longer than the width of the figure are reduced to
+# their min/max envelope (see eeg_fast_plot), the spectra come from the cache of spectrum.py (the raw
+# channels of the "freq" and "comparison" jobs are transformed once per process), the jobs are spread
+# over a process pool and the files that are already up to date are skipped
+#####################################################################################################
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from epochs import find_transitions
+from make_graphs import envelope
+from spectrum import SPECTRA
+
+MANIFEST = ".export_manifest.json"
+
+
+"""--------------------------------------------------------------------------------------------------
+JOBS OF eeg_target_plot (one file per channel)
+INPUTS:
+    - eeg_signals : a matrix of [nxm] dimensions where n (nb of channels) << m
+    - target : vector of [m] length
+    - label : list of n strings with channel names
+    - time : vector of [m] length or compact.TimeAxis
+    - directory : folder of the figures
+    - window : [start,end] indexes of the plotted samples
+OUTPUT:
+    - list of jobs for export_figures
+--------------------------------------------------------------------------------------------------"""
+def target_jobs(eeg_signals, target, label, time, directory="figures/target", window=(100000, 150000)):
+    start, end = window
+    return [("target", os.path.join(directory, "signal_target_{}.png".format(label[i])),
+             {"time": time[start:end], "signal": eeg_signals[i][start:end], "target": target[start:end]})
+            for i in range(np.shape(eeg_signals)[0])]
+
+
+"""--------------------------------------------------------------------------------------------------
+JOBS OF delay_plot (one file per change of the target)
+INPUTS:
+    - eeg_signal : vector of [m] length
+    - target : vector of [m] length
+    - time : vector of [m] length or compact.TimeAxis
+    - directory : folder of the figures
+    - half_width : number of samples plotted before and after the change
+    - prefix : start of the file names
+OUTPUT:
+    - list of jobs for export_figures
+--------------------------------------------------------------------------------------------------"""
+def delay_jobs(eeg_signal, target, time, directory="figures/delay", half_width=6000, prefix="delay_nofilter_"):
+    target = np.asarray(target)
+    jobs   = []
+    for i in find_transitions(target)[0]:
+        lo, hi = max(i - half_width, 0), min(i + half_width, len(target) - 1)
+        jobs.append(("delay", os.path.join(directory, "{}{}.png".format(prefix, i)),
+                     {"time": time[lo:i + half_width], "signal": eeg_signal[lo:i + half_width],
+                      "target": target[lo:i + half_width], "xlim": np.array([time[lo], time[hi]])}))
+    return jobs
+
+
+"""--------------------------------------------------------------------------------------------------
+JOBS OF eeg32_freq_plot (one file per group of 8 channels)
+INPUTS:
+    - eeg_signals : a matrix of [nxm] dimensions where n (nb of channels) << m
+    - label : list of n strings with channel names
+    - freq_acquisition : frequence of acquisition
+    - directory : folder of the figures
+OUTPUT:
+    - list of jobs for export_figures
+--------------------------------------------------------------------------------------------------"""
+def freq_jobs(eeg_signals, label, freq_acquisition, directory="figures/frequential"):
+    n = np.shape(eeg_signals)[0]
+    return [("freq", os.path.join(directory, "signal_freq_{}.png".format(i // 8)),
+             {"signals": eeg_signals[i:i + 8], "label": list(label[i:i + 8]), "fs": freq_acquisition})
+            for i in range(0, n, 8)]
+
+
+"""--------------------------------------------------------------------------------------------------
+JOBS OF comparison_filtering_plot (one file per channel)
+INPUTS:
+    - eeg_signals : a matrix of [nxm] dimensions where n (nb of channels) << m
+    - eeg_filtering_signals : a matrix of [nxm] dimensions
+    - freq_acquisition : frequence of acquisition
+    - label : list of n strings with channel names
+    - directory : folder of the figures
+OUTPUT:
+    - list of jobs for export_figures
+--------------------------------------------------------------------------------------------------"""
+def comparison_jobs(eeg_signals, eeg_filtering_signals, freq_acquisition, label, directory="figures/frequential"):
+    return [("comparison", os.path.join(directory, "signal_freq_w_{}_comparison.png".format(label[i])),
+             {"signal": eeg_signals[i], "filtered": eeg_filtering_signals[i], "label": label[i],
+              "fs": freq_acquisition})
+            for i in range(len(label))]
+
+
+"""--------------------------------------------------------------------------------------------------
+EXPORT A LIST OF FIGURES
+A job is (kind, file_path, data) with kind in "target", "delay", "freq", "comparison". A hash of the
+data of each file is kept in a manifest of its folder : the file is skipped when it exists and its
+data did not change.
+INPUTS:
+    - jobs : list of jobs (outputs of target_jobs, delay_jobs, freq_jobs, comparison_jobs)
+    - n_jobs : number of processes (-1 for all cores, 1 to draw in the current process)
+    - force : True to draw every file, even the up to date ones
+OUTPUT:
+    - list of the files drawn
+--------------------------------------------------------------------------------------------------"""
+def export_figures(jobs, n_jobs=-1, force=False):
+    manifests = {}
+    todo      = []
+    for kind, file_path, data in jobs:
+        directory = str(Path(file_path).parent)
+        if directory not in manifests:
+            manifests[directory] = _read_manifest(directory)
+        digest = _job_hash(kind, data)
+        name   = Path(file_path).name
+        if force or manifests[directory].get(name) != digest or not os.path.exists(file_path):
+            todo.append((kind, file_path, data, digest))
+
+    for directory in {str(Path(job[1]).parent) for job in todo}:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    done   = []
+    try:
+        if n_jobs == 1 or len(todo) <= 1:
+            for kind, file_path, data, digest in todo:
+                _draw((kind, file_path, data))
+                done.append((file_path, digest))
+        else:
+            with ProcessPoolExecutor(n_jobs) as pool:
+                chunksize = max(1, len(todo) // (4 * n_jobs))
+                for (_, file_path, _, digest), _ in zip(todo, pool.map(_draw, [job[:3] for job in todo],
+                                                                        chunksize=chunksize)):
+                    done.append((file_path, digest))
+    finally:
+        for file_path, digest in done:
+            manifests[str(Path(file_path).parent)][Path(file_path).name] = digest
+        for directory, manifest in manifests.items():
+            if os.path.exists(directory):
+                _write_manifest(directory, manifest)
+    return [file_path for file_path, _ in done]
+
+
+# Figures of the current process, one per kind of plot, reused from one file to the next
+_FIGURES = {}
+
+
+def _draw(job):
+    kind, file_path, data = job
+    if kind not in _FIGURES:
+        _FIGURES[kind] = _NEW_FIGURE[kind]()
+    fig = _FIGURES[kind]
+    _UPDATE_FIGURE[kind](fig, data)
+    fig.savefig(file_path)
+    return file_path
+
+
+# Data of a line, reduced to its min/max envelope on one bin per pixel when it has more points than
+# the figure has pixels (only the part inside xlim is kept when xlim is given)
+def _set_line(ax, x, y, xlim=None):
+    x, y = np.asarray(x), np.asarray(y)
+    if xlim is not None:
+        lo, hi = np.searchsorted(x, xlim)
+        x, y   = x[max(lo - 1, 0):hi + 1], y[max(lo - 1, 0):hi + 1]
+    n_pixels = int(ax.figure.get_figwidth() * ax.figure.dpi)
+    if len(x) > 4 * n_pixels:
+        idx, lo, hi = envelope(y, n_pixels)
+        x, y = np.repeat(x[idx], 2), np.column_stack((lo, hi)).ravel()
+    ax.lines[0].set_data(x, y)
+
+
+def _autoscale(ax):
+    ax.relim()
+    ax.autoscale_view()
+
+
+def _new_target():
+    fig = Figure(figsize=(16,10))
+    axs = fig.subplots(2, 1).flatten()
+    fig.tight_layout()
+    for ax in axs:
+        ax.plot([], [])
+    return fig
+
+
+def _update_target(fig, data):
+    axs = fig.axes
+    _set_line(axs[0], data["time"], data["signal"])
+    _set_line(axs[1], data["time"], data["target"])
+    for ax in axs:
+        _autoscale(ax)
+
+
+def _new_delay():
+    fig = Figure(figsize=(16,10))
+    axs = fig.subplots(2, 1)
+    for ax in axs:
+        ax.plot([], [])
+    axs[1].set_xlabel("time[ms]")
+    return fig
+
+
+def _update_delay(fig, data):
+    axs = fig.axes
+    _set_line(axs[0], data["time"], data["signal"])
+    _set_line(axs[1], data["time"], data["target"])
+    for ax in axs:
+        _autoscale(ax)
+        ax.set_xlim(*data["xlim"])
+
+
+def _new_freq():
+    fig = Figure(figsize=(16,10))
+    axs = fig.subplots(4, 2).flatten()
+    fig.tight_layout()
+    for ax in axs:
+        ax.plot([], [])
+    return fig
+
+
+def _update_freq(fig, data):
+    for j, ax in enumerate(fig.axes):
+        # panels without channel (last group of n % 8 channels) are hidden : their limits would be the
+        # ones of the previous file
+        ax.set_visible(j < len(data["label"]))
+        if j < len(data["label"]):
+            _set_line(ax, *SPECTRA.half_spectrum(data["signals"][j], data["fs"]))
+            ax.set_title(data["label"][j])
+        else:
+            ax.lines[0].set_data([], [])
+            ax.set_title("")
+        _autoscale(ax)
+        ax.set_ylim(0,150e4)
+
+
+def _new_comparison():
+    fig = Figure(figsize=(18,8))
+    axs = fig.subplots(1, 2)
+    for ax in axs:
+        ax.plot([], [])
+        ax.set_xlabel('freqence [Hz]')
+        ax.set_ylabel('amplitude')
+    return fig
+
+
+def _update_comparison(fig, data):
+    axs = fig.axes
+    _set_line(axs[0], *SPECTRA.half_spectrum(data["signal"], data["fs"]))
+    _set_line(axs[1], *SPECTRA.half_spectrum(data["filtered"], data["fs"]), xlim=(0,50))
+    for ax in axs:
+        _autoscale(ax)
+    axs[0].set_ylim(0,150e4)
+    axs[0].set_title("Fourier transform of {} before filtering".format(data["label"]))
+    axs[1].set_ylim(0,1e6)
+    axs[1].set_xlim(0,50)
+    axs[1].set_title("Fourier transform of {} after filtering".format(data["label"]))
+
+
+_NEW_FIGURE    = {"target": _new_target, "delay": _new_delay, "freq": _new_freq, "comparison": _new_comparison}
+_UPDATE_FIGURE = {"target": _update_target, "delay": _update_delay, "freq": _update_freq,
+                  "comparison": _update_comparison}
+
+
+def _job_hash(kind, data):
+    digest = hashlib.blake2b(kind.encode("utf-8"), digest_size=16)
+    for key in sorted(data):
+        value = data[key]
+        digest.update(key.encode("utf-8"))
+        if isinstance(value, np.ndarray):
+            digest.update(str((value.shape, value.dtype.str)).encode("utf-8"))
+            digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            digest.update(repr(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(directory, manifest):
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
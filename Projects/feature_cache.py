@@ -0,0 +1,133 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# On-disk cache of the intermediate arrays of the pipeline : every array is stored under a key that
+# is the hash of the raw data and of all the parameters used to compute it
+#####################################################################################################
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+"""--------------------------------------------------------------------------------------------------
+CONTENT-ADDRESSED ARRAY CACHE
+Arrays are saved as .npy (opened again as memory maps) and dictionaries of arrays as .npz.
+When the files take more than max_bytes, the least recently used ones are removed.
+INPUTS:
+    - directory : folder of the cache
+    - max_bytes : disk budget of the cache
+--------------------------------------------------------------------------------------------------"""
+class FeatureCache:
+
+    def __init__(self, directory, max_bytes=8 * 2 ** 30):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    # Key of a stage : hash of its parameters (and of the key of the stage it depends on)
+    def key(self, stage, params):
+        text = json.dumps({"stage": stage, "params": params}, sort_keys=True, default=_jsonable)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    """----------------------------------------------------------------------------------------------
+    VALUE OF A STAGE, COMPUTED ONLY IF IT IS NOT IN THE CACHE
+    INPUTS:
+        - stage : name of the stage (e.g. "filtered", "segments", "features")
+        - params : JSON-like parameters of the stage, including the keys of its inputs
+        - compute : function without argument returning an array or a dictionary of arrays
+        - mmap : True to open a cached array as a read-only memory map
+    OUTPUT:
+        - value : the array (or dictionary of arrays)
+        - key : key of the stage, to be used in the params of the next stages
+    ----------------------------------------------------------------------------------------------"""
+    def cached(self, stage, params, compute, mmap=True):
+        key   = self.key(stage, params)
+        value = self.load(stage, key, mmap)
+        if value is None:
+            value = compute()
+            self.save(stage, key, value)
+            self.evict()
+        return value, key
+
+    def load(self, stage, key, mmap=True):
+        for path in (self._path(stage, key, ".npy"), self._path(stage, key, ".npz")):
+            if os.path.exists(path):
+                os.utime(path)                      # last use, for the LRU eviction
+                if path.suffix == ".npy":
+                    return np.load(path, mmap_mode="r" if mmap else None)
+                with np.load(path) as data:
+                    return {name: data[name] for name in data.files}
+        return None
+
+    def save(self, stage, key, value):
+        suffix = ".npz" if isinstance(value, dict) else ".npy"
+        path   = self._path(stage, key, suffix)
+        tmp    = path.with_name(path.stem + ".tmp" + suffix)
+        if isinstance(value, dict):
+            np.savez(tmp, **value)
+        else:
+            np.save(tmp, value)
+        os.replace(tmp, path)                       # never leave a partial file under a valid name
+
+    # Remove the least recently used files until the cache fits in max_bytes
+    def evict(self):
+        files = sorted((f for f in self.directory.iterdir() if f.suffix in (".npy", ".npz")),
+                       key=lambda f: f.stat().st_mtime)
+        total = sum(f.stat().st_size for f in files)
+        for f in files[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= f.stat().st_size
+            f.unlink()
+
+    def clear(self):
+        for f in self.directory.iterdir():
+            if f.suffix in (".npy", ".npz", ".json"):
+                f.unlink()
+
+    """----------------------------------------------------------------------------------------------
+    HASH OF THE CONTENT OF A FILE
+    The hash is remembered (with the size and modification time of the file) in hashes.json, so
+    that a large csv is read only once.
+    ----------------------------------------------------------------------------------------------"""
+    def file_hash(self, path):
+        path   = os.path.abspath(path)
+        stat   = os.stat(path)
+        index  = self.directory / "hashes.json"
+        hashes = json.loads(index.read_text()) if os.path.exists(index) else {}
+        entry  = hashes.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return entry["hash"]
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 22), b""):
+                digest.update(block)
+        hashes[path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": digest.hexdigest()}
+        tmp = index.with_name("hashes.{}.tmp".format(os.getpid()))     # one per process (batch.py pool)
+        tmp.write_text(json.dumps(hashes, indent=1))
+        os.replace(tmp, index)                      # never leave a truncated index
+        return hashes[path]["hash"]
+
+    # Hash of the content of an array (e.g. np.memmap or StoreChannels), read by blocks of samples
+    def array_hash(self, array, chunk_size=2 ** 16):
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((tuple(array.shape), str(array.dtype))).encode("utf-8"))
+        for start in range(0, array.shape[-1], chunk_size):
+            digest.update(np.ascontiguousarray(array[:, start:start + chunk_size]).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, stage, key, suffix):
+        return self.directory / "{}-{}{}".format(stage, key[:24], suffix)
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
@@ -0,0 +1,222 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Ranking of the features from statistics accumulated in one pass over the windows : per-class counts,
+# means and centered sums of squares give the feature-target correlation (corrwith in the notebook)
+# and the ANOVA F score, per-class histograms give the mutual information. The statistics are updated
+# batch by batch and can be merged (sessions, workers), the ranking is computed once and sliced for
+# any threshold or top-k.
+#####################################################################################################
+
+import numpy as np
+from scipy import stats
+
+
+"""--------------------------------------------------------------------------------------------------
+STATISTICS OF THE FEATURES PER CLASS
+INPUTS:
+    - n_bins : number of bins of the histograms of the mutual information (0 to skip them)
+    - edges : None, or matrix of [(nb of features) x (n_bins-1)] dimensions with the inner edges of the
+              bins of each feature (quantiles of the first batch if None)
+    - batch_size : number of windows binned at once for the histograms
+--------------------------------------------------------------------------------------------------"""
+class FeatureStats:
+
+    def __init__(self, n_bins=16, edges=None, batch_size=4096):
+        self.n_bins     = n_bins
+        self.edges      = None if edges is None else np.asarray(edges, dtype=np.float64)
+        self.batch_size = batch_size
+        self.classes_   = np.empty(0)
+        self.counts_    = np.empty(0, dtype=np.int64)                  # (classes,)
+        self.means_     = None                                          # (classes, features)
+        self.m2_        = None                                          # (classes, features)
+        self.histograms_ = None                                         # (features, bins, classes)
+
+    # Update the statistics with a batch X of [(nb of windows) x (nb of features)] and its target y
+    def partial_fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y).ravel()
+        if len(X) != len(y):
+            raise ValueError("X has {} windows and y {}".format(len(X), len(y)))
+        if len(X) == 0:
+            return self
+        classes, inverse = np.unique(y, return_inverse=True)
+        self._add_classes(classes, X.shape[1])
+        index  = np.searchsorted(self.classes_, classes)[inverse]
+
+        onehot = np.zeros((len(self.classes_), len(X)))
+        onehot[index, np.arange(len(X))] = 1
+        counts = onehot.sum(axis=1)
+        seen   = counts > 0
+        means  = np.divide(onehot @ X, counts[:, None], out=np.zeros_like(self.means_), where=seen[:, None])
+        m2     = onehot @ (X - means[index]) ** 2
+        self._merge(counts.astype(np.int64), means, m2)
+
+        if self.n_bins:
+            if self.edges is None:
+                quantiles  = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+                self.edges = np.quantile(X, quantiles, axis=0).T
+            self.histograms_ += _histograms(X, index, self.edges, len(self.classes_), self.batch_size)
+        return self
+
+    def fit(self, X, y):
+        return self.partial_fit(X, y)
+
+    # Add the statistics of another FeatureStats (same features, same edges)
+    def merge(self, other):
+        if other.means_ is None:
+            return self
+        if self.n_bins and self.edges is not None and other.edges is not None and \
+                not np.array_equal(self.edges, other.edges):
+            raise ValueError("the histograms of the two FeatureStats have different edges")
+        if self.n_bins and self.edges is None:
+            self.edges = other.edges
+        self._add_classes(other.classes_, other.means_.shape[1])
+        index = np.searchsorted(self.classes_, other.classes_)
+        counts, means, m2 = (np.zeros(len(self.classes_), dtype=np.int64), np.zeros_like(self.means_),
+                             np.zeros_like(self.m2_))
+        counts[index], means[index], m2[index] = other.counts_, other.means_, other.m2_
+        self._merge(counts, means, m2)
+        if self.n_bins and other.histograms_ is not None:
+            self.histograms_[:, :, index] += other.histograms_
+        return self
+
+    @property
+    def n_samples(self):
+        return int(self.counts_.sum())
+
+    """----------------------------------------------------------------------------------------------
+    CORRELATION OF EACH FEATURE WITH THE TARGET (Pearson, like DataFrame.corrwith)
+    OUTPUT:
+        - vector of [nb of features] length (0 for a constant feature)
+    ----------------------------------------------------------------------------------------------"""
+    def correlation(self):
+        n, mean = self._total()
+        values  = self.classes_.astype(np.float64)
+        mean_y  = self.counts_ @ values / n
+        ss_x    = self.m2_.sum(axis=0) + self.counts_ @ (self.means_ - mean) ** 2
+        ss_y    = self.counts_ @ (values - mean_y) ** 2
+        cov     = (self.counts_ * (values - mean_y)) @ (self.means_ - mean)
+        norm    = np.sqrt(ss_x * ss_y)
+        return np.divide(cov, norm, out=np.zeros_like(cov), where=norm > 0)
+
+    """----------------------------------------------------------------------------------------------
+    ANOVA F SCORE OF EACH FEATURE (same as sklearn.feature_selection.f_classif)
+    OUTPUT:
+        - F : vector of [nb of features] length
+        - p_values : vector of [nb of features] length
+    ----------------------------------------------------------------------------------------------"""
+    def anova_f(self):
+        n, mean   = self._total()
+        n_classes = len(self.classes_)
+        between   = self.counts_ @ (self.means_ - mean) ** 2 / (n_classes - 1)
+        within    = self.m2_.sum(axis=0) / (n - n_classes)
+        F = np.divide(between, within, out=np.full_like(between, np.inf), where=within > 0)
+        return F, stats.f.sf(F, n_classes - 1, n - n_classes)
+
+    """----------------------------------------------------------------------------------------------
+    MUTUAL INFORMATION BETWEEN EACH FEATURE (BINNED) AND THE TARGET, IN NATS
+    OUTPUT:
+        - vector of [nb of features] length
+    ----------------------------------------------------------------------------------------------"""
+    def mutual_information(self):
+        if not self.n_bins:
+            raise ValueError("the histograms were not computed (n_bins=0)")
+        joint   = self.histograms_ / self.n_samples
+        p_bin   = joint.sum(axis=2, keepdims=True)
+        p_class = joint.sum(axis=1, keepdims=True)
+        ratio   = np.divide(joint, p_bin * p_class, out=np.ones_like(joint), where=joint > 0)
+        return (joint * np.log(ratio)).sum(axis=(1, 2))
+
+    # Ranking of the features by "correlation" (absolute value), "anova_f" or "mutual_information"
+    def ranking(self, score="correlation", names=None):
+        if score == "correlation":
+            return FeatureRanking(self.correlation(), names, absolute=True)
+        if score == "anova_f":
+            return FeatureRanking(self.anova_f()[0], names)
+        if score == "mutual_information":
+            return FeatureRanking(self.mutual_information(), names)
+        raise ValueError("unknown score {}".format(score))
+
+    def _add_classes(self, classes, n_features):
+        if self.means_ is None:
+            self.means_ = np.zeros((0, n_features))
+            self.m2_    = np.zeros((0, n_features))
+        elif n_features != self.means_.shape[1]:
+            raise ValueError("{} features, the previous batches had {}".format(n_features, self.means_.shape[1]))
+        new = np.setdiff1d(classes, self.classes_)
+        if len(new) == 0:
+            return
+        classes = np.union1d(self.classes_, new)
+        index   = np.searchsorted(classes, self.classes_)
+        counts, means, m2 = np.zeros(len(classes), dtype=np.int64), np.zeros((len(classes), n_features)), \
+                            np.zeros((len(classes), n_features))
+        counts[index], means[index], m2[index] = self.counts_, self.means_, self.m2_
+        histograms = np.zeros((n_features, self.n_bins, len(classes)), dtype=np.int64)
+        if self.histograms_ is not None:
+            histograms[:, :, index] = self.histograms_
+        self.classes_, self.counts_, self.means_, self.m2_, self.histograms_ = classes, counts, means, m2, histograms
+
+    # Merge of the per-class statistics with those of a batch (Chan et al.)
+    def _merge(self, counts, means, m2):
+        total = self.counts_ + counts
+        ratio = np.divide(counts, total, out=np.zeros(len(total)), where=total > 0)[:, None]
+        delta = means - self.means_
+        self.m2_    = self.m2_ + m2 + delta ** 2 * (self.counts_[:, None] * ratio)
+        self.means_ = self.means_ + delta * ratio
+        self.counts_ = total
+
+    # Total number of windows and overall mean of the features
+    def _total(self):
+        n = self.n_samples
+        if n < 2:
+            raise ValueError("at least 2 windows are needed, {} were seen".format(n))
+        return n, self.counts_ @ self.means_ / n
+
+
+"""--------------------------------------------------------------------------------------------------
+RANKING OF THE FEATURES
+The features are sorted once by decreasing score : top(k) and above(threshold) are slices of the
+order, no_keep(threshold) is the no_keep list of the notebook.
+INPUTS:
+    - scores : vector of [nb of features] length
+    - names : None or list of the names of the features
+    - absolute : True to rank by |score| (correlation)
+--------------------------------------------------------------------------------------------------"""
+class FeatureRanking:
+
+    def __init__(self, scores, names=None, absolute=False):
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.names  = None if names is None else list(names)
+        key         = np.abs(self.scores) if absolute else self.scores
+        self.order_ = np.argsort(-key, kind="stable")
+        self._sorted = key[self.order_]
+
+    # Indexes of the k best features
+    def top(self, k):
+        return self.order_[:k]
+
+    # Indexes of the features with a score (or |score|) >= threshold, best first
+    def above(self, threshold):
+        return self.order_[:np.searchsorted(-self._sorted, -threshold, side="right")]
+
+    # Sorted indexes of the features with a score (or |score|) < threshold
+    def no_keep(self, threshold):
+        return np.sort(self.order_[np.searchsorted(-self._sorted, -threshold, side="right"):])
+
+    # (name, score) of the features, best first
+    def table(self):
+        names = self.names if self.names is not None else [str(i) for i in range(len(self.scores))]
+        return [(names[i], self.scores[i]) for i in self.order_]
+
+
+# Histograms of the binned features per class : (features, bins, classes) counts
+def _histograms(X, index, edges, n_classes, batch_size):
+    n_features, n_bins = X.shape[1], edges.shape[1] + 1
+    counts = np.zeros(n_features * n_bins * n_classes, dtype=np.int64)
+    offset = np.arange(n_features) * n_bins
+    for start in range(0, len(X), batch_size):
+        block = X[start:start + batch_size]
+        bins  = (block[:, :, None] > edges[None, :, :]).sum(axis=2)           # (windows, features)
+        flat  = ((bins + offset) * n_classes + index[start:start + batch_size, None]).ravel()
+        counts += np.bincount(flat, minlength=len(counts))
+    return counts.reshape(n_features, n_bins, n_classes)
@@ -0,0 +1,241 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Feature extraction on windows of the EEG signals
+#####################################################################################################
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Bands used in the project (lst_onde / lst_onde_name in the notebook)
+LST_ONDE      = [(4, 8), (8, 13), (13, 25)]
+LST_ONDE_NAME = ["alpha", "beta", "theta"]
+
+
+"""--------------------------------------------------------------------------------------------------
+POWER OF THE EEG SIGNALS IN FREQUENCY BANDS, WINDOW BY WINDOW
+All windows and channels are transformed in one batch (by blocks of batch_size windows to bound the
+memory), the power of a band is the sum of |X(f)|^2 over the bins lo <= f < hi.
+Only the bins inside the bands are computed : when they are few (the project bands use 11 bins out
+of 251), the windows are projected on a precomputed DFT basis of these bins, otherwise one batched
+rfft is used.
+With the default parameters, the output is the EEG_data_segmented_numpy matrix of the notebook
+(the notebook loop stops one window early and leaves the last row at zero, here it is computed).
+INPUTS:
+    - signals : a matrix of [nxm] dimensions where n (nb of channels) << m
+    - fs : frequence of acquisition
+    - window : number of samples per window
+    - hop : number of samples between the start of two windows
+    - bands : list of (lo, hi) frequency bands in Hz
+    - welch : None to take the FFT of the whole window, or length of the sub-segments of a Welch
+              estimate (Hann taper, 50% overlap, periodograms averaged inside each window)
+    - batch_size : number of windows transformed at once
+    - starts : None, or indexes of the first sample of each window (hop is then ignored), e.g. the
+               output of segmentation.segment_starts
+OUTPUT:
+    - features : matrix of [(nb of windows) x (n * nb of bands)] dimensions, column 3*j+z is the
+                 power of channel j in band z (same order as band_power_names)
+--------------------------------------------------------------------------------------------------"""
+def band_power_features(signals, fs, window=500, hop=500, bands=LST_ONDE, welch=None, batch_size=1024,
+                        starts=None):
+    signals   = np.atleast_2d(signals)
+    dtype     = np.result_type(signals.dtype, np.float32)
+    n_windows = n_full_windows(signals.shape[1], window, hop) if starts is None else len(starts)
+    seg_len   = window if welch is None else welch
+
+    masks = band_masks(seg_len, fs, bands)
+    bins  = np.flatnonzero(masks.any(axis=0))
+    masks = masks[:, bins].astype(dtype)
+    basis = dft_basis(seg_len, bins, dtype) if len(bins) <= seg_len // 16 else None
+
+    windows = sliding_window_view(signals, window, axis=1)
+    if starts is None:
+        windows = windows[:, ::hop]
+    features = np.empty((n_windows, signals.shape[0], len(bands)), dtype=dtype)
+    for start in range(0, n_windows, batch_size):
+        stop  = start + batch_size
+        block = windows[:, start:stop] if starts is None else windows[:, starts[start:stop]]
+        power = _power_spectrum(block, bins, basis, welch)                 # (channels, windows, bins)
+        features[start:start + block.shape[1]] = np.matmul(power, masks.T).transpose(1, 0, 2)
+    return features.reshape(n_windows, -1)
+
+
+"""--------------------------------------------------------------------------------------------------
+NAMES OF THE BAND-POWER FEATURES (features_name in the notebook)
+INPUTS:
+    - ch_names : list of n strings with channel names
+    - band_names : list of strings with band names
+OUTPUT:
+    - list of "channel_band" strings, channel by channel
+--------------------------------------------------------------------------------------------------"""
+def band_power_names(ch_names, band_names=LST_ONDE_NAME):
+    return [ch + "_" + band for ch in ch_names for band in band_names]
+
+
+"""--------------------------------------------------------------------------------------------------
+DOMINANT SPECTRAL PEAK OF EACH BAND, WINDOW BY WINDOW
+Batched version of the find_peaks experiment of the notebook (other idea/peaks.txt) : the amplitude
+spectrum |X(f)| of every window of every channel (DC set to zero) is computed up to fmax, the peaks
+are its local maxima, and for each band the highest peak in lo <= f < hi gives 3 features : its
+frequency, its amplitude and its prominence (as scipy.signal.peak_prominences on the spectrum up to
+fmax, just above the highest band by default, the notebook looked at 0-50 Hz). A band without
+local maximum takes its largest bin, a band without any FFT bin (window too short for its width)
+raises a ValueError.
+The windows are the ones of band_power_features, so the columns can be appended to the band powers.
+INPUTS:
+    - signals : a matrix of [nxm] dimensions where n (nb of channels) << m
+    - fs : frequence of acquisition
+    - window, hop, starts, batch_size : windows of band_power_features
+    - bands : list of (lo, hi) frequency bands in Hz
+    - fmax : highest frequency of the spectrum used for the prominence
+OUTPUT:
+    - features : matrix of [(nb of windows) x (n * nb of bands * 3)] dimensions, columns 3*(j*B+z)
+                 to 3*(j*B+z)+2 are the frequency, the amplitude and the prominence of the peak of
+                 channel j in band z (same order as spectral_peak_names)
+--------------------------------------------------------------------------------------------------"""
+def spectral_peak_features(signals, fs, window=500, hop=500, bands=LST_ONDE, fmax=30, batch_size=1024, starts=None):
+    signals   = np.atleast_2d(signals)
+    dtype     = np.result_type(signals.dtype, np.float32)
+    n_windows = n_full_windows(signals.shape[1], window, hop) if starts is None else len(starts)
+
+    freqs = np.fft.rfftfreq(window, d=1 / fs)
+    bins  = np.arange(max(np.searchsorted(freqs, fmax, side="right"), 3))
+    if max(hi for _, hi in bands) > freqs[bins[-1]]:
+        raise ValueError("fmax ({} Hz) is below the highest band".format(fmax))
+    masks = band_masks(window, fs, bands)[:, bins]
+    empty = [band for band, mask in zip(bands, masks) if not mask.any()]
+    if empty:
+        raise ValueError("the bands {} contain no FFT bin of a {}-sample window at {} Hz".format(empty, window, fs))
+    basis = dft_basis(window, bins, dtype)
+
+    windows = sliding_window_view(signals, window, axis=1)
+    if starts is None:
+        windows = windows[:, ::hop]
+    features = np.empty((n_windows, signals.shape[0], len(bands), 3), dtype=dtype)
+    for start in range(0, n_windows, batch_size):
+        stop     = start + batch_size
+        block    = windows[:, start:stop] if starts is None else windows[:, starts[start:stop]]
+        spectrum = np.matmul(block, basis)
+        amplitude = np.sqrt(spectrum[..., :len(bins)] ** 2 + spectrum[..., len(bins):] ** 2)
+        amplitude[..., 0] = 0                                              # (channels, windows, bins)
+        peaks = _band_peaks(amplitude, masks)                              # (channels, windows, bands)
+        features[start:start + block.shape[1], ..., 0] = freqs[bins][peaks].transpose(1, 0, 2)
+        features[start:start + block.shape[1], ..., 1] = np.take_along_axis(amplitude, peaks, axis=-1).transpose(1, 0, 2)
+        features[start:start + block.shape[1], ..., 2] = _prominences(amplitude, peaks).transpose(1, 0, 2)
+    return features.reshape(n_windows, -1)
+
+
+"""--------------------------------------------------------------------------------------------------
+NAMES OF THE SPECTRAL-PEAK FEATURES
+INPUTS:
+    - ch_names : list of n strings with channel names
+    - band_names : list of strings with band names
+OUTPUT:
+    - list of "channel_band_peak_freq", "channel_band_peak_amp", "channel_band_peak_prom" strings
+--------------------------------------------------------------------------------------------------"""
+def spectral_peak_names(ch_names, band_names=LST_ONDE_NAME):
+    return [name + suffix for name in band_power_names(ch_names, band_names)
+            for suffix in ("_peak_freq", "_peak_amp", "_peak_prom")]
+
+
+"""--------------------------------------------------------------------------------------------------
+TARGET OF EACH WINDOW (target_segmented_numpy in the notebook)
+INPUTS:
+    - target : vector of [m] length
+    - window : number of samples per window
+    - hop : number of samples between the start of two windows
+OUTPUT:
+    - value of the target at the first sample of each window
+--------------------------------------------------------------------------------------------------"""
+def window_targets(target, window=500, hop=500):
+    return np.asarray(target)[:n_full_windows(len(target), window, hop) * hop:hop]
+
+
+"""--------------------------------------------------------------------------------------------------
+BOOLEAN MASKS OF THE BANDS ON THE FFT BINS OF A WINDOW
+INPUTS:
+    - window : number of samples per window
+    - fs : frequence of acquisition
+    - bands : list of (lo, hi) frequency bands in Hz
+OUTPUT:
+    - matrix of [(nb of bands) x (window//2 + 1)] dimensions
+--------------------------------------------------------------------------------------------------"""
+def band_masks(window, fs, bands):
+    # Same frequencies as np.fft.fftfreq (the Nyquist bin of an even window is negative and is
+    # never part of a band), restricted to the bins returned by rfft
+    freqs = np.fft.fftfreq(window, d=1 / fs)[:window // 2 + 1]
+    return np.array([(freqs >= lo) & (freqs < hi) for lo, hi in bands])
+
+
+"""--------------------------------------------------------------------------------------------------
+REAL DFT BASIS OF SOME BINS
+INPUTS:
+    - window : number of samples per window
+    - bins : indexes of the rfft bins
+    - dtype : dtype of the basis
+OUTPUT:
+    - matrix of [window x (2 * nb of bins)] dimensions, x @ basis gives the real parts of the bins
+      followed by their imaginary parts (same convention as np.fft.rfft)
+--------------------------------------------------------------------------------------------------"""
+def dft_basis(window, bins, dtype=np.float64):
+    angle = 2 * np.pi * np.outer(np.arange(window), bins) / window
+    return np.concatenate([np.cos(angle), -np.sin(angle)], axis=1).astype(dtype)
+
+
+# Number of complete windows in a signal of n_samples
+def n_full_windows(n_samples, window, hop):
+    if n_samples < window:
+        return 0
+    return (n_samples - window) // hop + 1
+
+
+def _power_spectrum(windows, bins, basis, welch):
+    if welch is not None:
+        segments = sliding_window_view(windows, welch, axis=-1)[..., ::max(welch // 2, 1), :]
+        windows  = segments * np.hanning(welch).astype(windows.dtype, copy=False)
+    if basis is not None:
+        spectrum = np.matmul(windows, basis)
+        power    = spectrum[..., :len(bins)] ** 2 + spectrum[..., len(bins):] ** 2
+    else:
+        spectrum = np.fft.rfft(windows, axis=-1)[..., bins]
+        power    = spectrum.real ** 2 + spectrum.imag ** 2
+    if welch is not None:
+        power = power.mean(axis=-2)
+    return power
+
+
+# Bin of the highest local maximum of each band (the largest bin of the band if it has none)
+def _band_peaks(amplitude, masks):
+    local = np.zeros(amplitude.shape, dtype=bool)
+    local[..., 1:-1] = (amplitude[..., 1:-1] > amplitude[..., :-2]) & (amplitude[..., 1:-1] >= amplitude[..., 2:])
+    peaks = np.empty(amplitude.shape[:-1] + (len(masks),), dtype=np.intp)
+    for z, mask in enumerate(masks):
+        lo, hi  = np.argmax(mask), len(mask) - np.argmax(mask[::-1])     # bins of a band are contiguous
+        in_band = amplitude[..., lo:hi]
+        best    = np.argmax(np.where(local[..., lo:hi], in_band, -np.inf), axis=-1)
+        found   = np.take_along_axis(local[..., lo:hi], best[..., None], axis=-1)[..., 0]
+        peaks[..., z] = lo + np.where(found, best, np.argmax(in_band, axis=-1))
+    return peaks
+
+
+# Prominence of the peaks : height above the higher of the minima on each side, each side ending at
+# the first bin higher than the peak (or at the end of the spectrum), walked one bin at a time for
+# all the peaks at once
+def _prominences(amplitude, peaks):
+    n_bins = amplitude.shape[-1]
+    rows   = amplitude.reshape(-1, n_bins)
+    peaks  = peaks.reshape(len(rows), -1)
+    row    = np.arange(len(rows))[:, None]
+    height = rows[row, peaks]
+    bases  = []
+    for side in (-1, 1):
+        base, alive, index = height.copy(), np.ones(height.shape, dtype=bool), peaks.copy()
+        for _ in range(n_bins - 1):
+            index += side
+            alive &= (index >= 0) & (index < n_bins)
+            value  = rows[row, np.clip(index, 0, n_bins - 1)]
+            alive &= value <= height
+            if not alive.any():
+                break
+            np.minimum(base, np.where(alive, value, np.inf), out=base)
+        bases.append(base)
+    return (height - np.maximum(*bases)).reshape(amplitude.shape[:-1] + (-1,))
@@ -0,0 +1,406 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Inference artifact of the trained pipeline : the fitted chain (channel selection, wavelet filter,
+# bands, scaler, PCA, kept features and classifier) is written in one versioned .npz file of plain
+# arrays, and a runtime that only imports NumPy predicts batches of windows with the same results as
+# the sklearn objects (no refit, no pandas / matplotlib / pywt / sklearn at load time)
+#####################################################################################################
+
+import numpy as np
+
+from features import LST_ONDE, band_power_features
+
+FORMAT  = "lgbio2020-pipeline"
+VERSION = 1
+
+
+"""--------------------------------------------------------------------------------------------------
+EXPORT OF A FITTED PIPELINE
+Only the attributes of the fitted objects are read (sklearn is not imported here). The supported
+classifiers are the ones of the notebook : SVC (kernels rbf, poly, sigmoid, linear), MLPClassifier,
+KNeighborsClassifier (minkowski / euclidean / manhattan / chebyshev) and DecisionTreeClassifier.
+The wavelet filter is stored as parameters : it acts on the whole recording (pipeline.filter_signals),
+the runtime expects windows of the filtered signals.
+INPUTS:
+    - path : path of the .npz file
+    - model : fitted classifier
+    - scaler : fitted StandardScaler (or None)
+    - pca : fitted PCA (or None)
+    - keep : indexes of the features kept after the scaler / PCA (None to keep all), i.e. the columns
+             that np.delete(X, no_keep, 1) leaves in the notebook
+    - ch_names : names of the channels of the recording
+    - ch_names_kept : channels used for the features (all of ch_names if None)
+    - fs, window, bands, welch : parameters of band_power_features
+    - wavelet, level, wavelet_keep : parameters of the wavelet filter used in training
+    - compress : True for np.savez_compressed
+--------------------------------------------------------------------------------------------------"""
+def export_model(path, model, scaler=None, pca=None, keep=None, ch_names=None, ch_names_kept=None, fs=1000,
+                 window=500, bands=LST_ONDE, welch=None, wavelet="db4", level=7, wavelet_keep=("D7", "D6", "D5"),
+                 compress=True):
+    arrays = {"format": np.array(FORMAT), "version": np.array(VERSION),
+              "fs": np.array(fs, dtype=np.float64), "window": np.array(window), "bands": np.array(bands, dtype=np.float64),
+              "welch": np.array(0 if welch is None else welch),
+              "wavelet": np.array(wavelet), "level": np.array(level), "wavelet_keep": np.array(list(wavelet_keep))}
+    if ch_names is not None:
+        ch_names_kept = ch_names if ch_names_kept is None else ch_names_kept
+        arrays["ch_names"]      = np.array(list(ch_names))
+        arrays["ch_names_kept"] = np.array(list(ch_names_kept))
+        arrays["ch_index"]      = np.array([list(ch_names).index(ch) for ch in ch_names_kept])
+    if scaler is not None:
+        if getattr(scaler, "mean_", None) is not None:
+            arrays["scaler_mean"] = scaler.mean_
+        if getattr(scaler, "scale_", None) is not None:
+            arrays["scaler_scale"] = scaler.scale_
+    if pca is not None:
+        arrays["pca_components"] = pca.components_
+        arrays["pca_mean"]       = pca.mean_
+        if pca.whiten:
+            arrays["pca_whiten"] = np.sqrt(pca.explained_variance_)
+    if keep is not None:
+        arrays["keep"] = np.asarray(keep, dtype=np.intp)
+    arrays.update(_model_arrays(model))
+    (np.savez_compressed if compress else np.savez)(path, **arrays)
+
+
+"""--------------------------------------------------------------------------------------------------
+LOAD OF AN EXPORTED PIPELINE
+INPUTS:
+    - path : path of the .npz file written by export_model
+OUTPUT:
+    - InferenceModel
+--------------------------------------------------------------------------------------------------"""
+def load_model(path):
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    if "format" not in arrays or str(arrays["format"]) != FORMAT:
+        raise ValueError("{} is not an exported pipeline".format(path))
+    if int(arrays["version"]) > VERSION:
+        raise ValueError("{} has version {}, this runtime reads up to version {}".format(
+            path, int(arrays["version"]), VERSION))
+    return InferenceModel(arrays)
+
+
+"""--------------------------------------------------------------------------------------------------
+RUNTIME OF AN EXPORTED PIPELINE
+windows -> band powers -> scaler -> PCA -> kept features -> classifier, every step on the whole batch
+INPUTS:
+    - arrays : dictionary of the arrays of the .npz file
+--------------------------------------------------------------------------------------------------"""
+class InferenceModel:
+
+    def __init__(self, arrays):
+        self.arrays   = arrays
+        self.kind     = str(arrays["kind"])
+        self.classes  = arrays["classes"]
+        self.fs       = float(arrays["fs"])
+        self.window   = int(arrays["window"])
+        self.bands    = [tuple(band) for band in arrays["bands"].tolist()]
+        self.welch    = int(arrays["welch"]) or None
+        self.ch_index = arrays.get("ch_index")
+        if self.kind not in _PREDICT:
+            raise ValueError("unknown classifier {}".format(self.kind))
+        if self.kind == "knn":
+            self._norms = np.einsum("ij,ij->i", arrays["knn_X"], arrays["knn_X"])
+
+    """----------------------------------------------------------------------------------------------
+    PREDICTION OF A BATCH OF WINDOWS
+    INPUTS:
+        - windows : array of [(nb of windows) x n x window] dimensions of the filtered signals, with
+                    n the number of channels of the recording or of the kept channels
+    OUTPUT:
+        - vector of (nb of windows) labels
+    ----------------------------------------------------------------------------------------------"""
+    def predict(self, windows):
+        return self.predict_features(self.features(windows))
+
+    # Band powers of a batch of windows, same columns as band_power_features in training
+    def features(self, windows):
+        windows = np.asarray(windows)
+        if windows.ndim != 3 or windows.shape[2] != self.window:
+            raise ValueError("windows must be of [(nb of windows) x n x {}] dimensions".format(self.window))
+        if self.ch_index is not None and windows.shape[1] != len(self.ch_index):
+            if windows.shape[1] != len(self.arrays["ch_names"]):
+                raise ValueError("windows have {} channels, expected {} or {}".format(
+                    windows.shape[1], len(self.arrays["ch_names"]), len(self.ch_index)))
+            windows = windows[:, self.ch_index]
+        n_windows = len(windows)
+        signals   = windows.transpose(1, 0, 2).reshape(windows.shape[1], -1)
+        return band_power_features(signals, self.fs, self.window, bands=self.bands, welch=self.welch,
+                                   starts=np.arange(n_windows) * self.window)
+
+    # Prediction from a feature matrix (output of band_power_features)
+    def predict_features(self, X):
+        return _PREDICT[self.kind](self.arrays, self.transform(X), self)
+
+    # Scaler, PCA and feature selection fitted in training (same operations as sklearn)
+    def transform(self, X):
+        arrays = self.arrays
+        X = np.array(X, dtype=np.float64)
+        if "scaler_mean" in arrays:
+            X -= arrays["scaler_mean"]
+        if "scaler_scale" in arrays:
+            X /= arrays["scaler_scale"]
+        if "pca_components" in arrays:
+            components = arrays["pca_components"]
+            X  = X @ components.T
+            X -= np.reshape(arrays["pca_mean"], (1, -1)) @ components.T
+            if "pca_whiten" in arrays:
+                X /= arrays["pca_whiten"]
+        if "keep" in arrays:
+            X = X[:, arrays["keep"]]
+        return X
+
+
+"""--------------------------------------------------------------------------------------------------
+TIME FROM THE LOAD OF THE FILE TO THE FIRST PREDICTION, IN A NEW PYTHON PROCESS
+INPUTS:
+    - path : path of the .npz file
+    - windows : array of [(nb of windows) x n x window] dimensions
+    - repeat : number of processes (the median is returned)
+OUTPUT:
+    - dictionary with the median time (in ms) of the imports of the runtime, of the load of the file and
+      of the first prediction of the batch, and the modules of sklearn / pandas / pywt / matplotlib
+      / scipy imported by the runtime (should be empty)
+--------------------------------------------------------------------------------------------------"""
+def load_report(path, windows, repeat=5):
+    import json
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        batch = os.path.join(directory, "windows.npy")
+        np.save(batch, windows)
+        code = ("import time; t0 = time.perf_counter()\n"
+                "import sys, json, numpy as np; sys.path.insert(0, {here!r})\n"
+                "from inference import load_model; t1 = time.perf_counter()\n"
+                "model = load_model({path!r}); t2 = time.perf_counter()\n"
+                "windows = np.load({batch!r}); t3 = time.perf_counter()\n"
+                "model.predict(windows); t4 = time.perf_counter()\n"
+                "heavy = sorted(m for m in sys.modules if m.split('.')[0] in "
+                "('sklearn', 'pandas', 'pywt', 'matplotlib', 'scipy'))\n"
+                "print(json.dumps([t1 - t0, t2 - t1, t4 - t3, heavy]))").format(
+                    here=os.path.dirname(os.path.abspath(__file__)), path=os.path.abspath(path), batch=batch)
+        runs = [json.loads(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                          check=True).stdout) for _ in range(repeat)]
+    imports, load, predict, heavy = zip(*runs)
+    return {"import_ms": 1e3 * np.median(imports), "load_ms": 1e3 * np.median(load),
+            "predict_ms": 1e3 * np.median(predict),
+            "total_ms": 1e3 * np.median(np.add(np.add(imports, load), predict)), "heavy_modules": heavy[0]}
+
+
+# Arrays of a fitted classifier, from the attributes of its sklearn class
+def _model_arrays(model):
+    name = type(model).__name__
+    if name == "SVC":
+        if model.kernel not in ("rbf", "poly", "sigmoid", "linear"):
+            raise ValueError("SVC kernel {} cannot be exported".format(model.kernel))
+        if model.break_ties:
+            raise ValueError("SVC with break_ties=True cannot be exported")
+        # libsvm signs (_dual_coef_ / _intercept_ are the ones used by SVC.predict)
+        return {"kind": np.array("svc"), "classes": model.classes_, "svc_kernel": np.array(model.kernel),
+                "svc_gamma": np.array(model._gamma, dtype=np.float64), "svc_coef0": np.array(model.coef0, dtype=np.float64),
+                "svc_degree": np.array(model.degree), "svc_support_vectors": model.support_vectors_,
+                "svc_n_support": model.n_support_, "svc_dual_coef": np.asarray(model._dual_coef_),
+                "svc_intercept": model._intercept_}
+    if name == "MLPClassifier":
+        arrays = {"kind": np.array("mlp"), "classes": model.classes_, "mlp_activation": np.array(model.activation),
+                  "mlp_out_activation": np.array(model.out_activation_), "mlp_n_layers": np.array(len(model.coefs_))}
+        for i, (coef, intercept) in enumerate(zip(model.coefs_, model.intercepts_)):
+            arrays["mlp_coef_{}".format(i)]      = coef
+            arrays["mlp_intercept_{}".format(i)] = intercept
+        return arrays
+    if name == "KNeighborsClassifier":
+        metric = model.effective_metric_
+        p      = (model.effective_metric_params_ or {}).get("p", 2)
+        power  = {"euclidean": 2, "l2": 2, "manhattan": 1, "cityblock": 1, "l1": 1, "chebyshev": np.inf,
+                  "infinity": np.inf}.get(metric, p if metric == "minkowski" else None)
+        if power is None or model.weights not in ("uniform", "distance") or np.ndim(model._y) != 1:
+            raise ValueError("KNeighborsClassifier with metric {} and weights {} cannot be exported".format(
+                metric, model.weights))
+        return {"kind": np.array("knn"), "classes": model.classes_, "knn_X": np.asarray(model._fit_X, dtype=np.float64),
+                "knn_y": model._y, "knn_k": np.array(model.n_neighbors), "knn_p": np.array(power, dtype=np.float64),
+                "knn_weights": np.array(model.weights)}
+    if name == "DecisionTreeClassifier":
+        tree = model.tree_
+        if model.n_outputs_ != 1:
+            raise ValueError("DecisionTreeClassifier with several outputs cannot be exported")
+        return {"kind": np.array("tree"), "classes": model.classes_, "tree_left": tree.children_left,
+                "tree_right": tree.children_right, "tree_feature": tree.feature, "tree_threshold": tree.threshold,
+                "tree_value": tree.value[:, 0]}
+    raise ValueError("classifier {} cannot be exported".format(name))
+
+
+def _kernel(arrays, X, Y):
+    kernel = str(arrays["svc_kernel"])
+    gamma  = float(arrays["svc_gamma"])
+    if kernel == "rbf":
+        distance = np.einsum("ij,ij->i", X, X)[:, None] + np.einsum("ij,ij->i", Y, Y)[None, :] - 2 * X @ Y.T
+        return np.exp(-gamma * np.maximum(distance, 0))
+    dot = X @ Y.T
+    if kernel == "linear":
+        return dot
+    if kernel == "poly":
+        return (gamma * dot + float(arrays["svc_coef0"])) ** int(arrays["svc_degree"])
+    return np.tanh(gamma * dot + float(arrays["svc_coef0"]))
+
+
+# One-vs-one vote of libsvm : the pair (i, j) votes for i when its decision value is > 0, ties of the
+# vote go to the first class
+def _predict_svc(arrays, X, model):
+    K         = _kernel(arrays, X, arrays["svc_support_vectors"])
+    dual_coef = arrays["svc_dual_coef"]
+    bounds    = np.concatenate([[0], np.cumsum(arrays["svc_n_support"])])
+    n_classes = len(arrays["classes"])
+    votes     = np.zeros((len(X), n_classes), dtype=np.intp)
+    pair      = 0
+    for i in range(n_classes):
+        for j in range(i + 1, n_classes):
+            si, sj   = slice(bounds[i], bounds[i + 1]), slice(bounds[j], bounds[j + 1])
+            decision = K[:, si] @ dual_coef[j - 1, si] + K[:, sj] @ dual_coef[i, sj] + arrays["svc_intercept"][pair]
+            votes[:, i] += decision > 0
+            votes[:, j] += decision <= 0
+            pair += 1
+    return arrays["classes"][np.argmax(votes, axis=1)]
+
+
+# Forward pass of MLPClassifier._forward_pass_fast, then the inverse of its label binarizer
+def _predict_mlp(arrays, X, model):
+    activation = X
+    n_layers   = int(arrays["mlp_n_layers"])
+    for i in range(n_layers):
+        activation = activation @ arrays["mlp_coef_{}".format(i)]
+        activation += arrays["mlp_intercept_{}".format(i)]
+        _activate(str(arrays["mlp_activation"] if i < n_layers - 1 else arrays["mlp_out_activation"]), activation)
+    if activation.shape[1] == 1:
+        return arrays["classes"][(activation[:, 0] > 0.5).astype(np.intp)]
+    return arrays["classes"][np.argmax(activation, axis=1)]
+
+
+def _activate(name, X):
+    if name == "relu":
+        np.maximum(X, 0, out=X)
+    elif name == "tanh":
+        np.tanh(X, out=X)
+    elif name == "logistic":
+        np.negative(X, out=X)
+        np.exp(X, out=X)
+        X += 1
+        np.reciprocal(X, out=X)
+    elif name == "softmax":
+        tmp = X - X.max(axis=1)[:, np.newaxis]
+        np.exp(tmp, out=X)
+        X /= X.sum(axis=1)[:, np.newaxis]
+    elif name != "identity":
+        raise ValueError("unknown activation {}".format(name))
+
+
+# Brute-force neighbors by blocks of queries : candidates from the squared distances computed with
+# matrix products (2k per query), then exact distances of the candidates (feature order, as the trees
+# of sklearn) to choose the k neighbors ; for p != 2 the exact distances are computed directly
+def _predict_knn(arrays, X, model, block_size=256):
+    train, labels = arrays["knn_X"], arrays["knn_y"]
+    k, p          = int(arrays["knn_k"]), float(arrays["knn_p"])
+    n_classes     = len(arrays["classes"])
+    prediction    = np.empty(len(X), dtype=np.intp)
+    for start in range(0, len(X), block_size):
+        query = X[start:start + block_size]
+        if p == 2 and 2 * k < len(train):
+            approx     = np.einsum("ij,ij->i", query, query)[:, None] + model._norms[None, :] - 2 * query @ train.T
+            candidates = np.argpartition(approx, 2 * k, axis=1)[:, :2 * k]
+            distance   = _minkowski(query, train[candidates], p)
+        else:
+            candidates = np.broadcast_to(np.arange(len(train)), (len(query), len(train)))
+            distance   = _minkowski(query, train[None], p)
+        order    = np.argpartition(distance, k - 1, axis=1)[:, :k] if k < distance.shape[1] else \
+                   np.broadcast_to(np.arange(distance.shape[1]), distance.shape)
+        index    = np.take_along_axis(candidates, order, axis=1)
+        distance = np.take_along_axis(distance, order, axis=1)
+
+        if str(arrays["knn_weights"]) == "uniform":
+            weights = np.ones(distance.shape)
+        else:
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / distance
+            exact = np.isinf(weights)
+            rows  = exact.any(axis=1)
+            weights[rows] = exact[rows]
+        score = np.zeros((len(query), n_classes))
+        np.add.at(score, (np.arange(len(query))[:, None], labels[index]), weights)
+        prediction[start:start + len(query)] = np.argmax(score, axis=1)
+    return arrays["classes"][prediction]
+
+
+# Minkowski distances of each query to its points ([queries x points x features] or [1 x points x
+# features] for the same points for all), the features are summed in order
+def _minkowski(query, points, p):
+    distance = np.zeros((len(query), points.shape[1]))
+    for f in range(query.shape[1]):
+        diff = np.abs(query[:, f, None] - points[:, :, f])
+        if p == np.inf:
+            np.maximum(distance, diff, out=distance)
+        elif p == 1:
+            distance += diff
+        elif p == 2:
+            distance += diff * diff
+        else:
+            distance += diff ** p
+    if p == 2:
+        return np.sqrt(distance)
+    return distance if p in (1, np.inf) else distance ** (1 / p)
+
+
+# All the samples go down the tree together (float32 features, as sklearn trees)
+def _predict_tree(arrays, X, model):
+    X     = X.astype(np.float32)
+    left  = arrays["tree_left"]
+    node  = np.zeros(len(X), dtype=np.intp)
+    rows  = np.arange(len(X))
+    while True:
+        inner = left[node] != -1
+        if not inner.any():
+            break
+        active    = node[inner]
+        go_left   = X[rows[inner], arrays["tree_feature"][active]] <= arrays["tree_threshold"][active]
+        node[inner] = np.where(go_left, left[active], arrays["tree_right"][active])
+    return arrays["classes"][np.argmax(arrays["tree_value"][node], axis=1)]
+
+
+_PREDICT = {"svc": _predict_svc, "mlp": _predict_mlp, "knn": _predict_knn, "tree": _predict_tree}
+
+
+if __name__ == "__main__":
+    # Synthetic check : chain of the notebook (scaler, PCA, kept features, classifier) exported, loaded
+    # and compared with sklearn on the same windows
+    import os
+    import tempfile
+
+    from sklearn import preprocessing
+    from sklearn.decomposition import PCA
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.svm import SVC
+    from sklearn.tree import DecisionTreeClassifier
+
+    rng     = np.random.default_rng(0)
+    windows = rng.standard_normal((6000, 29, 500))
+    y       = rng.integers(0, 2, len(windows))
+    windows[y == 1, :5] += np.sin(2 * np.pi * 10 * np.arange(500) / 1000)
+    X       = band_power_features(windows.transpose(1, 0, 2).reshape(29, -1), 1000, 500, hop=500)
+    scaler  = preprocessing.StandardScaler().fit(X)
+    pca     = PCA(n_components=15).fit(scaler.transform(X))
+    keep    = np.arange(0, 15, 2)
+    Z       = pca.transform(scaler.transform(X))[:, keep]
+    models  = {"SVC": SVC(C=10, gamma=0.1), "MLP": MLPClassifier((10, 10), max_iter=500, random_state=0),
+               "KNN": KNeighborsClassifier(n_neighbors=10, p=1), "tree": DecisionTreeClassifier(max_depth=4)}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, model in models.items():
+            model.fit(Z[:4000], y[:4000])
+            path = os.path.join(directory, name + ".npz")
+            export_model(path, model, scaler, pca, keep, fs=1000, window=500)
+            same   = np.array_equal(load_model(path).predict(windows[4000:]), model.predict(Z[4000:]))
+            report = load_report(path, windows[4000:4256])
+            print("{:5s}: {:7.1f} kB, same predictions {}, import {:.0f} ms + load {:.0f} ms + first batch of "
+                  "256 {:.0f} ms, heavy modules {}".format(name, os.path.getsize(path) / 1e3, same,
+                  report["import_ms"], report["load_ms"], report["predict_ms"], report["heavy_modules"]))
@@ -1,9 +1,15 @@
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import numpy as np
 import os
 root = os.getcwd()
 from pathlib import Path
 
+from compact import TimeAxis
+from epochs import find_transitions
+from profiling import profiled
+from spectrum import SPECTRA
+
 # Some functions are inspired from LGBIO2020 - TP1 ICA & PCA
 
 """--------------------------------------------------------------------------------------------------
@@ -14,8 +20,22 @@ INPUTS:
     - label : list of n strings with channel names (do not consider time)
     - show_fig : True if the plot must be displayed on screen, False otherwise
     - (file_path) : path where the graph must be saved (if needed)
+    - (fast) : True to draw the min/max envelope of the signals at the resolution of the figure,
+               all channels in one LineCollection (see eeg_fast_plot), for long recordings
+    - (time_window) : [start,end] in seconds to plot only a part of the signals (the matrix is
+                      sliced, not copied)
 --------------------------------------------------------------------------------------------------"""
-def eeg_plot(eeg_signals, label, show_fig, file_path=None): 
+@profiled()
+def eeg_plot(eeg_signals, label, show_fig, file_path=None, fast=False, time_window=None): 
+    if time_window is not None:
+        start, end  = np.searchsorted(eeg_signals[0], time_window)
+        if end <= start:
+            raise ValueError("time_window {} contains no sample of the signals".format(list(time_window)))
+        eeg_signals = eeg_signals[:, start:end]
+    if fast:
+        eeg_fast_plot(eeg_signals[1:], label, show_fig, file_path, time=eeg_signals[0])
+        return
+
     # Same y scale for all channels
     bottom = np.amin(eeg_signals[1:eeg_signals.shape[0]])
     top    = np.amax(eeg_signals[1:eeg_signals.shape[0]])
@@ -60,15 +80,101 @@ def eeg_plot(eeg_signals, label, show_fig, file_path=None):
     plt.close()
 
 
+"""--------------------------------------------------------------------------------------------------
+PLOT EEG SIGNALS DEPENDING ON THE TIME, FAST VERSION FOR LONG RECORDINGS
+Each channel is reduced to its min/max envelope on one bin per pixel of the figure (the peaks stay
+visible) and all channels are drawn as one LineCollection, shifted vertically.
+INPUTS: 
+    - signals : a matrix of [nxm] dimensions where n (nb of channels) << m, without the time vector
+                (can be a np.memmap, e.g. EEGStore.data : only the plotted window is read)
+    - label : list of n strings with channel names
+    - show_fig : True if the plot must be displayed on screen, False otherwise
+    - (file_path) : path where the graph must be saved (if needed)
+    - (freq_acquisition) : frequence of acquisition (used if time is None)
+    - (time_window) : [start,end] in seconds to plot only a part of the signals (ValueError if it
+                      contains no sample)
+    - (time) : time vector of [m] length, or None to compute it from the frequence of acquisition
+               (compact.TimeAxis)
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def eeg_fast_plot(signals, label, show_fig, file_path=None, freq_acquisition=1000, time_window=None, time=None):
+    if time is None:
+        time       = TimeAxis(signals.shape[1], freq_acquisition)
+        start, end = (0, signals.shape[1]) if time_window is None else \
+                     np.clip(np.round(np.array(time_window) * freq_acquisition).astype(int), 0, signals.shape[1])
+    else:
+        start, end = (0, signals.shape[1]) if time_window is None else np.searchsorted(time, time_window)
+    if end <= start:
+        raise ValueError("no sample to plot : time_window {} is outside the {} samples of the signals".format(
+            None if time_window is None else list(time_window), signals.shape[1]))
+    time_of = lambda idx: time[start + idx]
+    signals = signals[:, start:end]
+
+    fig, ax = plt.subplots(figsize=(12,8))
+    n_bins  = int(fig.get_figwidth() * fig.dpi)
+    envelopes = [envelope(signals[idx], n_bins) for idx in range(signals.shape[0])]
+
+    # Same y scale for all channels, one channel every half range (like hspace=-0.5 in eeg_plot)
+    bottom  = min(lo.min() for _, lo, _ in envelopes)
+    top     = max(hi.max() for _, _, hi in envelopes)
+    spacing = 0.5 * (top - bottom) if top > bottom else 1
+    offsets = -spacing * np.arange(signals.shape[0])
+
+    lines = []
+    for (idx, lo, hi), offset in zip(envelopes, offsets):
+        x = np.repeat(time_of(idx), 2)
+        y = np.column_stack((lo, hi)).ravel() + offset
+        lines.append(np.column_stack((x, y)))
+    ax.add_collection(LineCollection(lines, linewidths=0.5, colors='C0'))
+
+    ax.set_xlim(time_of(0), time_of(max(signals.shape[1]-1, 0)))
+    ax.set_ylim(offsets[-1] + bottom, top)
+    ax.set_yticks(offsets)
+    ax.set_yticklabels(label)
+    ax.tick_params(left=False)
+    for side in ['top', 'right', 'left']:
+        ax.spines[side].set_visible(False)
+    ax.set_xlabel('Time (sec)')
+
+    # Save file
+    if file_path:
+        if not os.path.exists(Path(file_path).parent):
+            os.makedirs(Path(file_path).parent)
+        plt.savefig(file_path)
+
+    # Display graph on screen
+    if show_fig:
+        plt.show()
+    plt.close()
+
+
+"""--------------------------------------------------------------------------------------------------
+MIN/MAX ENVELOPE OF A SIGNAL
+INPUTS: 
+    - signal : vector of [m] length
+    - n_bins : number of bins (pixels)
+OUTPUTS:
+    - idx : index of the first sample of each bin
+    - lo, hi : min and max of the signal in each bin
+--------------------------------------------------------------------------------------------------"""
+def envelope(signal, n_bins):
+    idx = np.arange(0, len(signal), max(len(signal) // max(n_bins, 1), 1))
+    return idx, np.minimum.reduceat(signal, idx), np.maximum.reduceat(signal, idx)
+
+
 """--------------------------------------------------------------------------------------------------
 PLOT EEG SIGNALS DEPENDING ON THE TIME WITH THE TARGET
 INPUTS: 
     - eeg_signals : a matrix of [nxm] dimensions where n (nb of channels) << m 
     - target : vector of [m] length
     - label : list of n strings with channel names (do not consider time)
-    - time : vector of [m] length
+    - (time) : vector of [m] length, or None to compute it from the frequence of acquisition
+    - (freq_acquisition) : frequence of acquisition (used if time is None)
 --------------------------------------------------------------------------------------------------"""
-def eeg_target_plot(eeg_signals,target,label,time):
+@profiled()
+def eeg_target_plot(eeg_signals,target,label,time=None,freq_acquisition=1000):
+    if time is None:
+        time = TimeAxis(len(target), freq_acquisition)
     for i in range(np.shape(eeg_signals)[0]):
         fig, axs = plt.subplots(2,1,figsize=(16,10))
         fig.tight_layout()
@@ -89,16 +195,15 @@ INPUTS:
     - freq_acquisition : frequence of acquisition
 --------------------------------------------------------------------------------------------------"""
 
+@profiled()
 def eeg32_freq_plot(eeg_signals,label,freq_acquisition):
     for i in range(4):
         fig, axs = plt.subplots(4, 2,figsize=(16,10))
         fig.tight_layout()
         axs =axs.flatten()
         for j in range(8):
-            signal_freq = np.fft.fftshift(np.fft.fft(eeg_signals[i*8 + j]))
-            signal_freq_abs = np.fft.fftshift(np.fft.fftfreq(signal_freq.size,d=1/freq_acquisition))
-            axs[j].plot(signal_freq_abs[(len(signal_freq_abs)//2):],
-                                                            (np.abs(signal_freq[(len(signal_freq_abs)//2):])))
+            signal_freq_abs, signal_freq = SPECTRA.half_spectrum(eeg_signals[i*8 + j], freq_acquisition)
+            axs[j].plot(signal_freq_abs, signal_freq)
             axs[j].set_title(label[i*8 +j])
             axs[j].set_ylim(0,150e4)
         name = "figures/frequential/signal_freq_{}.png".format(i)
@@ -116,22 +221,21 @@ INPUTS:
     - freq_acquisition : frequence of acquisition
 --------------------------------------------------------------------------------------------------"""
 
+@profiled()
 def comparison_filtering_plot(eeg_signals,eeg_filtering_signals,freq_acquisition,label):
     for i in range(len(label)):
         fig, axs = plt.subplots(1, 2,figsize=(18,8))
 
-        signal_freq = np.fft.fftshift(np.fft.fft(eeg_signals[i]))
-        signal_freq_abs = np.fft.fftshift(np.fft.fftfreq(signal_freq.size,d=1/freq_acquisition))
-        axs[0].plot(signal_freq_abs[(len(signal_freq_abs)//2):],(np.abs(signal_freq[(len(signal_freq_abs)//2):])))
+        signal_freq_abs, signal_freq = SPECTRA.half_spectrum(eeg_signals[i], freq_acquisition)
+        axs[0].plot(signal_freq_abs, signal_freq)
         axs[0].set_ylim(0,150e4)
         axs[0].set_xlabel('freqence [Hz]')
         axs[0].set_ylabel('amplitude')
         axs[0].set_title("Fourier transform of {} before filtering".format(label[i]))
 
-        signal_freq_1 = np.fft.fftshift(np.fft.fft(eeg_filtering_signals[i]))
-        signal_freq_abs_1 = np.fft.fftshift(np.fft.fftfreq(signal_freq_1.size,d=1/freq_acquisition))
+        signal_freq_abs_1, signal_freq_1 = SPECTRA.half_spectrum(eeg_filtering_signals[i], freq_acquisition)
 
-        axs[1].plot(signal_freq_abs_1[(len(signal_freq_abs_1)//2):],(np.abs(signal_freq_1[(len(signal_freq_abs_1)//2):])))
+        axs[1].plot(signal_freq_abs_1, signal_freq_1)
         axs[1].set_ylim(0,1e6)
         axs[1].set_xlim(0,50)
         axs[1].set_xlabel('freqence [Hz]')
@@ -148,18 +252,20 @@ PLOT DELAY BETWEEN TARGET AND EEG
 INPUTS: 
     - eeg_signals : a vector of [m] length
     - target :  a vector of [m] length
-    - time :  a vector of [m] length
+    - (time) :  a vector of [m] length, or None to compute it from the frequence of acquisition
+    - (freq_acquisition) : frequence of acquisition (used if time is None)
 --------------------------------------------------------------------------------------------------"""
-def delay_plot(eeg_signal,target,time):
-    for i in range(len(eeg_signal)-1):
-        if not np.isnan(target[i]) and not np.isnan(target[i+1]):
-            if target[i] != target[i+1]:
-                fig, axs = plt.subplots(2, 1,figsize=(16,10))
-                axs[0].plot(time[i-6000:i+6000],eeg_signal[i-6000:i+6000])
-                axs[0].set_xlim(time[i-6000],time[i+6000])
-                axs[1].plot(time[i-6000:i+6000],target[i-6000:i+6000])
-                axs[1].set_xlim(time[i-6000],time[i+6000])
-                axs[1].set_xlabel("time[ms]")
-                name = "figures/delay/delay_nofilter_{}.png".format(i)
-                fig.savefig(name)
-                plt.close()
+@profiled()
+def delay_plot(eeg_signal,target,time=None,freq_acquisition=1000):
+    if time is None:
+        time = TimeAxis(len(target), freq_acquisition)
+    for i in find_transitions(target)[0]:
+        fig, axs = plt.subplots(2, 1,figsize=(16,10))
+        axs[0].plot(time[i-6000:i+6000],eeg_signal[i-6000:i+6000])
+        axs[0].set_xlim(time[i-6000],time[i+6000])
+        axs[1].plot(time[i-6000:i+6000],target[i-6000:i+6000])
+        axs[1].set_xlim(time[i-6000],time[i+6000])
+        axs[1].set_xlabel("time[ms]")
+        name = "figures/delay/delay_nofilter_{}.png".format(i)
+        fig.savefig(name)
+        plt.close()
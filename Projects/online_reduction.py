@@ -0,0 +1,169 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Scaler and PCA fitted on batches of windows in one pass : the mean, the variance and the covariance
+# of the features are updated batch by batch (Welford / Chan et al.), so the memory does not depend on
+# the number of windows and the whole explained-variance curve is known after the pass
+#####################################################################################################
+
+import numpy as np
+
+from features import band_power_features
+
+
+"""--------------------------------------------------------------------------------------------------
+ONLINE STANDARD SCALER
+Same mean_, var_ and scale_ as sklearn.preprocessing.StandardScaler fitted on all the batches at once.
+--------------------------------------------------------------------------------------------------"""
+class OnlineScaler:
+
+    def __init__(self):
+        self.n_samples_seen_ = 0
+        self.mean_           = None
+        self._m2             = None
+
+    # Update the statistics with a batch of [(nb of windows) x (nb of features)] dimensions
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return self
+        n, mean = len(X), X.mean(axis=0)
+        m2      = ((X - mean) ** 2).sum(axis=0)
+        if self.mean_ is None:
+            self.n_samples_seen_, self.mean_, self._m2 = n, mean, m2
+            return self
+        total = self.n_samples_seen_ + n
+        delta = mean - self.mean_
+        self.mean_ = self.mean_ + delta * n / total
+        self._m2   = self._m2 + m2 + delta ** 2 * self.n_samples_seen_ * n / total
+        self.n_samples_seen_ = total
+        return self
+
+    # Fit on an iterable of batches
+    def fit(self, batches):
+        for X in batches:
+            self.partial_fit(X)
+        return self
+
+    @property
+    def var_(self):
+        return self._m2 / self.n_samples_seen_
+
+    @property
+    def scale_(self):
+        scale = np.sqrt(self.var_)
+        return np.where(scale == 0, 1.0, scale)
+
+    def transform(self, X):
+        return (np.asarray(X) - self.mean_) / self.scale_
+
+
+"""--------------------------------------------------------------------------------------------------
+ONLINE PCA
+The covariance of the features is accumulated batch by batch and diagonalized once : all the
+components are available, any n_components is read from explained_variance_ratio_ without refitting.
+The result is the one of sklearn.decomposition.PCA (and StandardScaler before it when standardize)
+fitted on all the windows, the sign of each component being chosen so that its largest coefficient
+is positive.
+INPUTS:
+    - n_components : default number of components of transform (all if None)
+    - standardize : True to do the PCA of the standardized features (scaler fitted in the same pass,
+                    available as .scaler)
+--------------------------------------------------------------------------------------------------"""
+class OnlinePCA:
+
+    def __init__(self, n_components=None, standardize=True):
+        self.n_components    = n_components
+        self.standardize     = standardize
+        self.n_samples_seen_ = 0
+        self.mean_           = None
+        self._scatter        = None
+        self._solved         = False
+
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return self
+        n, mean  = len(X), X.mean(axis=0)
+        centered = X - mean
+        scatter  = centered.T @ centered
+        if self.mean_ is None:
+            self.n_samples_seen_, self.mean_, self._scatter = n, mean, scatter
+        else:
+            total = self.n_samples_seen_ + n
+            delta = mean - self.mean_
+            self.mean_    = self.mean_ + delta * n / total
+            self._scatter = self._scatter + scatter + np.outer(delta, delta) * self.n_samples_seen_ * n / total
+            self.n_samples_seen_ = total
+        self._solved = False
+        return self
+
+    def fit(self, batches):
+        for X in batches:
+            self.partial_fit(X)
+        return self
+
+    # Scaler of the features (same as OnlineScaler fitted on the same batches)
+    @property
+    def scaler(self):
+        scaler = OnlineScaler()
+        scaler.n_samples_seen_, scaler.mean_, scaler._m2 = self.n_samples_seen_, self.mean_, np.diag(self._scatter).copy()
+        return scaler
+
+    @property
+    def components_(self):
+        self._solve()
+        return self._components
+
+    @property
+    def explained_variance_(self):
+        self._solve()
+        return self._variance
+
+    @property
+    def explained_variance_ratio_(self):
+        self._solve()
+        return self._variance / self._variance.sum() if self._variance.sum() > 0 else self._variance
+
+    # Smallest number of components that explains at least `ratio` of the variance
+    def n_components_for(self, ratio):
+        return int(np.searchsorted(np.cumsum(self.explained_variance_ratio_), ratio - 1e-12) + 1)
+
+    def transform(self, X, n_components=None):
+        n_components = n_components or self.n_components or len(self.mean_)
+        X = np.asarray(X, dtype=np.float64) - self.mean_
+        if self.standardize:
+            X = X / self.scaler.scale_
+        return X @ self.components_[:n_components].T
+
+    def _solve(self):
+        if self._solved:
+            return
+        if self.n_samples_seen_ < 2:
+            raise ValueError("OnlinePCA needs at least 2 windows, {} were seen".format(self.n_samples_seen_))
+        covariance = self._scatter / (self.n_samples_seen_ - 1)
+        if self.standardize:
+            scale      = self.scaler.scale_
+            covariance = covariance / np.outer(scale, scale)
+        variance, vectors = np.linalg.eigh(covariance)
+        order      = np.argsort(variance)[::-1]
+        components = vectors[:, order].T
+        signs      = np.sign(components[np.arange(len(components)), np.argmax(np.abs(components), axis=1)])
+        self._components = components * np.where(signs == 0, 1, signs)[:, None]
+        self._variance   = np.clip(variance[order], 0, None)
+        self._solved     = True
+
+
+"""--------------------------------------------------------------------------------------------------
+FEATURE BATCHES OF A RECORDING IN MEMORY
+INPUTS:
+    - signals : a matrix of [nxm] dimensions (filtered signals without NaN)
+    - fs : frequence of acquisition
+    - starts : first sample of each window (e.g. segmentation.segment_starts)
+    - batch_size : number of windows per batch
+    - kwargs : parameters of features.band_power_features (window, bands, welch)
+OUTPUT:
+    - generator of feature matrices of [batch_size x (n * nb of bands)] dimensions
+--------------------------------------------------------------------------------------------------"""
+def feature_batches(signals, fs, starts, batch_size=4096, **kwargs):
+    for start in range(0, len(starts), batch_size):
+        yield band_power_features(signals, fs, starts=starts[start:start + batch_size], **kwargs)
@@ -0,0 +1,116 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Out-of-core dataset : the recording goes chunk by chunk through the wavelet filter, the deletion of
+# the NaN of the target and the band-power features, only the feature matrix is kept in memory
+#####################################################################################################
+
+import numpy as np
+
+from compact import target_parts
+from features import LST_ONDE, band_power_features
+from profiling import profiled, stage
+from segmentation import segment_starts
+from wavelet_filter import WaveletBandFilter
+
+
+"""--------------------------------------------------------------------------------------------------
+CHANNELS OF AN EEGStore READ CHUNK BY CHUNK
+EEGStore.get copies all the samples of the channels when they are not evenly spaced (ch_names_kept),
+here only the samples of the requested chunk are read.
+INPUTS:
+    - store : EEGStore
+    - channels : list of channel names or indexes (all channels if None)
+--------------------------------------------------------------------------------------------------"""
+class StoreChannels:
+
+    def __init__(self, store, channels=None):
+        self.store    = store
+        self.channels = list(store.ch_names) if channels is None else list(channels)
+        self.shape    = (len(self.channels), store.n_samples)
+        self.dtype    = store.dtype
+
+    def __getitem__(self, index):
+        rows, samples = index
+        return self.store.get(self.channels, samples.start, samples.stop)[rows]
+
+
+"""--------------------------------------------------------------------------------------------------
+DATASET OF THE PROJECT, CHUNK BY CHUNK
+The output is the same as extract_features(filter_signals(signals), target, *select_segments(target)):
+ - each chunk is filtered with the overlap of the wavelet (WaveletBandFilter.overlap) on both sides,
+   so its filtered samples are exactly those of the whole recording,
+ - the samples where the target is NaN are removed from the chunk,
+ - the windows of the segments that end inside the chunk are transformed, the last window-1 samples
+   are kept for the windows that continue in the next chunk.
+The segments are selected on the whole target (a vector of m values, like one channel).
+Peak memory is a few [n x chunk_size] blocks plus the feature matrix (see chunked_batches to get
+the features chunk by chunk).
+INPUTS:
+    - signals : a matrix of [nxm] dimensions (np.memmap, EEGStore.data or StoreChannels)
+    - target : vector of [m] length or CompactTarget
+    - freq_acquisition : frequence of acquisition
+    - band_filter : WaveletBandFilter (db4, level 7, D7-D6-D5 if None)
+    - window, step, guard : parameters of the segmentation
+    - bands : list of (lo, hi) frequency bands in Hz
+    - chunk_size : number of samples per chunk
+    - filtered_out : None or a matrix of [nxm] dimensions (e.g. np.memmap) where the filtered
+                     signals are written
+OUTPUT:
+    - X : matrix of [(nb of segments) x (n * nb of bands)] dimensions
+    - y : target of each segment
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def chunked_dataset(signals, target, freq_acquisition=1000, band_filter=None, window=500, step=100,
+                    guard=1500, bands=LST_ONDE, chunk_size=2 ** 16, filtered_out=None):
+    batches = list(chunked_batches(signals, target, freq_acquisition, band_filter, window, step, guard, bands,
+                                   chunk_size, filtered_out))
+    n_columns = signals.shape[0] * len(bands)
+    dtype     = np.result_type(signals.dtype, np.float32)
+    X = np.concatenate([X for X, _ in batches]) if batches else np.empty((0, n_columns), dtype=dtype)
+    y = np.concatenate([y for _, y in batches]) if batches else np.empty(0)
+    return X, y
+
+
+"""--------------------------------------------------------------------------------------------------
+FEATURES OF THE SEGMENTS, CHUNK BY CHUNK
+Same computation as chunked_dataset, the features are given chunk by chunk instead of being gathered
+(e.g. for online_reduction.OnlinePCA.partial_fit, the memory does not depend on the recording).
+INPUTS:
+    - same as chunked_dataset
+OUTPUT:
+    - generator of (X, y) for the segments that end in each chunk (chunks without any segment are
+      skipped)
+--------------------------------------------------------------------------------------------------"""
+def chunked_batches(signals, target, freq_acquisition=1000, band_filter=None, window=500, step=100,
+                    guard=1500, bands=LST_ONDE, chunk_size=2 ** 16, filtered_out=None):
+    band_filter = WaveletBandFilter() if band_filter is None else band_filter
+    if len(target) != signals.shape[1]:
+        raise ValueError("target has {} samples, the signals {}".format(len(target), signals.shape[1]))
+
+    with stage("segments"):
+        valid, labels = target_parts(target)
+        starts        = segment_starts(labels, window, step, guard)
+        # Index, in the signals without NaN, of the first sample of each chunk
+        offsets       = np.concatenate(([0], np.cumsum(valid)))
+
+    tail, tail_start, done = None, 0, 0
+    for start, stop, filtered in band_filter.filter_chunks(signals, chunk_size):
+        if filtered_out is not None:
+            filtered_out[:, start:stop] = filtered
+
+        with stage("chunk_features"):
+            deleted = np.compress(valid[start:stop], filtered, axis=1)
+            buffer  = deleted if tail is None else np.concatenate((tail, deleted), axis=1)
+            end     = offsets[stop]
+            last    = np.searchsorted(starts, end - window, side="right")
+            batch   = None
+            if last > done:
+                batch = (band_power_features(buffer, freq_acquisition, window, bands=bands,
+                                             starts=starts[done:last] - tail_start), labels[starts[done:last]])
+                done  = last
+
+            keep       = min(window - 1, buffer.shape[1])
+            tail       = buffer[:, buffer.shape[1] - keep:].copy()
+            tail_start = end - keep
+        if batch is not None:
+            yield batch
@@ -0,0 +1,178 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Pipeline of the project notebook as functions : loading, wavelet filtering, deletion of the NaN
+# of the target, selection of the segments and band-power features
+#####################################################################################################
+
+import numpy as np
+import pandas as pd
+
+from compact import CompactTarget, target_parts
+from eeg_store import load_eeg
+from features import LST_ONDE, LST_ONDE_NAME, band_power_features, band_power_names
+from out_of_core import StoreChannels, chunked_dataset
+from profiling import profiled, stage
+from segmentation import segment_starts
+from wavelet_filter import WaveletBandFilter
+
+CH_NAMES = ['Fp1', 'Fpz', 'Fp2', 'F7', 'F3', 'Fz', 'F4', 'F8',
+            'FC5', 'FC1', 'FC2', 'FC6', 'M1', 'T7', 'C3', 'CZ', 'C4', 'T8',
+            'M2', 'CP5', 'CP1', 'CP2', 'CP6', 'P7', 'P3', 'PZ', 'P4', 'P8', 'POz', 'O1', 'Oz', 'O2']
+
+CH_NAMES_KEPT = ['Fp1', 'Fpz', 'Fp2', 'F7', 'F3', 'Fz', 'F4', 'F8',
+                 'FC5', 'FC6', 'M1', 'T7', 'C3', 'C4', 'T8',
+                 'M2', 'CP5', 'CP1', 'CP2', 'CP6', 'P7', 'P3', 'PZ', 'P4', 'P8', 'POz', 'O1', 'Oz', 'O2']
+
+FREQ_ACQUISITION = 1000
+
+
+"""--------------------------------------------------------------------------------------------------
+LOAD THE EEG RECORDING AND THE TARGET
+INPUTS:
+    - eeg_path : path of EEG_data.csv (converted once into a binary store next to it)
+    - target_path : path of target.csv
+    - ch_names : list of the 32 channel names
+    - freq_acquisition : frequence of acquisition
+    - compact : True for a float32 store and a CompactTarget (int8 labels and a bitmask)
+OUTPUT:
+    - store : EEGStore of the recording (store.time() is its time vector, computed from the frequence
+              of acquisition instead of stored)
+    - target : vector of [m] length (NaN where the target is unknown) or CompactTarget
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def load_recording(eeg_path, target_path, ch_names=CH_NAMES, freq_acquisition=FREQ_ACQUISITION, compact=False):
+    store  = load_eeg(eeg_path, None, freq_acquisition, ch_names, "float32" if compact else "float64")
+    with stage("read_target"):
+        target = pd.read_csv(target_path).T.to_numpy()[0]
+    if compact:
+        target = CompactTarget.from_float(target)
+    return store, target
+
+
+"""--------------------------------------------------------------------------------------------------
+WAVELET FILTERING OF THE SIGNALS (EEG_data_numpy_wavelet in the notebook)
+INPUTS:
+    - signals : a matrix of [nxm] dimensions where n (nb of channels) << m
+    - wavelet, level, keep : parameters of WaveletBandFilter
+    - n_jobs : number of threads
+OUTPUT:
+    - matrix of [nxm] dimensions
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def filter_signals(signals, wavelet="db4", level=7, keep=("D7", "D6", "D5"), n_jobs=1):
+    return WaveletBandFilter(wavelet, level, keep).filter(signals, n_jobs=n_jobs)
+
+
+"""--------------------------------------------------------------------------------------------------
+SELECTION OF THE SEGMENTS
+INPUTS:
+    - target : vector of [m] length or CompactTarget
+    - window, step, guard : parameters of segmentation.segment_starts
+OUTPUT:
+    - valid : boolean vector of [m] length, False where the target is NaN
+    - starts : start of the kept segments, as indexes of the samples where valid is True
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def select_segments(target, window=500, step=100, guard=1500):
+    valid, labels = target_parts(target)
+    starts        = segment_starts(labels, window, step, guard)
+    return valid, starts
+
+
+"""--------------------------------------------------------------------------------------------------
+BAND-POWER FEATURES OF THE SEGMENTS (EEG_data_segmented_numpy / target_segmented_numpy)
+INPUTS:
+    - filtered : filtered signals, matrix of [nxm] dimensions
+    - target : vector of [m] length or CompactTarget
+    - valid, starts : output of select_segments
+    - freq_acquisition : frequence of acquisition
+    - window : number of samples per segment
+    - bands : list of (lo, hi) frequency bands in Hz
+OUTPUT:
+    - X : matrix of [(nb of segments) x (n * nb of bands)] dimensions
+    - y : target of each segment
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def extract_features(filtered, target, valid, starts, freq_acquisition=FREQ_ACQUISITION, window=500, bands=LST_ONDE):
+    deleted = np.compress(valid, filtered, axis=1)
+    X = band_power_features(deleted, freq_acquisition, window, bands=bands, starts=starts)
+    y = target_parts(target)[1][starts]
+    return X, y
+
+
+"""--------------------------------------------------------------------------------------------------
+DATASET OF THE PROJECT, FROM THE CSV FILES TO THE FEATURE MATRIX
+Unlike the notebook cell, the wavelet filter is applied to the kept channels (the cell filtered the
+first len(ch_names_kept) channels of the recording).
+With a FeatureCache, every stage is stored under the hash of the csv files and of its parameters :
+changing only a classifier hyperparameter loads the features directly, changing the bands reuses the
+filtered signals and the segments.
+INPUTS:
+    - eeg_path : path of EEG_data.csv
+    - target_path : path of target.csv
+    - ch_names : list of the 32 channel names
+    - ch_names_kept : channels used for the features
+    - freq_acquisition : frequence of acquisition
+    - wavelet, level, keep : parameters of the wavelet filter
+    - window, step, guard : parameters of the segmentation
+    - bands, band_names : frequency bands of the features
+    - cache : FeatureCache or None
+    - n_jobs : number of threads of the wavelet filter
+    - chunk_size : None to load the kept channels in memory, or number of samples per chunk to
+                   build the features out of core (see out_of_core.chunked_dataset, only the
+                   features are cached)
+    - compact : True to store the signals in float32 and the target as int8 labels with a bitmask
+                (X in float32, y in int8, see evaluation.precision_report for the effect on accuracy)
+OUTPUT:
+    - X : feature matrix
+    - y : target of each segment
+    - features_name : name of each column of X
+--------------------------------------------------------------------------------------------------"""
+@profiled()
+def build_dataset(eeg_path, target_path, ch_names=CH_NAMES, ch_names_kept=CH_NAMES_KEPT,
+                  freq_acquisition=FREQ_ACQUISITION, wavelet="db4", level=7, keep=("D7", "D6", "D5"),
+                  window=500, step=100, guard=1500, bands=LST_ONDE, band_names=LST_ONDE_NAME,
+                  cache=None, n_jobs=1, chunk_size=None, compact=False):
+    store, target  = load_recording(eeg_path, target_path, ch_names, freq_acquisition, compact)
+    features_name  = band_power_names(ch_names_kept, band_names)
+
+    if chunk_size is not None:
+        compute = lambda: dict(zip(("X", "y"), chunked_dataset(
+            StoreChannels(store, ch_names_kept), target, freq_acquisition, WaveletBandFilter(wavelet, level, keep),
+            window, step, guard, bands, chunk_size)))
+        if cache is None:
+            dataset = compute()
+        else:
+            dataset, _ = cache.cached(
+                "features",
+                {"eeg": cache.file_hash(eeg_path), "target": cache.file_hash(target_path),
+                 "channels": ch_names_kept, "wavelet": wavelet, "level": level, "keep": keep,
+                 "fs": freq_acquisition, "window": window, "step": step, "guard": guard, "bands": bands,
+                 "compact": compact},
+                compute)
+        return dataset["X"], dataset["y"], features_name
+
+    if cache is None:
+        filtered      = filter_signals(store.get(ch_names_kept), wavelet, level, keep, n_jobs)
+        valid, starts = select_segments(target, window, step, guard)
+        X, y          = extract_features(filtered, target, valid, starts, freq_acquisition, window, bands)
+        return X, y, features_name
+
+    filtered, filtered_key = cache.cached(
+        "filtered",
+        {"eeg": cache.file_hash(eeg_path), "channels": ch_names_kept,
+         "wavelet": wavelet, "level": level, "keep": keep, "compact": compact},
+        lambda: filter_signals(store.get(ch_names_kept), wavelet, level, keep, n_jobs))
+
+    segments, segments_key = cache.cached(
+        "segments",
+        {"target": cache.file_hash(target_path), "window": window, "step": step, "guard": guard},
+        lambda: dict(zip(("valid", "starts"), select_segments(target, window, step, guard))))
+
+    dataset, _ = cache.cached(
+        "features",
+        {"filtered": filtered_key, "segments": segments_key, "fs": freq_acquisition,
+         "window": window, "bands": bands},
+        lambda: dict(zip(("X", "y"), extract_features(filtered, target, segments["valid"], segments["starts"],
+                                                      freq_acquisition, window, bands))))
+    return dataset["X"], dataset["y"], features_name
@@ -0,0 +1,234 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Profiling of the stages of the pipeline : the functions decorated with @profiled (and the blocks in
+# a `with stage(...)`) record their wall time, CPU time, memory and array sizes while a Profiler is
+# active, nested stages included. Without an active Profiler they only cost one test. Only the
+# standard library and numpy are imported, so decorating a module (eeg_store, make_graphs...) with
+# @profiled adds no dependency to it.
+#####################################################################################################
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Active profiler (None when profiling is disabled)
+_PROFILER = None
+
+
+"""--------------------------------------------------------------------------------------------------
+PROFILER OF THE STAGES
+    with Profiler(memory=True) as profiler:
+        X, y, features_name = build_dataset(...)
+    profiler.print_summary()
+    profiler.save_chrome_trace("trace.json")     (chrome://tracing or https://ui.perfetto.dev)
+    profiler.save_flame("profile.folded")        (flamegraph.pl or https://www.speedscope.app)
+INPUTS:
+    - memory : True to trace the memory allocated by each stage with tracemalloc (numpy arrays
+               included), the code runs slower
+--------------------------------------------------------------------------------------------------"""
+class Profiler:
+
+    def __init__(self, memory=False):
+        self.memory  = memory
+        self.records = []
+        self._local  = threading.local()
+        self._origin = None
+
+    def __enter__(self):
+        global _PROFILER
+        if _PROFILER is not None:
+            raise ValueError("a Profiler is already active")
+        self._origin = time.perf_counter()
+        self._tracing = self.memory and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        _PROFILER = self
+        return self
+
+    def __exit__(self, *exc):
+        global _PROFILER
+        _PROFILER = None
+        if self._tracing:
+            tracemalloc.stop()
+        return False
+
+    # Stages opened by the current thread
+    @property
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _open(self, name, arrays):
+        parent = self._stack[-1] if self._stack else None
+        frame  = {"name": name, "path": (parent["path"] + ";" if parent else "") + name,
+                  "depth": len(self._stack), "thread": threading.get_ident(), "children": 0.0,
+                  "input_mb": _array_mb(arrays)}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent["abs_peak"] = max(parent["abs_peak"], peak)
+            tracemalloc.reset_peak()
+            frame["start_mem"], frame["abs_peak"] = current, current
+        self._stack.append(frame)
+        frame["cpu"]   = time.process_time()
+        frame["start"] = time.perf_counter()
+        return frame
+
+    def _close(self, frame, result=None):
+        end = time.perf_counter()
+        cpu = time.process_time() - frame.pop("cpu")
+        self._stack.pop()
+        wall = end - frame["start"]
+        record = OrderedDict([("name", frame["name"]), ("path", frame["path"]), ("depth", frame["depth"]),
+                              ("thread", frame["thread"]), ("start", frame["start"] - self._origin),
+                              ("wall", wall), ("self", wall - frame["children"]), ("cpu", cpu),
+                              ("input_mb", frame["input_mb"]), ("output_mb", _array_mb(result)),
+                              ("peak_mb", None), ("max_rss_mb", max_rss_mb())])
+        if self.memory:
+            frame["abs_peak"] = max(frame["abs_peak"], tracemalloc.get_traced_memory()[1])
+            record["peak_mb"] = (frame["abs_peak"] - frame["start_mem"]) / 2 ** 20
+        if self._stack:
+            parent = self._stack[-1]
+            parent["children"] += wall
+            if self.memory:
+                parent["abs_peak"] = max(parent["abs_peak"], frame["abs_peak"])
+        self.records.append(record)
+
+    """----------------------------------------------------------------------------------------------
+    SUMMARY OF THE STAGES
+    The records are grouped by path (stage;substage;...), in the order of the calls.
+    OUTPUT:
+        - list of dictionaries with path, depth, calls, wall (total), self (wall time outside the
+          substages), cpu, peak_mb (max) and input_mb (total)
+    ----------------------------------------------------------------------------------------------"""
+    def summary(self):
+        groups = OrderedDict()
+        for record in sorted(self.records, key=lambda r: r["start"]):
+            group = groups.setdefault(record["path"], {"path": record["path"], "depth": record["depth"],
+                                                       "calls": 0, "wall": 0.0, "self": 0.0, "cpu": 0.0,
+                                                       "peak_mb": None, "input_mb": 0.0})
+            group["calls"]    += 1
+            group["wall"]     += record["wall"]
+            group["self"]     += record["self"]
+            group["cpu"]      += record["cpu"]
+            group["input_mb"] += record["input_mb"]
+            if record["peak_mb"] is not None:
+                group["peak_mb"] = max(group["peak_mb"] or 0.0, record["peak_mb"])
+        return list(groups.values())
+
+    def print_summary(self):
+        total = sum(r["wall"] for r in self.records if r["depth"] == 0) or 1.0
+        print("{:40s} {:>6s} {:>10s} {:>10s} {:>10s} {:>6s} {:>10s}".format(
+            "stage", "calls", "wall [s]", "self [s]", "cpu [s]", "%", "peak [MB]"))
+        for group in self.summary():
+            name = "  " * group["depth"] + group["path"].split(";")[-1]
+            peak = "" if group["peak_mb"] is None else "{:.1f}".format(group["peak_mb"])
+            print("{:40s} {:6d} {:10.4f} {:10.4f} {:10.4f} {:6.1f} {:>10s}".format(
+                name, group["calls"], group["wall"], group["self"], group["cpu"],
+                100 * group["wall"] / total, peak))
+
+    # Collapsed stacks ("stage;substage self_time_in_us" per line) for flame graph viewers
+    def save_flame(self, file_path):
+        totals = OrderedDict()
+        for record in self.records:
+            totals[record["path"]] = totals.get(record["path"], 0) + record["self"]
+        with open(file_path, "w") as f:
+            for path, seconds in totals.items():
+                f.write("{} {}\n".format(path, int(round(seconds * 1e6))))
+
+    # Trace events of the Chrome trace viewer (complete events, times in us)
+    def save_chrome_trace(self, file_path):
+        events = [{"name": r["name"], "cat": "stage", "ph": "X", "pid": os.getpid(), "tid": r["thread"],
+                   "ts": r["start"] * 1e6, "dur": r["wall"] * 1e6,
+                   "args": {key: r[key] for key in ("cpu", "input_mb", "output_mb", "peak_mb", "max_rss_mb")}}
+                  for r in self.records]
+        with open(file_path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+"""--------------------------------------------------------------------------------------------------
+DECORATOR OF A STAGE
+INPUTS:
+    - name : name of the stage (name of the function if None)
+OUTPUT:
+    - decorator, the size of the arrays in the arguments and in the result of the function are
+      recorded
+--------------------------------------------------------------------------------------------------"""
+def profiled(name=None):
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _PROFILER
+            if profiler is None:
+                return func(*args, **kwargs)
+            frame  = profiler._open(stage_name, (args, kwargs))
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                profiler._close(frame, result)
+        return wrapper
+    return decorator
+
+
+"""--------------------------------------------------------------------------------------------------
+CONTEXT MANAGER OF A STAGE
+    with stage("pca", X=X):
+        ...
+INPUTS:
+    - name : name of the stage
+    - arrays : arrays read by the stage (for their size)
+--------------------------------------------------------------------------------------------------"""
+@contextmanager
+def stage(name, **arrays):
+    profiler = _PROFILER
+    if profiler is None:
+        yield
+        return
+    frame = profiler._open(name, arrays)
+    try:
+        yield
+    finally:
+        profiler._close(frame)
+
+
+def active_profiler():
+    return _PROFILER
+
+
+# Total size in MB of the numpy arrays in a (nested) tuple, list or dictionary
+def _array_mb(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes / 2 ** 20
+    if isinstance(value, (tuple, list)):
+        return sum(_array_mb(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_array_mb(item) for item in value.values())
+    return 0.0
+
+
+# Peak resident memory of the process in MB (None where resource does not exist), also used by
+# batch.py and the benchmarks
+def max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kB on Linux, in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
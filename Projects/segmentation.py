@@ -0,0 +1,75 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Selection of the segments of EEG used to build the dataset
+#####################################################################################################
+
+import numpy as np
+
+
+"""--------------------------------------------------------------------------------------------------
+INDEXES WHERE THE TARGET CHANGES (where_changement in the notebook)
+INPUTS:
+    - target : vector of [m] length
+OUTPUT:
+    - indexes i such that target[i] != target[i+1]
+--------------------------------------------------------------------------------------------------"""
+def label_changes(target):
+    return np.flatnonzero(np.diff(target))
+
+
+"""--------------------------------------------------------------------------------------------------
+START OF THE SEGMENTS KEPT FOR THE DATASET
+A segment starting at i is kept when the target is constant on [i, i+window) and when neither i nor
+i+window is closer than guard samples to a change of the target. Candidates are taken every step
+samples. The output is the same as the to_keep / count loop of the notebook, in O(m).
+INPUTS:
+    - target : vector of [m] length (without NaN, see nan_mask)
+    - window : number of samples per segment
+    - step : number of samples between two candidate segments
+    - guard : minimal distance (in samples) between the edges of a segment and a change
+OUTPUT:
+    - starts : indexes of the first sample of each kept segment (count = len(starts))
+--------------------------------------------------------------------------------------------------"""
+def segment_starts(target, window=500, step=100, guard=1500):
+    target  = np.asarray(target)
+    n       = len(target)
+    changes = label_changes(target)
+    starts  = np.arange(0, max(n - window, 0), step)
+
+    # Constant target : no change between two samples of the segment
+    n_changes = np.zeros(n, dtype=np.int64)
+    np.cumsum(np.diff(target) != 0, out=n_changes[1:])
+    pure = n_changes[starts + window - 1] == n_changes[starts]
+
+    # Forbidden zone : samples p with j - guard < p < j + guard for a change j
+    zone = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(zone, np.clip(changes - guard + 1, 0, n), 1)
+    np.add.at(zone, np.clip(changes + guard, 0, n), -1)
+    forbidden = np.cumsum(zone[:n]) > 0
+
+    keep = pure & ~forbidden[starts] & ~forbidden[starts + window]
+    return starts[keep]
+
+
+"""--------------------------------------------------------------------------------------------------
+INDEXES OF ALL THE SAMPLES OF THE SEGMENTS (to_keep in the notebook)
+INPUTS:
+    - starts : indexes of the first sample of each segment
+    - window : number of samples per segment
+OUTPUT:
+    - vector of [len(starts) * window] length
+--------------------------------------------------------------------------------------------------"""
+def segment_indices(starts, window=500):
+    return (np.asarray(starts)[:, None] + np.arange(window)).ravel()
+
+
+"""--------------------------------------------------------------------------------------------------
+SAMPLES WHERE THE TARGET IS DEFINED
+INPUTS:
+    - target : vector of [m] length
+OUTPUT:
+    - boolean vector of [m] length, False where the target is NaN
+      (eeg[:, mask] and target[mask] give EEG_data_numpy_deleted and target_numpy_deleted)
+--------------------------------------------------------------------------------------------------"""
+def nan_mask(target):
+    return ~np.isnan(target)
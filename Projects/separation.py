@@ -0,0 +1,189 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Source separation (ICA or PCA, as in TP1) of long multichannel recordings : the whitening is the PCA
+# of the covariance accumulated chunk by chunk (OnlinePCA), FastICA is fitted on a random subset of the
+# time points, and the unmixing matrix is applied to the whole recording in one streaming pass. The
+# fitted matrices can be kept in a FeatureCache so a session is fitted only once.
+#####################################################################################################
+
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.decomposition import FastICA
+
+from online_reduction import OnlinePCA
+
+
+"""--------------------------------------------------------------------------------------------------
+SEPARATION OF THE SOURCES OF A RECORDING
+sources = unmixing_ @ (signals - mean_), signals ~ mixing_ @ sources + mean_
+INPUTS:
+    - method : "ica" (FastICA on the whitened signals) or "pca" (principal components)
+    - n_components : number of sources (all the channels if None ; the components without variance,
+                     e.g. of a common average reference, are not kept by the ICA)
+    - n_fit : number of time points (drawn at random) used to fit the ICA, all of them if None
+    - chunk_size : number of samples read at once
+    - seed : seed of the subset of time points and of FastICA
+    - max_iter, tol : parameters of FastICA
+--------------------------------------------------------------------------------------------------"""
+class Separation:
+
+    def __init__(self, method="ica", n_components=None, n_fit=50000, chunk_size=2 ** 16, seed=0,
+                 max_iter=400, tol=1e-4):
+        if method not in ("ica", "pca"):
+            raise ValueError("method must be 'ica' or 'pca', not {}".format(method))
+        self.method       = method
+        self.n_components = n_components
+        self.n_fit        = n_fit
+        self.chunk_size   = chunk_size
+        self.seed         = seed
+        self.max_iter     = max_iter
+        self.tol          = tol
+        self.mean_        = None
+
+    # Parameters of the fit, part of the key of the cache
+    def params(self):
+        return {"method": self.method, "n_components": self.n_components, "n_fit": self.n_fit,
+                "seed": self.seed, "max_iter": self.max_iter, "tol": self.tol}
+
+    """----------------------------------------------------------------------------------------------
+    FIT OF THE UNMIXING MATRIX
+    INPUTS:
+        - signals : a matrix of [nxm] dimensions (np.ndarray, np.memmap or StoreChannels)
+        - cache : None or FeatureCache where the matrices are kept
+        - key : identifier of the recording in the cache (e.g. cache.file_hash of its csv), the hash
+                of the content of signals if None
+    OUTPUT:
+        - self, with mean_, unmixing_ [k x n], mixing_ [n x k], explained_variance_ratio_ and
+          fit_time_ (time of the call, i.e. the load time when the matrices come from the cache)
+    ----------------------------------------------------------------------------------------------"""
+    def fit(self, signals, cache=None, key=None):
+        start = time.perf_counter()
+        if cache is None:
+            state = self._fit(signals)
+        else:
+            key      = cache.array_hash(signals, self.chunk_size) if key is None else key
+            state, _ = cache.cached("unmixing", dict(self.params(), signals=key), lambda: self._fit(signals),
+                                    mmap=False)
+        self.mean_, self.unmixing_, self.mixing_ = state["mean"], state["unmixing"], state["mixing"]
+        self.explained_variance_ratio_ = state["explained_variance_ratio"]
+        self.fit_time_ = time.perf_counter() - start
+        return self
+
+    # Sources of a block of [n x k] samples
+    def transform(self, signals):
+        return self.unmixing_ @ (np.asarray(signals, dtype=np.float64) - self.mean_[:, None])
+
+    # Signals of a block of sources
+    def inverse_transform(self, sources):
+        return self.mixing_ @ np.asarray(sources, dtype=np.float64) + self.mean_[:, None]
+
+    """----------------------------------------------------------------------------------------------
+    SOURCES OF THE WHOLE RECORDING, CHUNK BY CHUNK
+    INPUTS:
+        - signals : a matrix of [nxm] dimensions
+        - out : None or a matrix of [kxm] dimensions (e.g. np.memmap) where the sources are written
+    OUTPUT:
+        - matrix of [kxm] dimensions (out if given)
+    ----------------------------------------------------------------------------------------------"""
+    def transform_all(self, signals, out=None):
+        if out is None:
+            out = np.empty((len(self.unmixing_), signals.shape[1]))
+        for start, stop, sources in self.transform_chunks(signals):
+            out[:, start:stop] = sources
+        return out
+
+    # Generator of (start, stop, sources) over the chunks of the recording
+    def transform_chunks(self, signals):
+        for start in range(0, signals.shape[1], self.chunk_size):
+            stop = min(start + self.chunk_size, signals.shape[1])
+            yield start, stop, self.transform(signals[:, start:stop])
+
+    # Squared norm of signals - inverse_transform(transform(signals)) relative to the one of signals - mean_
+    def reconstruction_error(self, signals):
+        error, norm = 0.0, 0.0
+        for start, stop, sources in self.transform_chunks(signals):
+            block  = np.asarray(signals[:, start:stop], dtype=np.float64)
+            error += float(((block - self.inverse_transform(sources)) ** 2).sum())
+            norm  += float(((block - self.mean_[:, None]) ** 2).sum())
+        return error / norm if norm > 0 else 0.0
+
+    def _fit(self, signals):
+        pca = OnlinePCA(standardize=False)
+        for first in range(0, signals.shape[1], self.chunk_size):
+            pca.partial_fit(np.asarray(signals[:, first:first + self.chunk_size], dtype=np.float64).T)
+        k          = self.n_components or signals.shape[0]
+        components = pca.components_[:k]
+        if self.method == "pca":
+            unmixing = components
+        else:
+            variance  = pca.explained_variance_[:k]
+            k         = int(np.sum(variance > 1e-12 * variance[0]))
+            whitening = components[:k] / np.sqrt(variance[:k])[:, None]
+            points    = _subset(signals, self.n_fit, self.chunk_size, self.seed)
+            white     = whitening @ (points - pca.mean_[:, None])
+            ica       = FastICA(whiten=False, max_iter=self.max_iter, tol=self.tol, random_state=self.seed)
+            ica.fit(white.T)
+            unmixing  = ica.components_ @ whitening
+        return {"mean": pca.mean_, "unmixing": unmixing, "mixing": np.linalg.pinv(unmixing),
+                "explained_variance_ratio": pca.explained_variance_ratio_[:k]}
+
+
+"""--------------------------------------------------------------------------------------------------
+COMPARISON WITH THE FIT OF FastICA ON THE WHOLE RECORDING (TP1)
+INPUTS:
+    - signals : a matrix of [nxm] dimensions
+    - n_components : number of sources
+    - n_fit : number of time points of the subset
+    - seed : seed of both fits
+OUTPUT:
+    - dictionary with the fit time of both, their reconstruction error and the correlation of the
+      sources of the subset fit with the matching sources of the full fit (mean and min over the
+      sources, matched by the Hungarian algorithm on |correlation|)
+--------------------------------------------------------------------------------------------------"""
+def separation_report(signals, n_components=None, n_fit=50000, seed=0):
+    signals = np.asarray(signals, dtype=np.float64)
+    start   = time.perf_counter()
+    # default whitening of FastICA, as in TP1 (its value changed with the version of scikit-learn, the
+    # sources are compared through their correlation and the reconstruction, whatever their scale)
+    full    = FastICA(n_components, max_iter=400, random_state=seed)
+    full_sources = full.fit_transform(signals.T).T
+    full_time    = time.perf_counter() - start
+    full_error   = float(((signals.T - full.inverse_transform(full_sources.T)) ** 2).sum() /
+                         ((signals.T - full.mean_) ** 2).sum())
+
+    separation = Separation("ica", n_components, n_fit, seed=seed).fit(signals)
+    sources    = separation.transform_all(signals)
+    k           = len(sources)
+    correlation = np.abs(np.corrcoef(sources, full_sources)[:k, k:])
+    rows, cols  = linear_sum_assignment(-correlation)
+    return {"full_time": full_time, "subset_time": separation.fit_time_, "speedup": full_time / separation.fit_time_,
+            "full_error": full_error, "subset_error": separation.reconstruction_error(signals),
+            "mean_correlation": float(correlation[rows, cols].mean()),
+            "min_correlation": float(correlation[rows, cols].min())}
+
+
+def print_separation_report(report):
+    print("fit time        : {:.2f} s (full) {:.2f} s (subset) speedup x{:.1f}".format(
+        report["full_time"], report["subset_time"], report["speedup"]))
+    print("reconstruction  : relative error {:.2e} (full) {:.2e} (subset)".format(
+        report["full_error"], report["subset_error"]))
+    print("sources         : |correlation| with the full fit mean {:.4f}, min {:.4f}".format(
+        report["mean_correlation"], report["min_correlation"]))
+
+
+# n_fit time points drawn at random (sorted), read chunk by chunk : matrix of [n x n_fit] dimensions
+def _subset(signals, n_fit, chunk_size, seed):
+    n_samples = signals.shape[1]
+    if n_fit is None or n_fit >= n_samples:
+        index = np.arange(n_samples)
+    else:
+        index = np.sort(np.random.default_rng(seed).choice(n_samples, n_fit, replace=False))
+    bounds = np.searchsorted(index, np.arange(0, n_samples + chunk_size, chunk_size))
+    parts  = []
+    for i, start in enumerate(range(0, n_samples, chunk_size)):
+        if bounds[i + 1] > bounds[i]:
+            block = np.asarray(signals[:, start:start + chunk_size], dtype=np.float64)
+            parts.append(block[:, index[bounds[i]:bounds[i + 1]] - start])
+    return np.concatenate(parts, axis=1)
@@ -0,0 +1,80 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Spectra of the EEG channels : the rfft of a signal is computed once and kept in a memory-bounded
+# cache shared by the plotting functions of make_graphs and export_figures
+#####################################################################################################
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+"""--------------------------------------------------------------------------------------------------
+CACHE OF SPECTRA
+The key of a signal is the hash of its samples (by="hash") or the address, shape and strides of its
+data (by="identity", faster but the signal must not be modified in place), with the frequence of
+acquisition. When the cached spectra take more than max_bytes, the least recently used are removed.
+INPUTS:
+    - max_bytes : memory budget of the cache
+    - by : "hash" or "identity"
+--------------------------------------------------------------------------------------------------"""
+class SpectrumCache:
+
+    def __init__(self, max_bytes=512 * 2 ** 20, by="hash"):
+        if by not in ("hash", "identity"):
+            raise ValueError("by must be 'hash' or 'identity', not {}".format(by))
+        self.max_bytes = max_bytes
+        self.by        = by
+        self.entries   = OrderedDict()
+        self.nbytes    = 0
+        self.hits      = 0
+        self.misses    = 0
+
+    def key(self, signal, fs):
+        if self.by == "identity":
+            ident = (signal.__array_interface__["data"][0], signal.strides)
+        else:
+            ident = hashlib.blake2b(np.ascontiguousarray(signal), digest_size=16).hexdigest()
+        return ident, signal.shape, signal.dtype.str, fs
+
+    # rfft of a signal (vector of [m] length), from the cache if possible
+    def rfft(self, signal, fs):
+        signal = np.asarray(signal)
+        key    = self.key(signal, fs)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        spectrum = np.fft.rfft(signal)
+        spectrum.flags.writeable = False
+        self.entries[key] = spectrum
+        self.nbytes += spectrum.nbytes
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.nbytes -= old.nbytes
+        return spectrum
+
+    """----------------------------------------------------------------------------------------------
+    POSITIVE HALF OF THE SPECTRUM
+    Same values as the fftshift(fft(signal)) of make_graphs, from index len//2 on.
+    INPUTS:
+        - signal : vector of [m] length
+        - fs : frequence of acquisition
+    OUTPUTS:
+        - freqs : frequencies in Hz
+        - amplitude : |X(f)|
+    ----------------------------------------------------------------------------------------------"""
+    def half_spectrum(self, signal, fs):
+        n = len(signal)
+        return np.arange(n - n // 2) * fs / n, np.abs(self.rfft(signal, fs)[:n - n // 2])
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
+# Cache shared by the plotting functions
+SPECTRA = SpectrumCache()
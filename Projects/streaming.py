@@ -0,0 +1,240 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Real-time classification : EEG samples arrive by blocks, the band powers of the last window are
+# updated with a sliding DFT at each hop and the fitted scaler / PCA / classifier give a prediction
+#####################################################################################################
+
+import socket
+import time
+
+import numpy as np
+
+from features import LST_ONDE, band_masks, dft_basis
+
+
+"""--------------------------------------------------------------------------------------------------
+REPLAY OF A RECORDING BLOCK BY BLOCK
+INPUTS:
+    - signals : a matrix of [nxm] dimensions where n (nb of channels) << m (array, np.memmap or
+                EEGStore.get(...))
+    - block_size : number of samples per block
+OUTPUT:
+    - generator of [n x block_size] blocks (the last one can be shorter)
+--------------------------------------------------------------------------------------------------"""
+def replay_blocks(signals, block_size=100):
+    for start in range(0, signals.shape[1], block_size):
+        yield np.asarray(signals[:, start:start + block_size])
+
+
+"""--------------------------------------------------------------------------------------------------
+SEND A RECORDING ON A LOCAL SOCKET (stand-in for the acquisition system)
+Samples are sent as raw little-endian float32, interleaved like the rows of EEG_data.csv.
+INPUTS:
+    - signals : a matrix of [nxm] dimensions where n (nb of channels) << m
+    - address : (host, port) of the receiver
+    - block_size : number of samples per message
+    - realtime : True to wait block_size / fs between two messages
+    - fs : frequence of acquisition (only used if realtime)
+--------------------------------------------------------------------------------------------------"""
+def send_blocks(signals, address, block_size=100, realtime=False, fs=1000):
+    with socket.create_connection(address) as conn:
+        for block in replay_blocks(signals, block_size):
+            conn.sendall(np.ascontiguousarray(block.T, dtype="<f4").tobytes())
+            if realtime:
+                time.sleep(block.shape[1] / fs)
+
+
+"""--------------------------------------------------------------------------------------------------
+RECEIVE EEG BLOCKS FROM A LOCAL SOCKET (format of send_blocks)
+INPUTS:
+    - address : (host, port) to listen on
+    - n_channels : number of channels
+    - block_size : number of samples per block
+OUTPUT:
+    - generator of [n_channels x block_size] blocks, stops when the sender closes the connection
+--------------------------------------------------------------------------------------------------"""
+def socket_blocks(address, n_channels, block_size=100):
+    frame = 4 * n_channels
+    with socket.create_server(address) as server:
+        conn, _ = server.accept()
+        with conn:
+            pending = b""
+            while True:
+                data = conn.recv(frame * block_size)
+                if not data:
+                    break
+                pending += data
+                n_full  = len(pending) // frame
+                if n_full:
+                    block   = np.frombuffer(pending[:n_full * frame], dtype="<f4").reshape(n_full, n_channels)
+                    pending = pending[n_full * frame:]
+                    yield block.T.astype(np.float64)
+
+
+"""--------------------------------------------------------------------------------------------------
+STREAMING CLASSIFIER
+Keeps a ring buffer of the last window of each channel and the DFT of this window on the bins used
+by the bands. At each hop the DFT is updated with the sliding DFT recursion
+    X_k(s+H) = w_k^H X_k(s) + sum_m (x[s+N+m] - x[s+m]) w_k^(H-m)      with w_k = exp(2j pi k / N)
+(one small matrix product for all channels), and recomputed exactly from the ring buffer every
+resync hops to cancel the rounding drift. The band powers are then the features of
+band_power_features on the last window.
+INPUTS:
+    - model : fitted classifier (SVC, MLPClassifier...) with a predict method
+    - n_channels : number of channels of the stream
+    - fs : frequence of acquisition
+    - window : number of samples of the analysed window (500 ms at 1 kHz)
+    - hop : number of samples between two predictions
+    - bands : list of (lo, hi) frequency bands in Hz
+    - scaler : fitted StandardScaler (or None)
+    - pca : fitted PCA (or None)
+    - keep : indexes of the features kept after the scaler / PCA (None to keep all)
+    - resync : number of hops between two exact recomputations of the DFT
+--------------------------------------------------------------------------------------------------"""
+class StreamingClassifier:
+
+    def __init__(self, model, n_channels, fs=1000, window=500, hop=100, bands=LST_ONDE,
+                 scaler=None, pca=None, keep=None, resync=100):
+        self.model      = model
+        self.n_channels = n_channels
+        self.fs         = fs
+        self.window     = window
+        self.hop        = hop
+        self.scaler     = scaler
+        self.pca        = pca
+        self.keep       = keep
+        self.resync     = resync
+
+        masks      = band_masks(window, fs, bands)
+        self.bins  = np.flatnonzero(masks.any(axis=0))
+        self.masks = masks[:, self.bins].astype(np.float64)
+        self.basis = dft_basis(window, self.bins)
+
+        # Sliding DFT coefficients for one hop
+        w = np.exp(2j * np.pi * self.bins / window)
+        self.rotation = w ** hop                                            # (bins,)
+        self.update   = w[None, :] ** (hop - np.arange(hop))[:, None]       # (hop, bins)
+        self.reset()
+
+    # Empty the buffers and the latency measurements
+    def reset(self):
+        self.ring      = np.zeros((self.n_channels, self.window))
+        self.pos       = 0                                                  # oldest sample of the ring
+        self.spectrum  = np.zeros((self.n_channels, len(self.bins)), dtype=complex)
+        self.pending   = np.zeros((self.n_channels, 0))
+        self.n_seen    = 0
+        self.n_hops    = 0
+        self.latencies = []
+
+    """----------------------------------------------------------------------------------------------
+    PROCESS A BLOCK OF SAMPLES
+    INPUTS:
+        - block : matrix of [n_channels x k] dimensions, k can be anything
+    OUTPUT:
+        - list of (index of the last sample of the window, prediction), one per completed hop
+          once the first window is full
+    ----------------------------------------------------------------------------------------------"""
+    def push(self, block):
+        self.pending = np.concatenate([self.pending, block], axis=1)
+        predictions  = []
+        while self.pending.shape[1] >= self.hop:
+            start = time.perf_counter()
+            self._slide(self.pending[:, :self.hop])
+            self.pending = self.pending[:, self.hop:]
+            if self.n_seen >= self.window:
+                label = self.model.predict(self.transform(self.band_powers()[None, :]))[0]
+                predictions.append((self.n_seen - 1, label))
+                self.latencies.append(time.perf_counter() - start)
+        return predictions
+
+    """----------------------------------------------------------------------------------------------
+    CLASSIFY A WHOLE STREAM
+    INPUTS:
+        - blocks : iterable of [n_channels x k] blocks (replay_blocks, socket_blocks...)
+    OUTPUT:
+        - indexes : index of the last sample of the window of each prediction
+        - labels : predictions
+    ----------------------------------------------------------------------------------------------"""
+    def run(self, blocks):
+        predictions = []
+        for block in blocks:
+            predictions.extend(self.push(block))
+        if not predictions:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        indexes, labels = zip(*predictions)
+        return np.array(indexes), np.array(labels)
+
+    # Band powers of the last window, same order as band_power_features
+    def band_powers(self):
+        power = self.spectrum.real ** 2 + self.spectrum.imag ** 2
+        return (power @ self.masks.T).ravel()
+
+    # Scaler, PCA and feature selection fitted offline
+    def transform(self, features):
+        if self.scaler is not None:
+            features = self.scaler.transform(features)
+        if self.pca is not None:
+            features = self.pca.transform(features)
+        if self.keep is not None:
+            features = features[:, self.keep]
+        return features
+
+    """----------------------------------------------------------------------------------------------
+    LATENCY REPORT
+    OUTPUT:
+        - dictionary with the number of hops, the mean / median / 95th percentile / max latency of
+          a hop (in ms), the throughput (samples per second and per channel) and the real-time
+          factor (duration of a hop divided by the mean latency, must be > 1 to keep up)
+    ----------------------------------------------------------------------------------------------"""
+    def report(self):
+        latencies = np.array(self.latencies) * 1e3
+        if len(latencies) == 0:
+            return {"hops": 0}
+        hop_ms = 1e3 * self.hop / self.fs
+        return {
+            "hops"           : len(latencies),
+            "mean_ms"        : latencies.mean(),
+            "median_ms"      : np.median(latencies),
+            "p95_ms"         : np.percentile(latencies, 95),
+            "max_ms"         : latencies.max(),
+            "samples_per_s"  : 1e3 * self.hop / latencies.mean(),
+            "realtime_factor": hop_ms / latencies.mean(),
+        }
+
+    def _slide(self, new):
+        index = (self.pos + np.arange(self.hop)) % self.window
+        old   = self.ring[:, index]
+        self.ring[:, index] = new
+        self.pos     = (self.pos + self.hop) % self.window
+        self.n_seen += self.hop
+        self.n_hops += 1
+
+        if self.n_hops % self.resync == 0:
+            ordered  = np.roll(self.ring, -self.pos, axis=1)
+            exact    = ordered @ self.basis
+            n_bins   = len(self.bins)
+            self.spectrum = exact[:, :n_bins] + 1j * exact[:, n_bins:]
+        else:
+            self.spectrum = self.spectrum * self.rotation + (new - old) @ self.update
+
+
+if __name__ == "__main__":
+    # Keep-up test on synthetic data : 32 channels at 1 kHz, 100-sample hop, SVC on band powers
+    from sklearn import preprocessing
+    from sklearn.decomposition import PCA
+    from sklearn.svm import SVC
+
+    from features import band_power_features
+
+    rng     = np.random.default_rng(0)
+    signals = rng.standard_normal((32, 60 * 1000))
+    X       = band_power_features(signals, 1000, window=500, hop=500)
+    y       = rng.integers(0, 2, len(X))
+    scaler  = preprocessing.StandardScaler().fit(X)
+    pca     = PCA(n_components=10).fit(scaler.transform(X))
+    svc     = SVC(C=10, gamma=0.1).fit(pca.transform(scaler.transform(X)), y)
+
+    clf = StreamingClassifier(svc, 32, scaler=scaler, pca=pca)
+    clf.run(replay_blocks(signals, block_size=40))
+    for key, value in clf.report().items():
+        print("{:16s}: {:.3f}".format(key, value))
@@ -0,0 +1,363 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Hyperparameter sweeps of SVC and KNN without recomputing the distances (GridSearchCV of the notebooks) :
+# the pairwise products / distances of the training windows are computed once, every kernel of the SVC
+# grid is derived from them elementwise and sliced for each fold (SVC with kernel="precomputed"), and
+# all the KNN candidates of a fold are served by one sorted list of the k_max nearest neighbors
+#####################################################################################################
+
+import time
+
+import numpy as np
+from sklearn import config_context, get_config
+from sklearn.base import clone
+from sklearn.model_selection import GridSearchCV, ParameterGrid, check_cv
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import SVC
+
+# Power of the Minkowski distance of the metrics of KNeighborsClassifier
+METRIC_POWER = {"euclidean": 2, "l2": 2, "manhattan": 1, "cityblock": 1, "l1": 1, "chebyshev": np.inf,
+                "infinity": np.inf}
+
+# Options of sklearn.config_context for the fits on the cached kernels (skip_parameter_validation
+# exists since scikit-learn 1.3)
+FAST_CONFIG = {"assume_finite": True}
+if "skip_parameter_validation" in get_config():
+    FAST_CONFIG["skip_parameter_validation"] = True
+
+
+"""--------------------------------------------------------------------------------------------------
+GRID SEARCH WITH CACHED KERNELS AND NEIGHBORS (drop-in replacement of GridSearchCV for SVC and KNN)
+Same folds (check_cv, i.e. StratifiedKFold for cv=10), same accuracy scores, same ranking and same
+refit of the best candidate as GridSearchCV.
+SVC : the kernels are computed like libsvm, feature by feature (rbf from |xi|^2 + |xj|^2 - 2 xi.xj for
+the training part and from |xi - xj|^2 for the test part, poly with repeated squaring), which gives
+the same fits as SVC(kernel="rbf"...) bit for bit as long as the dot products of the BLAS are
+sequential (below 16 features with OpenBLAS), and up to rounding above. The cached matrices (dot
+products and, for rbf, squared distances) are in float32 when they do not fit in max_bytes (the
+results are then only close to the ones of GridSearchCV).
+KNN : the distances are the ones of the trees of sklearn (features summed in order), the candidates
+differing only by leaf_size / algorithm / n_jobs share their results.
+INPUTS:
+    - estimator : SVC or KNeighborsClassifier
+    - param_grid : dictionary (or list of dictionaries) of GridSearchCV
+    - cv : number of folds or splitter (as GridSearchCV)
+    - refit : True to fit the best candidate on the whole data (best_estimator_)
+    - max_bytes : memory budget of the cached SVC matrices
+    - block_size : number of rows of the distances computed at once
+--------------------------------------------------------------------------------------------------"""
+class CachedGridSearchCV:
+
+    def __init__(self, estimator, param_grid, cv=10, refit=True, max_bytes=2 * 2 ** 30, block_size=512):
+        if not isinstance(estimator, (SVC, KNeighborsClassifier)):
+            raise ValueError("estimator must be SVC or KNeighborsClassifier, not {}".format(
+                type(estimator).__name__))
+        self.estimator  = estimator
+        self.param_grid = param_grid
+        self.cv         = cv
+        self.refit      = refit
+        self.max_bytes  = max_bytes
+        self.block_size = block_size
+
+    """----------------------------------------------------------------------------------------------
+    CROSS-VALIDATION OF ALL THE CANDIDATES
+    INPUTS:
+        - X : matrix of [(nb of samples) x (nb of features)] dimensions
+        - y : vector of [nb of samples] length
+    OUTPUT:
+        - self, with cv_results_ (params, split<i>_test_score, mean_test_score, std_test_score,
+          rank_test_score, mean_fit_time), best_index_, best_params_, best_score_, best_estimator_,
+          n_splits_ and the time spent on the distances (cache_time_) and on the candidates
+          (search_time_)
+    ----------------------------------------------------------------------------------------------"""
+    def fit(self, X, y):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        y = np.asarray(y).ravel()
+        candidates = list(ParameterGrid(self.param_grid))
+        folds      = list(check_cv(self.cv, y, classifier=True).split(X, y))
+        self.cache_time_ = 0.0
+
+        start = time.perf_counter()
+        if isinstance(self.estimator, SVC):
+            scores, fit_times = self._svc_scores(X, y, candidates, folds)
+        else:
+            scores, fit_times = self._knn_scores(X, y, candidates, folds)
+        self.search_time_ = time.perf_counter() - start - self.cache_time_
+
+        # Same aggregation and ranking as GridSearchCV
+        means = np.average(scores, axis=1)
+        stds  = np.sqrt(np.average((scores - means[:, np.newaxis]) ** 2, axis=1))
+        ranks = 1 + (means[np.newaxis, :] > means[:, np.newaxis]).sum(axis=1)
+        self.cv_results_ = {"params": candidates, "mean_test_score": means, "std_test_score": stds,
+                            "rank_test_score": ranks.astype(np.int32), "mean_fit_time": fit_times.mean(axis=1)}
+        for f in range(len(folds)):
+            self.cv_results_["split{}_test_score".format(f)] = scores[:, f]
+        self.n_splits_    = len(folds)
+        self.best_index_  = int(ranks.argmin())
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_  = means[self.best_index_]
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)
+
+    def score(self, X, y):
+        return self.best_estimator_.score(X, y)
+
+    # Accuracy of every SVC candidate on every fold : fold by fold, the cached matrices are sliced
+    # once and each kernel is derived once for all the candidates sharing it (e.g. all the C).
+    # Cache : the dot products and the squared norms (training part of rbf, poly, sigmoid, linear)
+    # and, for rbf, one matrix of squared distances (test part)
+    def _svc_scores(self, X, y, candidates, folds):
+        models = [clone(self.estimator).set_params(**params) for params in candidates]
+        for model in models:
+            if model.kernel not in ("rbf", "poly", "sigmoid", "linear"):
+                raise ValueError("SVC kernel {} cannot be cached".format(model.kernel))
+        kernels  = {model.kernel for model in models}
+        start    = time.perf_counter()
+        matrices = 2 if "rbf" in kernels else 1
+        dtype    = np.float64 if matrices * X.shape[0] ** 2 * 8 <= self.max_bytes else np.float32
+        dot      = _pairwise(X, X, "dot", dtype, self.block_size)
+        sq       = _pairwise(X, X, "sq", dtype, self.block_size) if "rbf" in kernels else None
+        norms    = _squares(X)
+        self.cache_time_ += time.perf_counter() - start
+
+        groups = {}
+        for c, model in enumerate(models):
+            groups.setdefault(_kernel_spec(model), []).append(c)
+
+        precomputed = [clone(model).set_params(kernel="precomputed") for model in models]
+        scores, fit_times = np.zeros((len(candidates), len(folds))), np.zeros((len(candidates), len(folds)))
+        # the kernels are finite and the parameters were checked once, the checks of every fit and
+        # predict are skipped
+        with config_context(**FAST_CONFIG):
+            for f, (train, test) in enumerate(folds):
+                dot_train = _block(dot, train, train)
+                dot_test  = _block(dot, test, train)
+                if sq is not None:
+                    # |xi|^2 + |xj|^2 - 2 xi.xj as libsvm for the training part
+                    sq_train = norms[train, None] + norms[None, train] - 2 * dot_train
+                    sq_test  = _block(sq, test, train)
+                for (kernel, gamma, degree, coef0), members in groups.items():
+                    gamma = _gamma(gamma, X[train])
+                    if kernel == "rbf":
+                        K_train, K_test = np.exp(-gamma * sq_train), np.exp(-gamma * sq_test)
+                    else:
+                        K_train, K_test = (_dot_kernel(block, kernel, gamma, degree, coef0)
+                                           for block in (dot_train, dot_test))
+                    for c in members:
+                        start = time.perf_counter()
+                        model = precomputed[c].fit(K_train, y[train])
+                        fit_times[c, f] = time.perf_counter() - start
+                        scores[c, f]    = np.average(model.predict(K_test) == y[test])
+        return scores, fit_times
+
+    # Accuracy of every KNN candidate on every fold : for each distance and each fold, the k_max
+    # nearest training samples of each test sample are sorted once, then every candidate votes with
+    # its first k neighbors
+    def _knn_scores(self, X, y, candidates, folds):
+        models = [clone(self.estimator).set_params(**params) for params in candidates]
+        powers = [_metric_power(model) for model in models]
+        k_max  = {}
+        for model, power in zip(models, powers):
+            if model.weights not in ("uniform", "distance"):
+                raise ValueError("KNN weights {} cannot be cached".format(model.weights))
+            k_max[power] = max(k_max.get(power, 0), model.n_neighbors)
+        classes, labels = np.unique(y, return_inverse=True)
+
+        scores, fit_times = np.zeros((len(candidates), len(folds))), np.zeros((len(candidates), len(folds)))
+        for f, (train, test) in enumerate(folds):
+            for power, k in k_max.items():
+                start = time.perf_counter()
+                index, distance = _nearest(X[test], X[train], power, k, self.block_size)
+                self.cache_time_ += time.perf_counter() - start
+                neighbors = labels[train][index]
+                for c in (c for c, p in enumerate(powers) if p == power):
+                    start = time.perf_counter()
+                    prediction      = _vote(neighbors, distance, models[c].n_neighbors, models[c].weights, len(classes))
+                    fit_times[c, f] = time.perf_counter() - start
+                    scores[c, f]    = np.average(classes[prediction] == y[test])
+        return scores, fit_times
+
+
+"""--------------------------------------------------------------------------------------------------
+COMPARISON WITH GridSearchCV
+INPUTS:
+    - estimator, param_grid, X, y, cv : parameters of both searches
+OUTPUT:
+    - dictionary with the time of both searches, the speedup, the time of the cached distances, and
+      whether the scores of all candidates and the best parameters are the same
+--------------------------------------------------------------------------------------------------"""
+def sweep_report(estimator, param_grid, X, y, cv=10):
+    start  = time.perf_counter()
+    grid   = GridSearchCV(estimator, param_grid, cv=cv).fit(X, y)
+    grid_time = time.perf_counter() - start
+
+    start  = time.perf_counter()
+    cached = CachedGridSearchCV(estimator, param_grid, cv=cv).fit(X, y)
+    cached_time = time.perf_counter() - start
+
+    same_scores = all(np.array_equal(grid.cv_results_["split{}_test_score".format(f)],
+                                     cached.cv_results_["split{}_test_score".format(f)])
+                      for f in range(grid.n_splits_))
+    return {"candidates": len(cached.cv_results_["params"]), "grid_time": grid_time, "cached_time": cached_time,
+            "speedup": grid_time / cached_time, "cache_time": cached.cache_time_, "same_scores": same_scores,
+            "same_best": grid.best_params_ == cached.best_params_, "best_params": cached.best_params_,
+            "best_score": cached.best_score_}
+
+
+def print_sweep_report(name, report):
+    print("{:5s}: {} candidates, GridSearchCV {:.2f} s, cached {:.2f} s (distances {:.2f} s), speedup x{:.1f}, "
+          "same scores {}, same best {} {} ({:.3f})".format(
+              name, report["candidates"], report["grid_time"], report["cached_time"], report["cache_time"],
+              report["speedup"], report["same_scores"], report["same_best"], report["best_params"],
+              report["best_score"]))
+
+
+# Kernel of a candidate : (kernel, gamma, degree, coef0), the parameters that are not used are None
+def _kernel_spec(model):
+    gamma  = None if model.kernel == "linear" else model.gamma
+    degree = model.degree if model.kernel == "poly" else None
+    coef0  = float(model.coef0) if model.kernel in ("poly", "sigmoid") else None
+    return model.kernel, gamma, degree, coef0
+
+
+# Value of gamma on the training part of a fold (as SVC.fit)
+def _gamma(gamma, X_train):
+    if gamma == "scale":
+        variance = X_train.var()
+        return 1.0 / (X_train.shape[1] * variance) if variance != 0 else 1.0
+    if gamma == "auto":
+        return 1.0 / X_train.shape[1]
+    return gamma
+
+
+# poly, sigmoid and linear kernels from the dot products (powi of libsvm for the powers)
+def _dot_kernel(dot, kernel, gamma, degree, coef0):
+    if kernel == "linear":
+        return dot
+    base = gamma * dot + coef0
+    if kernel == "sigmoid":
+        return np.tanh(base)
+    result, times = np.ones_like(base), degree
+    while times > 0:
+        if times % 2 == 1:
+            result *= base
+        base  = base * base
+        times //= 2
+    return result
+
+
+"""--------------------------------------------------------------------------------------------------
+PAIRWISE PRODUCTS OR DISTANCES, BY BLOCKS OF ROWS
+The features are accumulated one at a time (same rounding as the dot products of libsvm and the
+distances of the trees of sklearn, unlike a matrix product).
+INPUTS:
+    - A : matrix of [a x d] dimensions
+    - B : matrix of [b x d] dimensions
+    - kind : "dot" (A B^T) or "sq" (|ai - bj|^2, the rbf of the libsvm prediction)
+    - dtype : dtype of the output
+    - block_size : number of rows computed at once
+OUTPUT:
+    - matrix of [a x b] dimensions
+--------------------------------------------------------------------------------------------------"""
+def _pairwise(A, B, kind, dtype=np.float64, block_size=512):
+    out = np.empty((len(A), len(B)), dtype=dtype)
+    for start in range(0, len(A), block_size):
+        rows  = A[start:start + block_size]
+        block = np.zeros((len(rows), len(B)))
+        for f in range(A.shape[1]):
+            if kind == "sq":
+                diff   = rows[:, f, None] - B[None, :, f]
+                block += diff * diff
+            else:
+                block += rows[:, f, None] * B[None, :, f]
+        out[start:start + len(rows)] = block
+    return out
+
+
+# Rows and columns of a cached matrix, in float64
+def _block(matrix, rows, columns):
+    return np.take(np.take(matrix, rows, axis=0), columns, axis=1).astype(np.float64, copy=False)
+
+
+def _squares(A):
+    norm = np.zeros(len(A))
+    for f in range(A.shape[1]):
+        norm += A[:, f] * A[:, f]
+    return norm
+
+
+def _metric_power(model):
+    params = dict(model.metric_params or {})
+    if model.metric == "minkowski":
+        return float(params.get("p", model.p))
+    if model.metric in METRIC_POWER:
+        return float(METRIC_POWER[model.metric])
+    raise ValueError("KNN metric {} cannot be cached".format(model.metric))
+
+
+# k nearest rows of points for each query, sorted by distance : indexes and distances of
+# [(nb of queries) x k] dimensions
+def _nearest(queries, points, power, k, block_size=512):
+    index    = np.empty((len(queries), k), dtype=np.intp)
+    distance = np.empty((len(queries), k))
+    for start in range(0, len(queries), block_size):
+        rows  = queries[start:start + block_size]
+        block = np.zeros((len(rows), len(points)))
+        for f in range(points.shape[1]):
+            diff = np.abs(rows[:, f, None] - points[None, :, f])
+            if power == np.inf:
+                np.maximum(block, diff, out=block)
+            elif power == 1:
+                block += diff
+            elif power == 2:
+                block += diff * diff
+            else:
+                block += diff ** power
+        if power == 2:
+            block = np.sqrt(block)
+        elif power not in (1, np.inf):
+            block = block ** (1 / power)
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k] if k < len(points) else \
+                  np.broadcast_to(np.arange(len(points)), block.shape)
+        near    = np.take_along_axis(block, nearest, axis=1)
+        order   = np.lexsort((nearest, near), axis=1)
+        index[start:start + len(rows)]    = np.take_along_axis(nearest, order, axis=1)
+        distance[start:start + len(rows)] = np.take_along_axis(near, order, axis=1)
+    return index, distance
+
+
+# Vote of the first k neighbors (weights of KNeighborsClassifier), ties go to the first class
+def _vote(neighbors, distance, k, weights, n_classes):
+    neighbors, distance = neighbors[:, :k], distance[:, :k]
+    if weights == "uniform":
+        weight = np.ones(distance.shape)
+    else:
+        with np.errstate(divide="ignore"):
+            weight = 1.0 / distance
+        exact = np.isinf(weight)
+        rows  = exact.any(axis=1)
+        weight[rows] = exact[rows]
+    score = np.zeros((len(neighbors), n_classes))
+    np.add.at(score, (np.arange(len(neighbors))[:, None], neighbors), weight)
+    return np.argmax(score, axis=1)
+
+
+if __name__ == "__main__":
+    # Grids of the notebook on synthetic band powers (scaler and PCA as in the notebook)
+    from sklearn import preprocessing
+    from sklearn.decomposition import PCA
+
+    rng = np.random.default_rng(0)
+    y   = rng.integers(0, 2, 600)
+    X   = rng.standard_normal((600, 87)) + 0.6 * y[:, None] * (rng.random(87) > 0.7)
+    X   = PCA(n_components=10).fit_transform(preprocessing.StandardScaler().fit_transform(X))
+
+    svc_grid = {"C": [0.1, 1, 10, 100], "gamma": [1, 0.1, 0.01, 0.001], "kernel": ["rbf", "poly", "sigmoid"]}
+    knn_grid = {"n_neighbors": (2, 3, 5, 10), "leaf_size": (20, 40, 1), "p": (1, 2),
+                "weights": ("uniform", "distance"), "metric": ("minkowski", "chebyshev")}
+    print_sweep_report("SVC", sweep_report(SVC(), svc_grid, X, y))
+    print_sweep_report("KNN", sweep_report(KNeighborsClassifier(), knn_grid, X, y))
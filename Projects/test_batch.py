@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pywt")                     # wavelet filter of build_dataset
+
+from batch import aggregate, find_sessions, run_sessions
+from pipeline import CH_NAMES
+
+
+def _write_session(folder, seed):
+    folder.mkdir(parents=True)
+    rng    = np.random.default_rng(seed)
+    target = np.repeat(rng.integers(0, 2, 6), 4000).astype(np.float64)
+    target[:300] = np.nan
+    pd.DataFrame(rng.standard_normal((len(target), len(CH_NAMES))), columns=CH_NAMES).to_csv(
+        folder / "EEG_data.csv", index=False)
+    pd.DataFrame(target).to_csv(folder / "target.csv", index=False)
+
+
+# "a/b_c" and "a_b/c" were both saved as a_b_c
+def test_session_names_are_unique(tmp_path):
+    for folder in ("a/b_c", "a_b/c", "a/b"):
+        (tmp_path / folder).mkdir(parents=True)
+        (tmp_path / folder / "EEG_data.csv").touch()
+        (tmp_path / folder / "target.csv").touch()
+    sessions = find_sessions(tmp_path)
+    assert [s["name"] for s in sessions] == ["a/b", "a/b_c", "a_b/c"]
+    assert [s["subject"] for s in sessions] == ["a", "a", "a_b"]
+
+
+def test_run_and_resume(tmp_path):
+    for folder, seed in (("a/b_c", 0), ("a_b/c", 1)):
+        _write_session(tmp_path / "sessions" / folder, seed)
+    sessions = find_sessions(tmp_path / "sessions")
+    first    = run_sessions(sessions, tmp_path / "out", n_jobs=1, verbose=False)
+    assert [r["status"] for r in first["sessions"]] == ["done", "done"]
+    again    = run_sessions(sessions, tmp_path / "out", n_jobs=1, verbose=False)
+    assert [r["status"] for r in again["sessions"]] == ["skipped", "skipped"]
+    X, y, groups, _ = aggregate(sessions, tmp_path / "out")
+    assert set(groups["session"]) == {"a/b_c", "a_b/c"}
+    assert len(X) == len(y) == sum(r["n_segments"] for r in first["sessions"])
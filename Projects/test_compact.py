@@ -0,0 +1,23 @@
+import numpy as np
+
+from compact import CompactTarget, TimeAxis, target_parts
+
+
+def test_time_axis_matches_arange():
+    time = np.arange(5000) / 1000
+    axis = TimeAxis(5000, 1000)
+    assert len(axis) == len(time)
+    np.testing.assert_array_equal(np.asarray(axis), time)
+    np.testing.assert_array_equal(axis[1200:3400:7], time[1200:3400:7])
+    np.testing.assert_array_equal(axis[[0, 17, -1]], time[[0, 17, -1]])
+    assert axis[-1] == time[-1]
+
+
+def test_compact_target_matches_float_target():
+    rng    = np.random.default_rng(0)
+    target = rng.integers(-1, 3, 1001).astype(np.float64)
+    target[rng.random(1001) < 0.2] = np.nan
+    compact = CompactTarget.from_float(target)
+    np.testing.assert_array_equal(compact.to_float(), target)
+    for part, reference in zip(target_parts(compact), target_parts(target)):
+        np.testing.assert_array_equal(part, reference)
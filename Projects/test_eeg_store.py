@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eeg_store import csv_to_store, load_eeg
+
+
+def _write_csv(path, n_samples=1000, n_channels=4):
+    values = np.random.default_rng(0).standard_normal((n_samples, n_channels))
+    pd.DataFrame(values, columns=["ch{}".format(c) for c in range(n_channels)]).to_csv(path, index=False)
+    return values
+
+
+def test_store_matches_csv(tmp_path):
+    values = _write_csv(tmp_path / "eeg.csv")
+    store  = load_eeg(tmp_path / "eeg.csv")
+    assert store.ch_names == ["ch0", "ch1", "ch2", "ch3"]
+    np.testing.assert_array_equal(store.data, pd.read_csv(tmp_path / "eeg.csv").to_numpy().T)
+    assert store.shape == values.T.shape
+
+
+def test_failed_conversion_leaves_no_store(tmp_path):
+    _write_csv(tmp_path / "eeg.csv")
+    with pytest.raises(ValueError):
+        csv_to_store(tmp_path / "eeg.csv", tmp_path / "eeg.eeg", 1000, ch_names=["a", "b"], chunksize=128)
+    assert list(tmp_path.iterdir()) == [tmp_path / "eeg.csv"]
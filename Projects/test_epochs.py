@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from compact import CompactTarget
+from epochs import epoch_statistics, find_transitions, xcorr_delay
+
+
+def _target(m=20000, seed=0):
+    rng    = np.random.default_rng(seed)
+    target = np.repeat(rng.integers(0, 3, m // 500), 500).astype(np.float64)
+    target[rng.random(m) < 0.001] = np.nan
+    return target
+
+
+# Loop of delay_plot in the notebook
+def test_transitions_match_delay_plot_loop():
+    target = _target()
+    events = [i for i in range(len(target) - 1)
+              if not np.isnan(target[i]) and not np.isnan(target[i + 1]) and target[i] != target[i + 1]]
+    np.testing.assert_array_equal(find_transitions(target)[0], events)
+    np.testing.assert_array_equal(find_transitions(CompactTarget.from_float(target))[0], events)
+
+
+def test_epoch_statistics_match_stacked_epochs():
+    signals = np.random.default_rng(1).standard_normal((3, 20000))
+    events  = find_transitions(_target())[0]
+    mean, var, kept = epoch_statistics(signals, events, before=700, after=900, batch_size=5)
+    epochs = np.stack([signals[:, i - 700:i + 900] for i in kept])
+    np.testing.assert_allclose(mean, epochs.mean(axis=0), atol=1e-12)
+    np.testing.assert_allclose(var, epochs.var(axis=0, ddof=1), atol=1e-12)
+
+
+def test_xcorr_delay_finds_shift():
+    reference = np.random.default_rng(2).standard_normal(2000)
+    epochs    = np.stack([np.roll(reference, 37), np.roll(reference, -12)])[:, None, :]
+    delays, peaks = xcorr_delay(epochs, reference, max_lag=100)
+    np.testing.assert_array_equal(delays[:, 0], [37, -12])
+    assert np.all(peaks > 0.9)
+
+
+# The plotting helpers only need numpy, scipy and matplotlib
+def test_make_graphs_does_not_import_sklearn_or_pywt():
+    code = ("import sys; import make_graphs; "
+            "print(sorted(m for m in sys.modules if m.split('.')[0] in ('sklearn', 'pywt', 'pandas')))")
+    out  = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert out.strip() == "[]"
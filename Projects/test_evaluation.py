@@ -0,0 +1,31 @@
+import numpy as np
+from sklearn.model_selection import KFold, TimeSeriesSplit, cross_val_score
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import SVC
+
+from evaluation import evaluate_models
+
+
+def _data():
+    rng = np.random.default_rng(0)
+    y   = rng.integers(0, 2, 300)
+    X   = rng.standard_normal((300, 6)) + 0.8 * y[:, None] * np.linspace(0, 1, 6) + np.linspace(0, 2, 300)[:, None]
+    return X, y
+
+
+# The folds of the splitter are used as given (TimeSeriesSplit trains only on the past)
+def test_fold_scores_match_cross_val_score():
+    X, y = _data()
+    for cv in (KFold(5), TimeSeriesSplit(3)):
+        for model in (SVC(C=1), KNeighborsClassifier(5)):
+            results = evaluate_models({"model": (model, {})}, X, y, cv=cv, n_jobs=1)
+            np.testing.assert_array_equal(results[0]["fold_scores"], cross_val_score(model, X, y, cv=cv))
+
+
+def test_process_pool_matches_single_process():
+    X, y   = _data()
+    models = {"knn": (KNeighborsClassifier(), {"n_neighbors": [3, 5]})}
+    serial = evaluate_models(models, X, y, cv=TimeSeriesSplit(3), n_jobs=1)
+    pooled = evaluate_models(models, X, y, cv=TimeSeriesSplit(3), n_jobs=2)
+    for a, b in zip(serial, pooled):
+        np.testing.assert_array_equal(a["fold_scores"], b["fold_scores"])
@@ -0,0 +1,48 @@
+import matplotlib.image as mpimg
+import numpy as np
+
+import export_figures
+from export_figures import comparison_jobs, delay_jobs, export_figures as export, freq_jobs, target_jobs
+
+
+def _jobs(directory, signals):
+    target = np.repeat([0.0, 1.0, -1.0], 1000)
+    time   = np.arange(3000) / 1000
+    return target_jobs(signals, target, ["a", "b", "c"], time, directory, window=(0, 3000))
+
+
+def test_second_export_skips_up_to_date_files(tmp_path):
+    signals = np.random.default_rng(0).standard_normal((3, 3000))
+    drawn   = export(_jobs(tmp_path, signals), n_jobs=1)
+    assert sorted(drawn) == sorted(str(tmp_path / "signal_target_{}.png".format(c)) for c in "abc")
+    assert export(_jobs(tmp_path, signals), n_jobs=1) == []
+
+    signals[1, 10] += 1
+    assert export(_jobs(tmp_path, signals), n_jobs=1) == [str(tmp_path / "signal_target_b.png")]
+    (tmp_path / "signal_target_c.png").unlink()
+    assert export(_jobs(tmp_path, signals), n_jobs=1) == [str(tmp_path / "signal_target_c.png")]
+    assert len(export(_jobs(tmp_path, signals), n_jobs=1, force=True)) == 3
+
+
+# A figure reused with set_data draws the same image as a new figure
+def test_reused_figure_matches_new_figure(tmp_path):
+    rng  = np.random.default_rng(1)
+    jobs = [_jobs(tmp_path / "reused", rng.standard_normal((3, 3000)) * scale)[0] for scale in (1, 50)]
+    jobs += [freq_jobs(rng.standard_normal((n, 2000)) * scale, list("abcdefgh")[:n], 1000, tmp_path / "reused")[0]
+             for n, scale in ((8, 1), (5, 30))]
+    for scale in (1, 40):
+        signal = rng.standard_normal(20000) * scale
+        target = np.repeat([0.0, 1.0], 10000)
+        jobs  += delay_jobs(signal, target, np.arange(20000) / 1000, tmp_path / "reused", half_width=3000)
+        jobs  += comparison_jobs(signal[None], signal[None] / 2, 1000, ["a"], tmp_path / "reused")
+    for kind, path, data in jobs:
+        export_figures._FIGURES.clear()
+        fresh = str(tmp_path / "fresh.png")
+        export_figures._draw((kind, fresh, data))
+        export_figures._FIGURES.clear()
+        reused = str(tmp_path / "reused.png")
+        for other in jobs:
+            if other[0] == kind and other[2] is not data:
+                export_figures._draw((kind, reused, other[2]))
+        export_figures._draw((kind, reused, data))
+        np.testing.assert_array_equal(mpimg.imread(reused), mpimg.imread(fresh))
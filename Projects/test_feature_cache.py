@@ -0,0 +1,92 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_cache import FeatureCache
+
+
+def test_hit_and_miss(tmp_path):
+    cache = FeatureCache(tmp_path)
+    calls = []
+    compute = lambda: calls.append(1) or np.arange(10.0)
+    value, key = cache.cached("stage", {"a": 1, "bands": [(4, 8)]}, compute)
+    again, same = cache.cached("stage", {"bands": [(4, 8)], "a": 1}, compute)
+    assert len(calls) == 1 and key == same
+    assert isinstance(again, np.memmap)
+    np.testing.assert_array_equal(again, value)
+
+    _, other = cache.cached("stage", {"a": 2, "bands": [(4, 8)]}, compute)
+    assert other != key and len(calls) == 2
+    assert cache.key("other", {"a": 1, "bands": [(4, 8)]}) != key
+
+    arrays, _ = cache.cached("dict", {"a": np.int64(1)}, lambda: {"X": np.ones((2, 3)), "y": np.zeros(2)})
+    loaded, _ = cache.cached("dict", {"a": 1}, lambda: pytest.fail("not cached"))
+    np.testing.assert_array_equal(loaded["X"], arrays["X"])
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = FeatureCache(tmp_path, max_bytes=3 * (8000 + 128))
+    keys  = []
+    for n in range(3):
+        keys.append(cache.cached("stage", {"n": n}, lambda: np.zeros(1000))[1])
+        os.utime(cache._path("stage", keys[-1], ".npy"), (n, n))
+    cache.load("stage", keys[0])                          # most recent use
+    cache.cached("stage", {"n": 3}, lambda: np.zeros(1000))
+    assert cache.load("stage", keys[1]) is None
+    assert all(cache.load("stage", key) is not None for key in (keys[0], keys[2]))
+
+
+def test_save_leaves_no_temporary_file(tmp_path):
+    cache = FeatureCache(tmp_path)
+    cache.save("stage", "k" * 40, np.zeros(3))
+    cache.save("stage", "k" * 40, {"X": np.zeros(3)})
+    cache.file_hash(__file__)
+    assert sorted(f.name for f in tmp_path.iterdir()) == ["hashes.json", "stage-" + "k" * 24 + ".npy",
+                                                          "stage-" + "k" * 24 + ".npz"]
+
+
+def test_file_hash_follows_the_content(tmp_path):
+    cache = FeatureCache(tmp_path / "cache")
+    path  = tmp_path / "data.csv"
+    path.write_text("a\n1\n")
+    first = cache.file_hash(path)
+    assert cache.file_hash(path) == first
+    assert json.loads((tmp_path / "cache" / "hashes.json").read_text())[str(path)]["hash"] == first
+    path.write_text("a\n2\n")
+    os.utime(path, ns=(1, 1))
+    assert cache.file_hash(path) != first
+
+
+# Stages of build_dataset : a new band reuses the filtered signals and the segments
+def test_pipeline_stages(tmp_path, monkeypatch):
+    pytest.importorskip("pywt")
+    import pipeline
+
+    rng    = np.random.default_rng(0)
+    target = np.repeat(rng.integers(0, 2, 6), 3000).astype(np.float64)
+    pd.DataFrame(rng.standard_normal((len(target), len(pipeline.CH_NAMES))), columns=pipeline.CH_NAMES).to_csv(
+        tmp_path / "eeg.csv", index=False)
+    pd.DataFrame(target).to_csv(tmp_path / "target.csv", index=False)
+
+    calls = {"filter_signals": 0, "select_segments": 0, "extract_features": 0}
+    for name in calls:
+        def counted(*args, _name=name, _function=getattr(pipeline, name)):
+            calls[_name] += 1
+            return _function(*args)
+        monkeypatch.setattr(pipeline, name, counted)
+
+    cache = FeatureCache(tmp_path / "cache")
+    paths = (tmp_path / "eeg.csv", tmp_path / "target.csv")
+    X, y, _ = pipeline.build_dataset(*paths, cache=cache)
+    Xc, yc, _ = pipeline.build_dataset(*paths, cache=cache)
+    assert calls == {"filter_signals": 1, "select_segments": 1, "extract_features": 1}
+    np.testing.assert_array_equal(Xc, X)
+    np.testing.assert_array_equal(yc, y)
+
+    pipeline.build_dataset(*paths, cache=cache, bands=[(4, 8), (8, 13)], band_names=["theta", "alpha"])
+    assert calls == {"filter_signals": 1, "select_segments": 1, "extract_features": 2}
+    pipeline.build_dataset(*paths, cache=cache, guard=1000)
+    assert calls == {"filter_signals": 1, "select_segments": 2, "extract_features": 3}
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_selection import f_classif
+from sklearn.metrics import mutual_info_score
+
+from feature_ranking import FeatureRanking, FeatureStats
+
+
+def _data():
+    rng = np.random.default_rng(0)
+    y   = rng.integers(-1, 2, 600)
+    X   = rng.standard_normal((600, 7)) * np.logspace(0, 2, 7) + y[:, None] * np.linspace(0, 3, 7)
+    X[:, 3] = 5.0                                                      # constant feature
+    return X, y
+
+
+def _stats(X, y, batches=(0, 1, 57, 300, 600)):
+    stats = FeatureStats(n_bins=8)
+    for a, b in zip(batches, batches[1:]):
+        stats.partial_fit(X[a:b], y[a:b])
+    return stats
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")          # corrwith of the constant feature
+def test_correlation_matches_corrwith():
+    X, y  = _data()
+    frame = pd.DataFrame(X)
+    np.testing.assert_allclose(_stats(X, y).correlation(), frame.corrwith(pd.Series(y)).fillna(0), atol=1e-12)
+
+
+def test_anova_matches_f_classif():
+    X, y = _data()
+    F, p = _stats(X, y).anova_f()
+    F_ref, p_ref = f_classif(np.delete(X, 3, 1), y)
+    np.testing.assert_allclose(np.delete(F, 3), F_ref, rtol=1e-10)
+    np.testing.assert_allclose(np.delete(p, 3), p_ref, rtol=1e-8, atol=1e-300)
+    assert F[3] == np.inf
+
+
+def test_mutual_information_of_the_bins():
+    X, y  = _data()
+    stats = _stats(X, y)
+    bins  = (X[:, :, None] > stats.edges[None]).sum(axis=2)
+    np.testing.assert_allclose(stats.mutual_information(),
+                               [mutual_info_score(y, bins[:, f]) for f in range(X.shape[1])], atol=1e-12)
+
+
+# Two halves (the second one without the class 1) merged : same statistics as one pass
+def test_merge_of_halves_matches_full_pass():
+    X, y   = _data()
+    second = y[300:] != 1
+    Xa, ya, Xb, yb = X[:300], y[:300], X[300:][second], y[300:][second]
+    edges  = _stats(X, y).edges
+    full   = FeatureStats(n_bins=8, edges=edges).fit(np.concatenate((Xa, Xb)), np.concatenate((ya, yb)))
+    merged = FeatureStats(n_bins=8, edges=edges).fit(Xb, yb).merge(FeatureStats(n_bins=8, edges=edges).fit(Xa, ya))
+    np.testing.assert_array_equal(merged.classes_, full.classes_)
+    np.testing.assert_array_equal(merged.counts_, full.counts_)
+    np.testing.assert_array_equal(merged.histograms_, full.histograms_)
+    np.testing.assert_allclose(merged.means_, full.means_, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(merged.m2_, full.m2_, rtol=1e-10)
+    np.testing.assert_allclose(merged.correlation(), full.correlation(), atol=1e-12)
+
+
+# no_keep list of the notebook : features with |corrwith| < threshold
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_no_keep_matches_notebook():
+    X, y     = _data()
+    lst_corr = pd.DataFrame(X).corrwith(pd.Series(y))
+    ranking  = _stats(X, y).ranking("correlation")
+    for threshold in (0.05, 0.2, 0.7):
+        no_keep = [n for n, i in zip(range(X.shape[1]), lst_corr) if not abs(i) >= threshold]
+        np.testing.assert_array_equal(ranking.no_keep(threshold), no_keep)
+        assert sorted(ranking.above(threshold)) == sorted(set(range(X.shape[1])) - set(no_keep))
+    assert list(FeatureRanking([0.1, -0.5, 0.3], absolute=True).top(2)) == [1, 2]
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from scipy.signal import find_peaks, peak_prominences
+
+from features import LST_ONDE, band_power_features, spectral_peak_features
+
+
+def _signals(n_channels=3, n_samples=5000):
+    rng  = np.random.default_rng(0)
+    time = np.arange(n_samples) / 1000
+    return rng.standard_normal((n_channels, n_samples)) + np.sin(2 * np.pi * 10 * time) * np.arange(n_channels)[:, None]
+
+
+# Band power loop of the notebook (fftshift(fft) of each window of each channel)
+def _notebook_band_power(x, fs, window, bands):
+    freqs = np.fft.fftshift(np.fft.fftfreq(window, 1 / fs))
+    power = np.zeros((x.shape[1] // window, x.shape[0] * len(bands)))
+    for i in range(0, x.shape[1] - window, window):
+        for j in range(x.shape[0]):
+            spectrum = np.abs(np.fft.fftshift(np.fft.fft(x[j, i:i + window]))) ** 2
+            for z, (lo, hi) in enumerate(bands):
+                power[i // window, len(bands) * j + z] = spectrum[(freqs >= lo) & (freqs < hi)].sum()
+    return power
+
+
+def test_band_power_matches_notebook_loop():
+    x         = _signals()
+    reference = _notebook_band_power(x, 1000, 500, LST_ONDE)
+    # The notebook loop stops one window early (range(0, m-500, 500)), its last row stays at zero
+    np.testing.assert_allclose(band_power_features(x, 1000)[:-1], reference[:-1], rtol=1e-9)
+    for batch_size in (1, 3):
+        np.testing.assert_allclose(band_power_features(x, 1000, batch_size=batch_size),
+                                   band_power_features(x, 1000), rtol=1e-12)
+
+
+def test_band_power_starts_match_hop():
+    x = _signals()
+    np.testing.assert_array_equal(band_power_features(x, 1000, hop=100),
+                                  band_power_features(x, 1000, starts=np.arange(0, 4501, 100)))
+
+
+# find_peaks / peak_prominences of scipy on the amplitude spectrum up to fmax, one window at a time
+def test_spectral_peaks_match_scipy():
+    x, fs, window, fmax = _signals(), 1000, 500, 30
+    features = spectral_peak_features(x, fs, window, fmax=fmax).reshape(-1, len(x), len(LST_ONDE), 3)
+    freqs    = np.fft.rfftfreq(window, 1 / fs)
+    n_bins   = np.searchsorted(freqs, fmax, side="right")
+    checked  = 0
+    for w in range(len(features)):
+        for j in range(len(x)):
+            amplitude    = np.abs(np.fft.rfft(x[j, w * window:(w + 1) * window]))[:n_bins]
+            amplitude[0] = 0
+            peaks, _     = find_peaks(amplitude)
+            for z, (lo, hi) in enumerate(LST_ONDE):
+                in_band = peaks[(freqs[peaks] >= lo) & (freqs[peaks] < hi)]
+                if len(in_band) == 0:
+                    continue
+                peak = in_band[np.argmax(amplitude[in_band])]
+                np.testing.assert_allclose(features[w, j, z], [freqs[peak], amplitude[peak],
+                                           peak_prominences(amplitude, [peak])[0][0]], rtol=1e-9)
+                checked += 1
+    assert checked > len(features) * len(x)
+
+
+# A band narrower than the resolution of the window (2 Hz here) has no peak to take
+def test_spectral_peaks_band_without_bin():
+    x = _signals()
+    with pytest.raises(ValueError, match=r"\(8.5, 9.5\)"):
+        spectral_peak_features(x, 1000, 500, bands=[(4, 8), (8.5, 9.5)])
+    with pytest.raises(ValueError, match="no FFT bin"):
+        spectral_peak_features(x, 1000, 50, bands=[(1, 4), (4, 8)])
+    assert spectral_peak_features(x, 1000, 500, bands=[(4, 8), (8.5, 10.5)]).shape == (10, 3 * 2 * 3)
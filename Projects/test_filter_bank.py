@@ -0,0 +1,39 @@
+import numpy as np
+from scipy.signal import firwin, kaiserord, lfilter, sosfilt
+
+from filter_bank import FilterBank
+
+
+# FIRFilter of the TP2 notebook (cutoff_hz as a fraction of the Nyquist frequency)
+def _fir_filter(ecg, filter_param):
+    N, beta = kaiserord(filter_param['ripple_db'], filter_param['width'])
+    taps    = firwin(N, filter_param['cutoff_hz'], window=('kaiser', beta))
+    return lfilter(taps, 1.0, ecg)
+
+
+def test_fir_matches_tp2_fir_filter():
+    ecg = np.random.default_rng(0).standard_normal(20000)
+    for fs in (360, 500):
+        bank = FilterBank(fs, [(None, 0.25 * fs / 2)], method="fft")
+        expected = _fir_filter(ecg, {"width": 0.05, "ripple_db": 50, "cutoff_hz": [0.25]})
+        np.testing.assert_allclose(bank.filter(ecg)[0], expected, atol=1e-10)
+
+
+def test_iir_matches_sosfilt():
+    signals = np.random.default_rng(1).standard_normal((3, 5000))
+    bank    = FilterBank(1000, [(4, 8), (13, 30)], kind="iir")
+    for b, sos in enumerate(bank.filters):
+        np.testing.assert_allclose(bank.filter(signals)[b], sosfilt(sos, signals, axis=-1), atol=1e-12)
+
+
+def test_stream_matches_batch():
+    signals = np.random.default_rng(2).standard_normal((4, 12000))
+    for kind, method in (("fir", "fft"), ("fir", "direct"), ("iir", "auto")):
+        for dtype in (np.float64, np.float32):
+            bank   = FilterBank(1000, kind=kind, method=method)
+            batch  = bank.filter(signals.astype(dtype))
+            stream = bank.stream(4)
+            blocks = [stream.process(signals[:, i:i + 1000].astype(dtype)) for i in range(0, 12000, 1000)]
+            result = np.concatenate(blocks, axis=-1)
+            assert result.dtype == batch.dtype == dtype
+            np.testing.assert_allclose(result, batch, rtol=0, atol=1e-10 if dtype == np.float64 else 1e-5)
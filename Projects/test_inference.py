@@ -0,0 +1,52 @@
+import numpy as np
+from sklearn import preprocessing
+from sklearn.decomposition import PCA
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.neural_network import MLPClassifier
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from features import band_power_features
+from inference import export_model, load_model
+
+
+def _windows():
+    rng     = np.random.default_rng(0)
+    windows = rng.standard_normal((600, 8, 500))
+    y       = rng.integers(0, 2, len(windows))
+    windows[y == 1, :3] += np.sin(2 * np.pi * 10 * np.arange(500) / 1000)
+    return windows, y
+
+
+# Chain of the notebook (scaler, PCA, kept features, classifier) : the .npz runtime predicts the same
+# labels as the sklearn objects
+def test_runtime_matches_sklearn(tmp_path):
+    windows, y = _windows()
+    X      = band_power_features(windows.transpose(1, 0, 2).reshape(8, -1), 1000, 500)
+    scaler = preprocessing.StandardScaler().fit(X)
+    pca    = PCA(n_components=10, whiten=True).fit(scaler.transform(X))
+    keep   = np.arange(0, 10, 2)
+    Z      = pca.transform(scaler.transform(X))[:, keep]
+    models = [SVC(C=10, gamma=0.1), SVC(kernel="poly", degree=2), SVC(kernel="linear"),
+              MLPClassifier((10,), max_iter=2000, random_state=0),
+              KNeighborsClassifier(5, p=1), KNeighborsClassifier(3, weights="distance"),
+              DecisionTreeClassifier(max_depth=4, random_state=0)]
+    for n, model in enumerate(models):
+        model.fit(Z[:400], y[:400])
+        path = tmp_path / "model{}.npz".format(n)
+        export_model(path, model, scaler, pca, keep, fs=1000, window=500)
+        runtime = load_model(path)
+        np.testing.assert_allclose(runtime.transform(X[400:]), Z[400:], rtol=1e-9, atol=1e-12)
+        np.testing.assert_array_equal(runtime.predict(windows[400:]), model.predict(Z[400:]))
+
+
+def test_kept_channels(tmp_path):
+    windows, y = _windows()
+    names  = ["ch{}".format(i) for i in range(8)]
+    X      = band_power_features(windows[:, 2:5].transpose(1, 0, 2).reshape(3, -1), 1000, 500)
+    model  = KNeighborsClassifier(5).fit(X, y)
+    path   = tmp_path / "model.npz"
+    export_model(path, model, ch_names=names, ch_names_kept=names[2:5])
+    runtime = load_model(path)
+    np.testing.assert_array_equal(runtime.predict(windows), model.predict(X))
+    np.testing.assert_array_equal(runtime.predict(windows[:, 2:5]), model.predict(X))
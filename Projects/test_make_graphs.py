@@ -0,0 +1,32 @@
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+import pytest
+
+from make_graphs import eeg_fast_plot, eeg_plot, envelope
+
+
+def test_envelope_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for n, n_bins in ((10, 3), (1000, 1000), (1001, 7), (5000, 1200), (12345, 960), (5, 20)):
+        signal = rng.standard_normal(n)
+        idx, lo, hi = envelope(signal, n_bins)
+        bounds = np.append(idx, n)
+        assert idx[0] == 0 and np.all(np.diff(idx) > 0)
+        np.testing.assert_array_equal(lo, [signal[a:b].min() for a, b in zip(bounds, bounds[1:])])
+        np.testing.assert_array_equal(hi, [signal[a:b].max() for a, b in zip(bounds, bounds[1:])])
+
+
+def test_time_window(tmp_path):
+    signals = np.random.default_rng(0).standard_normal((3, 5000))
+    eeg_fast_plot(signals, ["a", "b", "c"], False, tmp_path / "window.png", time_window=[1, 2.5])
+    assert (tmp_path / "window.png").exists()
+    for time_window in ([2, 2], [6, 8], [-3, -1]):
+        with pytest.raises(ValueError, match="time_window"):
+            eeg_fast_plot(signals, ["a", "b", "c"], False, time_window=time_window)
+    with pytest.raises(ValueError, match="time_window"):
+        eeg_fast_plot(signals, ["a", "b", "c"], False, time=np.arange(5000) / 1000, time_window=[9, 10])
+    with pytest.raises(ValueError, match="time_window"):
+        eeg_plot(np.vstack((np.arange(5000) / 1000, signals)), ["a", "b", "c"], False, fast=True,
+                 time_window=[7, 9])
@@ -0,0 +1,47 @@
+import numpy as np
+from sklearn import preprocessing
+from sklearn.decomposition import PCA
+
+from features import band_power_features
+from online_reduction import OnlinePCA, OnlineScaler, feature_batches
+
+
+def _features():
+    rng = np.random.default_rng(0)
+    X   = rng.standard_normal((400, 8)) @ rng.standard_normal((8, 8)) * np.logspace(0, 3, 8) + 50
+    return X, [X[a:b] for a, b in ((0, 1), (1, 101), (101, 102), (102, 102), (102, 250), (250, 400))]
+
+
+def test_scaler_matches_standard_scaler():
+    X, batches = _features()
+    online     = OnlineScaler().fit(batches)
+    reference  = preprocessing.StandardScaler().fit(X)
+    assert online.n_samples_seen_ == len(X)
+    np.testing.assert_allclose(online.mean_, reference.mean_, rtol=1e-12)
+    np.testing.assert_allclose(online.scale_, reference.scale_, rtol=1e-12)
+    np.testing.assert_allclose(online.transform(X), reference.transform(X), rtol=1e-10, atol=1e-12)
+
+
+def test_pca_matches_sklearn():
+    X, batches = _features()
+    for standardize in (True, False):
+        online    = OnlinePCA(n_components=5, standardize=standardize).fit(batches)
+        scaled    = preprocessing.StandardScaler().fit_transform(X) if standardize else X
+        reference = PCA(n_components=5).fit(scaled)
+        signs     = np.sign(np.sum(online.components_[:5] * reference.components_, axis=1))
+        assert np.all(signs != 0)
+        np.testing.assert_allclose(online.components_[:5], reference.components_ * signs[:, None], atol=1e-10)
+        np.testing.assert_allclose(online.explained_variance_[:5], reference.explained_variance_, rtol=1e-10)
+        np.testing.assert_allclose(online.explained_variance_ratio_[:5], reference.explained_variance_ratio_,
+                                   rtol=1e-10)
+        np.testing.assert_allclose(online.transform(X), reference.transform(scaled) * signs, rtol=1e-8, atol=1e-8)
+    np.testing.assert_allclose(online.scaler.mean_, X.mean(axis=0), rtol=1e-12)
+    assert online.n_components_for(1.0) == X.shape[1]
+
+
+def test_feature_batches_match_band_power_features():
+    signals = np.random.default_rng(1).standard_normal((3, 20000))
+    starts  = np.arange(0, 19000, 137)
+    batches = list(feature_batches(signals, 1000, starts, batch_size=50))
+    assert [len(X) for X in batches] == [50, 50, 39]
+    np.testing.assert_allclose(np.concatenate(batches), band_power_features(signals, 1000, starts=starts), rtol=1e-12)
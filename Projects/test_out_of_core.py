@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pywt")                     # wavelet filter of the chunks
+
+from compact import CompactTarget
+from eeg_store import csv_to_store
+from out_of_core import StoreChannels, chunked_batches, chunked_dataset
+from pipeline import extract_features, filter_signals, select_segments
+from wavelet_filter import WaveletBandFilter
+
+CHANNELS = ["ch0", "ch2", "ch3", "ch6"]                 # not evenly spaced, like ch_names_kept
+SEGMENTS = {"window": 500, "step": 100, "guard": 300}
+
+
+def _recording(tmp_path, n_samples=20000):
+    rng    = np.random.default_rng(0)
+    values = rng.standard_normal((n_samples, 7))
+    pd.DataFrame(values, columns=["ch{}".format(c) for c in range(7)]).to_csv(tmp_path / "eeg.csv", index=False)
+    target = np.repeat(rng.integers(0, 3, 10), 2000).astype(np.float64)
+    target[1000:1700] = np.nan
+    target[9500:9600] = np.nan
+    return csv_to_store(tmp_path / "eeg.csv", tmp_path / "eeg.eeg", 1000), target
+
+
+# extract_features(filter_signals(signals), target, *select_segments(target)) of the pipeline
+def _in_memory(store, target):
+    filtered      = filter_signals(store.get(CHANNELS))
+    valid, starts = select_segments(target, **SEGMENTS)
+    return filtered, starts, extract_features(filtered, target, valid, starts)
+
+
+def test_chunked_dataset_matches_pipeline(tmp_path):
+    store, target = _recording(tmp_path)
+    filtered, starts, (X, y) = _in_memory(store, target)
+    first   = np.flatnonzero(~np.isnan(target))[starts]          # segments as indexes of the recording
+    overlap = WaveletBandFilter().overlap()
+    assert len(X) > 50
+    for chunk_size in (1000, 1920, 4096, 65536):
+        chunk = -(-chunk_size // 128) * 128
+        if chunk < len(target):
+            # a chunk edge falls inside a segment, and inside the overlap of the next chunk
+            assert any(((first < edge) & (edge < first + 500)).any() for edge in range(chunk, len(target), chunk))
+            assert chunk + overlap < len(target)
+        out = np.empty_like(filtered)
+        Xc, yc = chunked_dataset(StoreChannels(store, CHANNELS), target, chunk_size=chunk_size, filtered_out=out,
+                                 **SEGMENTS)
+        np.testing.assert_allclose(Xc, X, rtol=1e-12, atol=1e-12)
+        np.testing.assert_array_equal(yc, y)
+        np.testing.assert_allclose(out, filtered, rtol=1e-12, atol=1e-12)
+
+
+def test_chunked_batches_compact_target(tmp_path):
+    store, target = _recording(tmp_path)
+    _, _, (X, y)  = _in_memory(store, target)
+    batches = list(chunked_batches(StoreChannels(store, CHANNELS), CompactTarget.from_float(target),
+                                   chunk_size=3000, **SEGMENTS))
+    assert len(batches) > 1
+    np.testing.assert_allclose(np.concatenate([b[0] for b in batches]), X, rtol=1e-12, atol=1e-12)
+    np.testing.assert_array_equal(np.concatenate([b[1] for b in batches]), y)
+
+
+def test_store_channels_reads_the_chunk(tmp_path):
+    store, _ = _recording(tmp_path)
+    channels = StoreChannels(store, CHANNELS)
+    assert channels.shape == (4, store.n_samples)
+    np.testing.assert_array_equal(channels[:, 300:900], store.get(CHANNELS)[:, 300:900])
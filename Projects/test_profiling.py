@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from profiling import Profiler, max_rss_mb, profiled, stage
+
+
+@profiled()
+def _outer(x):
+    with stage("inner", x=x):
+        y = x * 2
+    return _leaf(y)
+
+
+@profiled("leaf")
+def _leaf(x):
+    return x + 1
+
+
+def test_nested_stages_are_recorded():
+    x = np.ones(1000)
+    np.testing.assert_array_equal(_outer(x), x * 2 + 1)          # no profiler : plain call
+    with Profiler() as profiler:
+        result = _outer(x)
+    np.testing.assert_array_equal(result, x * 2 + 1)
+    paths = [group["path"] for group in profiler.summary()]
+    assert paths == ["_outer", "_outer;inner", "_outer;leaf"]
+    outer = profiler.summary()[0]
+    assert outer["self"] <= outer["wall"]
+    assert all(record["max_rss_mb"] is None or record["max_rss_mb"] > 0 for record in profiler.records)
+
+
+def test_max_rss_mb():
+    rss = max_rss_mb()
+    assert rss is None or rss > 0
+
+
+# The modules decorated with @profiled do not get new dependencies
+def test_profiling_imports_only_numpy():
+    code = ("import sys; import profiling; "
+            "print(sorted({m.split('.')[0] for m in sys.modules} & {'sklearn', 'scipy', 'pandas', 'pywt', "
+            "'matplotlib'}))")
+    out  = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,41 @@
+import numpy as np
+
+from segmentation import label_changes, segment_indices, segment_starts
+
+
+# to_keep / count loop of the notebook, one candidate segment at a time
+def _notebook_starts(t, window, step, guard):
+    where_changement = [i for i in range(len(t) - 1) if t[i] != t[i + 1]]
+    starts = []
+    for i in range(0, len(t) - window, step):
+        if min(t[i:i + window]) != max(t[i:i + window]):
+            continue
+        if any(j - guard < i < j + guard or j - guard < i + window < j + guard for j in where_changement):
+            continue
+        starts.append(i)
+    return np.array(starts, dtype=np.int64)
+
+
+# Piecewise constant target with runs of random lengths
+def _target(rng, n, mean_run):
+    runs = rng.integers(1, 2 * mean_run, n // 2 + 1)
+    return np.repeat(rng.integers(0, 3, len(runs)), runs)[:n].astype(np.float64)
+
+
+def test_segment_starts_matches_notebook_loop():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        window, step, guard = rng.integers(5, 60), rng.integers(1, 30), rng.integers(0, 120)
+        target = _target(rng, int(rng.integers(1, 2000)), int(rng.integers(1, 400)))
+        np.testing.assert_array_equal(segment_starts(target, window, step, guard),
+                                      _notebook_starts(target, window, step, guard))
+
+
+def test_segment_starts_notebook_parameters():
+    target = _target(np.random.default_rng(1), 60000, 6000)
+    starts = segment_starts(target)
+    assert len(starts) > 100
+    np.testing.assert_array_equal(starts, _notebook_starts(target, 500, 100, 1500))
+    np.testing.assert_array_equal(label_changes(target), np.flatnonzero(target[:-1] != target[1:]))
+    np.testing.assert_array_equal(segment_indices(starts[:2]), np.r_[starts[0]:starts[0] + 500,
+                                                                      starts[1]:starts[1] + 500])
@@ -0,0 +1,53 @@
+import numpy as np
+
+from feature_cache import FeatureCache
+from separation import Separation, separation_report
+
+
+# Three independent sources (sine, square, Laplace noise) mixed on five channels
+def _mixture(n_samples=20000):
+    rng     = np.random.default_rng(0)
+    time    = np.arange(n_samples) / 1000
+    sources = np.stack((np.sin(2 * np.pi * 7 * time), np.sign(np.sin(2 * np.pi * 3.1 * time)),
+                        rng.laplace(size=n_samples)))
+    mixing  = rng.standard_normal((5, 3))
+    return mixing @ sources + rng.standard_normal((5, 1)), sources
+
+
+def _best_correlation(estimated, sources):
+    k = len(sources)
+    return np.abs(np.corrcoef(estimated, sources)[:len(estimated), len(estimated):]).max(axis=0)[:k]
+
+
+def test_ica_recovers_the_sources():
+    signals, sources = _mixture()
+    separation = Separation("ica", n_fit=5000, chunk_size=3000).fit(signals)
+    estimated  = separation.transform_all(signals)
+    assert len(estimated) == 3                                         # rank 3 : 2 components dropped
+    assert _best_correlation(estimated, sources).min() > 0.99
+    assert separation.reconstruction_error(signals) < 1e-20
+
+
+def test_streamed_transform_matches_batch():
+    signals, _ = _mixture()
+    for method in ("ica", "pca"):
+        separation = Separation(method, n_fit=4000, chunk_size=1234).fit(signals)
+        batch      = separation.transform(signals)
+        np.testing.assert_allclose(separation.transform_all(signals), batch, rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(separation.inverse_transform(batch), signals, atol=1e-9)
+
+
+def test_cached_fit(tmp_path):
+    signals, _ = _mixture()
+    cache  = FeatureCache(tmp_path)
+    first  = Separation("ica", n_fit=4000).fit(signals, cache)
+    second = Separation("ica", n_fit=4000).fit(signals, cache)
+    np.testing.assert_array_equal(second.unmixing_, first.unmixing_)
+    assert len(list(tmp_path.glob("unmixing-*.npz"))) == 1
+
+
+def test_report_against_full_fastica():
+    signals, _ = _mixture(8000)
+    report = separation_report(signals, n_components=3, n_fit=4000)
+    assert report["min_correlation"] > 0.99
+    assert report["subset_error"] < 1e-20
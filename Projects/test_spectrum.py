@@ -0,0 +1,56 @@
+import numpy as np
+
+from spectrum import SpectrumCache
+
+
+# fftshift(fft(signal)) of make_graphs, from index len//2 on
+def test_half_spectrum_matches_fftshift():
+    cache = SpectrumCache()
+    for n in (1000, 1001):
+        signal = np.random.default_rng(n).standard_normal(n)
+        freqs, amplitude = cache.half_spectrum(signal, 1000)
+        np.testing.assert_allclose(freqs, np.fft.fftshift(np.fft.fftfreq(n, 1 / 1000))[n // 2:], rtol=1e-12)
+        np.testing.assert_allclose(amplitude, np.abs(np.fft.fftshift(np.fft.fft(signal)))[n // 2:], rtol=1e-9,
+                                   atol=1e-9)
+        np.testing.assert_array_equal(cache.rfft(signal, 1000), np.fft.rfft(signal))
+
+
+def test_hash_and_identity_keys():
+    signals = np.random.default_rng(0).standard_normal((2, 1000))
+    by_hash, by_identity = SpectrumCache(by="hash"), SpectrumCache(by="identity")
+    for cache in (by_hash, by_identity):
+        cache.rfft(signals[0], 1000)
+        cache.rfft(signals[0], 1000)                    # same view
+        cache.rfft(signals[0], 500)                     # other fs
+    assert (by_hash.hits, by_hash.misses) == (1, 2)
+    assert (by_identity.hits, by_identity.misses) == (1, 2)
+
+    copy = signals[0].copy()
+    by_hash.rfft(copy, 1000)                            # same samples elsewhere : hit by hash only
+    by_identity.rfft(copy, 1000)
+    assert (by_hash.hits, by_identity.misses) == (2, 3)
+
+    signals[0, 0] += 1                                  # modified in place : new hash, same identity
+    np.testing.assert_array_equal(by_hash.rfft(signals[0], 1000), np.fft.rfft(signals[0]))
+    assert by_identity.key(signals[0], 1000) == by_identity.key(signals[0].view(), 1000)
+    assert by_identity.key(signals[0], 1000) != by_identity.key(signals[0, ::2], 1000)
+
+
+def test_lru_eviction_under_the_budget():
+    signals = np.random.default_rng(0).standard_normal((4, 1000))
+    size    = np.fft.rfft(signals[0]).nbytes
+    cache   = SpectrumCache(max_bytes=3 * size)
+    for signal in signals[:3]:
+        cache.rfft(signal, 1000)
+    cache.rfft(signals[0], 1000)                        # most recent use
+    cache.rfft(signals[3], 1000)                        # evicts signals[1]
+    assert cache.nbytes == 3 * size and len(cache.entries) == 3
+    assert cache.key(signals[1], 1000) not in cache.entries
+    assert cache.key(signals[0], 1000) in cache.entries
+    assert not cache.rfft(signals[3], 1000).flags.writeable
+
+    small = SpectrumCache(max_bytes=1)                  # the last spectrum is always kept
+    small.rfft(signals[0], 1000)
+    assert len(small.entries) == 1
+    cache.clear()
+    assert cache.nbytes == 0 and not cache.entries
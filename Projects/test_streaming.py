@@ -0,0 +1,34 @@
+import numpy as np
+
+from features import band_power_features
+from streaming import StreamingClassifier, replay_blocks
+
+
+# Model that returns the first feature, to check what the stream sends to predict
+class _FirstFeature:
+    def predict(self, X):
+        return X[:, 0]
+
+
+def _signals():
+    return np.random.default_rng(0).standard_normal((4, 6000))
+
+
+# The sliding DFT (with its periodic exact resync) gives the band powers of band_power_features
+def test_sliding_dft_matches_band_power_features():
+    x         = _signals()
+    reference = band_power_features(x, 1000, window=500, hop=100)
+    clf       = StreamingClassifier(_FirstFeature(), len(x), window=500, hop=100, resync=7)
+    powers    = []
+    for block in replay_blocks(x, block_size=100):
+        if clf.push(block):
+            powers.append(clf.band_powers())
+    np.testing.assert_allclose(np.array(powers), reference, rtol=1e-7, atol=1e-9)
+
+
+def test_run_matches_offline_windows():
+    x         = _signals()
+    reference = band_power_features(x, 1000, window=500, hop=100)
+    indexes, labels = StreamingClassifier(_FirstFeature(), len(x)).run(replay_blocks(x, block_size=37))
+    np.testing.assert_array_equal(indexes, 499 + 100 * np.arange(len(reference)))
+    np.testing.assert_allclose(labels, reference[:, 0], rtol=1e-7)
@@ -0,0 +1,47 @@
+import numpy as np
+from sklearn.model_selection import GridSearchCV
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import SVC
+
+from sweep import CachedGridSearchCV
+
+
+def _data():
+    rng = np.random.default_rng(0)
+    y   = rng.integers(0, 3, 240)
+    X   = rng.standard_normal((240, 6)) + 0.8 * y[:, None] * (rng.random(6) > 0.4)
+    return X, y
+
+
+def _assert_same_search(estimator, grid, X, y, **kwargs):
+    reference = GridSearchCV(estimator, grid, cv=5).fit(X, y)
+    cached    = CachedGridSearchCV(estimator, grid, cv=5, **kwargs).fit(X, y)
+    for f in range(5):
+        key = "split{}_test_score".format(f)
+        np.testing.assert_array_equal(cached.cv_results_[key], reference.cv_results_[key])
+    np.testing.assert_array_equal(cached.cv_results_["rank_test_score"], reference.cv_results_["rank_test_score"])
+    assert cached.best_params_ == reference.best_params_
+
+
+def test_svc_matches_grid_search():
+    X, y = _data()
+    _assert_same_search(SVC(), {"C": [0.1, 1, 10], "gamma": [1, 0.1, "scale"],
+                                "kernel": ["rbf", "poly", "sigmoid", "linear"]}, X, y)
+
+
+def test_knn_matches_grid_search():
+    X, y = _data()
+    _assert_same_search(KNeighborsClassifier(), {"n_neighbors": [1, 2, 5, 10], "p": [1, 2, 3],
+                                                 "weights": ["uniform", "distance"],
+                                                 "metric": ["minkowski", "chebyshev"]}, X, y)
+
+
+# Budget below the two float64 matrices of rbf : float32 cache, scores close to GridSearchCV
+def test_svc_float32_cache():
+    X, y   = _data()
+    grid   = {"C": [1, 10], "gamma": [0.1, 0.01]}
+    budget = 2 * len(X) ** 2 * 8 - 1
+    cached = CachedGridSearchCV(SVC(), grid, cv=5, max_bytes=budget).fit(X, y)
+    reference = GridSearchCV(SVC(), grid, cv=5).fit(X, y)
+    np.testing.assert_allclose(cached.cv_results_["mean_test_score"], reference.cv_results_["mean_test_score"],
+                               atol=0.02)
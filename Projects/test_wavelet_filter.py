@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+pywt = pytest.importorskip("pywt")
+
+from wavelet_filter import WaveletBandFilter
+
+
+def _signals():
+    return np.random.default_rng(0).standard_normal((4, 20000))
+
+
+# Cell of the notebook : A7, D4, D3, D2, D1 set to zero, one channel at a time
+def test_matches_notebook_loop():
+    signals  = _signals()
+    expected = np.empty_like(signals)
+    for i, channel in enumerate(signals):
+        coeffs = pywt.wavedec(channel, "db4", level=7)
+        for k in (0, 4, 5, 6, 7):
+            coeffs[k] = np.zeros_like(coeffs[k])
+        expected[i] = pywt.waverec(coeffs, "db4")[:len(channel)]
+    np.testing.assert_allclose(WaveletBandFilter().filter(signals), expected, atol=1e-12)
+
+
+def test_chunked_paths_match_single_block():
+    signals   = _signals()
+    reference = WaveletBandFilter().filter(signals)
+    for executor in ("thread", "process"):
+        for n_jobs, chunk_size in ((2, None), (3, 3000), (1, 5000)):
+            result = WaveletBandFilter().filter(signals, n_jobs=n_jobs, chunk_size=chunk_size, executor=executor)
+            np.testing.assert_allclose(result, reference, atol=1e-12)
+    chunks = np.zeros_like(reference)
+    for start, stop, block in WaveletBandFilter().filter_chunks(signals, 3000):
+        chunks[:, start:stop] = block
+    np.testing.assert_allclose(chunks, reference, atol=1e-12)
+
+
+def test_array_like_and_float32():
+    signals = _signals()
+    np.testing.assert_array_equal(WaveletBandFilter().filter(signals.tolist()), WaveletBandFilter().filter(signals))
+    assert WaveletBandFilter().filter(signals.astype(np.float32)).dtype == np.float32
+
+
+# out is written in place whatever its strides, a reshape that would copy it is rejected
+def test_out_with_strides():
+    signals   = _signals()
+    reference = WaveletBandFilter().filter(signals)
+    for n_jobs in (1, 2):
+        big = np.zeros((8, 40000))
+        out = big[::2, ::2]
+        assert WaveletBandFilter().filter(signals, out=out, n_jobs=n_jobs) is out
+        np.testing.assert_allclose(big[::2, ::2], reference, atol=1e-12)
+        transposed = np.zeros((20000, 4)).T
+        WaveletBandFilter().filter(signals, out=transposed, n_jobs=n_jobs)
+        np.testing.assert_allclose(transposed, reference, atol=1e-12)
+    with pytest.raises(ValueError, match="without a copy"):
+        WaveletBandFilter().filter(signals, out=np.zeros((16, 10000))[::2])
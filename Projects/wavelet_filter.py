@@ -0,0 +1,151 @@
+#####################################################################################################
+# LGBIO2020 - Project
+# Wavelet filtering of multi-channel EEG : the DWT of all channels is computed in one call (axis
+# support of pywt) and only the chosen coefficient bands are kept for the reconstruction
+#####################################################################################################
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pywt
+
+
+"""--------------------------------------------------------------------------------------------------
+WAVELET BAND FILTER
+Keeps some coefficients of a level-L DWT and reconstructs the signals, like the cell of the notebook
+(db4, level 7, keep D7, D6 and D5 i.e. about 4-31 Hz at 1 kHz).
+INPUTS:
+    - wavelet : name of the discrete wavelet
+    - level : level of the decomposition
+    - keep : names of the kept coefficients, "A<level>" for the approximation and "D<k>" for the
+             details of level k (same names as print_decomposition in TP2)
+    - mode : signal extension mode of pywt
+--------------------------------------------------------------------------------------------------"""
+class WaveletBandFilter:
+
+    def __init__(self, wavelet="db4", level=7, keep=("D7", "D6", "D5"), mode="symmetric"):
+        self.wavelet = pywt.Wavelet(wavelet)
+        self.level   = level
+        self.mode    = mode
+        self.keep    = tuple(keep)
+        unknown = set(self.keep) - set(self.coefficient_names())
+        if unknown:
+            raise ValueError("unknown coefficients {} for a level {} decomposition".format(sorted(unknown), level))
+
+    # Names of the coefficients in the order of pywt.wavedec : [A_L, D_L, D_L-1, ..., D_1]
+    def coefficient_names(self):
+        return ["A{}".format(self.level)] + ["D{}".format(k) for k in range(self.level, 0, -1)]
+
+    # Frequency range (in Hz) of each kept coefficient for a frequence of acquisition fs
+    def frequency_bands(self, fs):
+        bands = {}
+        for name in self.keep:
+            k = int(name[1:])
+            bands[name] = (0, fs / 2 ** (k + 1)) if name[0] == "A" else (fs / 2 ** (k + 1), fs / 2 ** k)
+        return bands
+
+    # Number of samples added on each side of a chunk so that its center is exactly the output of the
+    # whole signal (support of the analysis and synthesis filters at the deepest level)
+    def overlap(self):
+        return self.wavelet.dec_len * 2 ** self.level
+
+    """----------------------------------------------------------------------------------------------
+    FILTER THE SIGNALS
+    Without chunk_size and with n_jobs=1 the whole recording goes through one wavedec/waverec.
+    Otherwise the recording is cut in chunks of chunk_size samples (aligned on 2**level), each chunk
+    is filtered with overlap() extra samples on both sides and only its center is written in out
+    (overlap-save), so the result does not depend on the chunking.
+    INPUTS:
+        - signals : a matrix of [nxm] dimensions where n (nb of channels) << m (can be a np.memmap)
+        - out : preallocated (or memory-mapped) matrix of [nxm] dimensions for the result (any
+                strides, or another shape that can be reshaped without a copy)
+        - n_jobs : number of workers (-1 for all cores)
+        - chunk_size : number of samples per chunk (m / n_jobs if None)
+        - executor : "thread" (pywt releases the GIL, chunks are read without any copy) or
+                     "process" (chunks are sent to the workers)
+    OUTPUT:
+        - out, the filtered signals
+    ----------------------------------------------------------------------------------------------"""
+    def filter(self, signals, out=None, n_jobs=1, chunk_size=None, executor="thread"):
+        if not isinstance(signals, np.memmap):
+            signals = np.asarray(signals)
+        if out is None:
+            out = np.empty(signals.shape, dtype=np.result_type(signals.dtype, np.float32))
+        signals = np.atleast_2d(signals)
+        out2d   = out.reshape(signals.shape)
+        if not np.may_share_memory(out2d, out):
+            raise ValueError("out of shape {} cannot be viewed as a {} matrix without a copy".format(
+                out.shape, signals.shape))
+
+        n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        n      = signals.shape[1]
+        if chunk_size is None and n_jobs == 1:
+            out2d[:] = self._filter_block(signals)
+            return out
+
+        pad    = self.overlap()
+        chunks = self._chunks(n, -(-n // n_jobs) if chunk_size is None else chunk_size)
+
+        def job(chunk):
+            start, stop = chunk
+            lo, hi = max(start - pad, 0), min(stop + pad, n)
+            return self._filter_block(signals[:, lo:hi])[:, start - lo:stop - lo]
+
+        if executor == "thread":
+            with ThreadPoolExecutor(n_jobs) as pool:
+                for (start, stop), block in zip(chunks, pool.map(job, chunks)):
+                    out2d[:, start:stop] = block
+        elif executor == "process":
+            with ProcessPoolExecutor(n_jobs) as pool:
+                futures = []
+                for start, stop in chunks:
+                    lo, hi = max(start - pad, 0), min(stop + pad, n)
+                    futures.append(pool.submit(_filter_center, self, np.asarray(signals[:, lo:hi]),
+                                               start - lo, stop - lo))
+                for (start, stop), future in zip(chunks, futures):
+                    out2d[:, start:stop] = future.result()
+        else:
+            raise ValueError("executor must be 'thread' or 'process', not {}".format(executor))
+        return out
+
+    def __call__(self, signals, out=None, **kwargs):
+        return self.filter(signals, out, **kwargs)
+
+    """----------------------------------------------------------------------------------------------
+    FILTER THE SIGNALS CHUNK BY CHUNK
+    Same chunks and overlap-save as filter, one chunk in memory at a time : only the samples of the
+    chunk and its overlap are read from signals.
+    INPUTS:
+        - signals : a matrix of [nxm] dimensions (np.memmap, or any object with a shape and
+                    [:, lo:hi] slicing)
+        - chunk_size : number of samples per chunk (rounded up to a multiple of 2**level)
+    OUTPUT:
+        - generator of (start, stop, filtered) with filtered of [n x (stop-start)] dimensions, the
+          filtered signals of the samples start to stop
+    ----------------------------------------------------------------------------------------------"""
+    def filter_chunks(self, signals, chunk_size):
+        n   = signals.shape[-1]
+        pad = self.overlap()
+        for start, stop in self._chunks(n, chunk_size):
+            lo, hi = max(start - pad, 0), min(stop + pad, n)
+            block  = np.atleast_2d(np.asarray(signals[:, lo:hi]))
+            yield start, stop, self._filter_block(block)[:, start - lo:stop - lo]
+
+    # Chunks [start, stop) of about chunk_size samples, aligned on 2**level
+    def _chunks(self, n, chunk_size):
+        align      = 2 ** self.level
+        chunk_size = max(align, -(-chunk_size // align) * align)
+        return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+    # wavedec / waverec of all the rows at once, the removed coefficients are zeroed in place
+    def _filter_block(self, block):
+        coeffs = pywt.wavedec(block, self.wavelet, mode=self.mode, level=self.level, axis=-1)
+        for name, c in zip(self.coefficient_names(), coeffs):
+            if name not in self.keep:
+                c[...] = 0
+        return pywt.waverec(coeffs, self.wavelet, mode=self.mode, axis=-1)[:, :block.shape[1]]
+
+
+def _filter_center(band_filter, block, start, stop):
+    return band_filter._filter_block(block)[:, start:stop]
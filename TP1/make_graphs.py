@@ -4,6 +4,7 @@
 #####################################################################################################
 
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 
 import numpy as np 
 
@@ -108,8 +109,19 @@ INPUTS:
     - label : list of n strings with channel names (do not consider time)
     - show_fig : True if the plot must be displayed on screen, False otherwise
     - (file_path) : path where the graph must be saved (if needed)
+    - (fast) : True to draw the min/max envelope of the signals at the resolution of the figure,
+               all channels in one LineCollection (see eeg_fast_plot), for long recordings
+    - (time_window) : [start,end] in seconds to plot only a part of the signals (the matrix is
+                      sliced, not copied)
 --------------------------------------------------------------------------------------------------"""
-def eeg_plot(eeg_signals, label, show_fig, file_path=None): 
+def eeg_plot(eeg_signals, label, show_fig, file_path=None, fast=False, time_window=None): 
+    if time_window is not None:
+        start, end  = np.searchsorted(eeg_signals[0], time_window)
+        eeg_signals = eeg_signals[:, start:end]
+    if fast:
+        eeg_fast_plot(eeg_signals[1:], label, show_fig, file_path, time=eeg_signals[0])
+        return
+
     # Same y scale for all channels
     bottom = np.amin(eeg_signals[1:eeg_signals.shape[0]])
     top    = np.amax(eeg_signals[1:eeg_signals.shape[0]])
@@ -151,4 +163,80 @@ def eeg_plot(eeg_signals, label, show_fig, file_path=None):
     # Display graph on screen
     if show_fig:
         plt.show()
-    plt.close()
\ No newline at end of file
+    plt.close()
+
+
+"""--------------------------------------------------------------------------------------------------
+PLOT EEG SIGNALS DEPENDING ON THE TIME, FAST VERSION FOR LONG RECORDINGS
+Each channel is reduced to its min/max envelope on one bin per pixel of the figure (the peaks stay
+visible) and all channels are drawn as one LineCollection, shifted vertically.
+INPUTS: 
+    - signals : a matrix of [nxm] dimensions where n (nb of channels) << m, without the time vector
+                (can be a np.memmap, e.g. EEGStore.data : only the plotted window is read)
+    - label : list of n strings with channel names
+    - show_fig : True if the plot must be displayed on screen, False otherwise
+    - (file_path) : path where the graph must be saved (if needed)
+    - (freq_acquisition) : frequence of acquisition (used if time is None)
+    - (time_window) : [start,end] in seconds to plot only a part of the signals
+    - (time) : time vector of [m] length, or None to use the frequence of acquisition
+--------------------------------------------------------------------------------------------------"""
+def eeg_fast_plot(signals, label, show_fig, file_path=None, freq_acquisition=1000, time_window=None, time=None):
+    if time is None:
+        start, end = (0, signals.shape[1]) if time_window is None else \
+                     np.clip(np.round(np.array(time_window) * freq_acquisition).astype(int), 0, signals.shape[1])
+        time_of = lambda idx: (start + idx) / freq_acquisition
+    else:
+        start, end = (0, signals.shape[1]) if time_window is None else np.searchsorted(time, time_window)
+        time_of = lambda idx: time[start + idx]
+    signals = signals[:, start:end]
+
+    fig, ax = plt.subplots(figsize=(12,8))
+    n_bins  = int(fig.get_figwidth() * fig.dpi)
+    envelopes = [envelope(signals[idx], n_bins) for idx in range(signals.shape[0])]
+
+    # Same y scale for all channels, one channel every half range (like hspace=-0.5 in eeg_plot)
+    bottom  = min(lo.min() for _, lo, _ in envelopes)
+    top     = max(hi.max() for _, _, hi in envelopes)
+    spacing = 0.5 * (top - bottom) if top > bottom else 1
+    offsets = -spacing * np.arange(signals.shape[0])
+
+    lines = []
+    for (idx, lo, hi), offset in zip(envelopes, offsets):
+        x = np.repeat(time_of(idx), 2)
+        y = np.column_stack((lo, hi)).ravel() + offset
+        lines.append(np.column_stack((x, y)))
+    ax.add_collection(LineCollection(lines, linewidths=0.5, colors='C0'))
+
+    ax.set_xlim(time_of(0), time_of(max(signals.shape[1]-1, 0)))
+    ax.set_ylim(offsets[-1] + bottom, top)
+    ax.set_yticks(offsets)
+    ax.set_yticklabels(label)
+    ax.tick_params(left=False)
+    for side in ['top', 'right', 'left']:
+        ax.spines[side].set_visible(False)
+    ax.set_xlabel('Time (sec)')
+
+    # Save file
+    if file_path:
+        if not os.path.exists(Path(file_path).parent):
+            os.makedirs(Path(file_path).parent)
+        plt.savefig(file_path)
+
+    # Display graph on screen
+    if show_fig:
+        plt.show()
+    plt.close()
+
+
+"""--------------------------------------------------------------------------------------------------
+MIN/MAX ENVELOPE OF A SIGNAL
+INPUTS: 
+    - signal : vector of [m] length
+    - n_bins : number of bins (pixels)
+OUTPUTS:
+    - idx : index of the first sample of each bin
+    - lo, hi : min and max of the signal in each bin
+--------------------------------------------------------------------------------------------------"""
+def envelope(signal, n_bins):
+    idx = np.arange(0, len(signal), max(len(signal) // max(n_bins, 1), 1))
+    return idx, np.minimum.reduceat(signal, idx), np.maximum.reduceat(signal, idx)
@@ -0,0 +1,241 @@
+#####################################################################################################
+# LGBIO2050 - TP2 : FFT & WAVELETS
+# R peaks and heart rate of ECG signals : the CWT at one scale (same coefficients as pywt.cwt) is
+# computed by FFT convolution for many records at once, the R peaks of the whole record are detected
+# with adaptive thresholds (signal and noise levels of Pan-Tompkins, search back of missed beats) and
+# the same detection runs block by block on a stream
+#####################################################################################################
+
+import functools
+
+import numpy as np
+import pywt
+from scipy.ndimage import maximum_filter1d
+from scipy.signal import oaconvolve
+
+
+"""--------------------------------------------------------------------------------------------------
+KERNEL OF THE CWT AT ONE SCALE (cached)
+pywt.cwt(x, [scale], wavelet) is -sqrt(scale) * diff(convolve(x, psi_scale)), centered : it is the
+convolution of x with the difference of psi_scale, read `lookahead` samples later.
+INPUTS:
+    - scale : scale of the wavelet
+    - wavelet : name of the continuous wavelet
+    - precision : precision of pywt.integrate_wavelet (12 by default in pywt.cwt)
+OUTPUT:
+    - kernel : taps of the convolution (read-only)
+    - lookahead : number of future samples needed by each coefficient
+--------------------------------------------------------------------------------------------------"""
+@functools.lru_cache(maxsize=32)
+def cwt_kernel(scale=8, wavelet="mexh", precision=12):
+    int_psi, x = pywt.integrate_wavelet(pywt.ContinuousWavelet(wavelet), precision=precision)
+    step = x[1] - x[0]
+    j    = (np.arange(scale * (x[-1] - x[0]) + 1) / (scale * step)).astype(int)
+    psi  = int_psi[j[j < int_psi.size]][::-1]
+    if psi.size <= 2:
+        raise ValueError("scale {} too small".format(scale))
+    kernel = -np.sqrt(scale) * np.diff(np.concatenate(([0], psi, [0])))
+    kernel.flags.writeable = False
+    return kernel, (psi.size - 2) // 2 + 1
+
+
+"""--------------------------------------------------------------------------------------------------
+CWT OF MANY RECORDS AT ONE SCALE
+INPUTS:
+    - signals : vector of [m] length or matrix of [(nb of records) x m] dimensions
+    - scale : scale of the wavelet (8 in TP2)
+    - wavelet : name of the continuous wavelet ('mexh' in TP2)
+OUTPUT:
+    - coefficients, same shape as signals (pywt.cwt(signals, [scale], wavelet)[0][0] for a vector)
+--------------------------------------------------------------------------------------------------"""
+def cwt_response(signals, scale=8, wavelet="mexh"):
+    signals = np.asarray(signals, dtype=np.float64)
+    kernel, lookahead = cwt_kernel(scale, wavelet)
+    full = oaconvolve(signals, kernel.reshape((1,) * (signals.ndim - 1) + (-1,)), axes=-1)
+    return full[..., lookahead:lookahead + signals.shape[-1]]
+
+
+"""--------------------------------------------------------------------------------------------------
+R PEAKS OF ECG RECORDS
+The candidates are the positive maxima of the CWT over +-refractory/2, each one is compared to an
+adaptive threshold (noise level + ratio * (signal level - noise level), both levels following the
+height of the last peaks). A candidate closer than refractory to the last R peak replaces it if it
+is higher, a candidate closer than 360 ms and lower than half the last R peak is a T wave, and when
+no peak was found during 1.66 mean RR the highest candidate above half the threshold is taken back.
+The levels start at the max and the median of |CWT| over the first init seconds.
+INPUTS:
+    - ecg : vector of [m] length or matrix of [(nb of records) x m] dimensions
+    - fs : frequence of acquisition
+    - scale, wavelet : parameters of the CWT
+    - refractory : minimum time between two R peaks (in seconds)
+    - ratio : position of the threshold between the noise and the signal levels
+    - init : duration (in seconds) used to initialize the levels
+OUTPUT:
+    - indexes of the R peaks (a list of vectors for a matrix)
+--------------------------------------------------------------------------------------------------"""
+def detect_r_peaks(ecg, fs, scale=8, wavelet="mexh", refractory=0.25, ratio=0.25, init=2.0):
+    response = cwt_response(ecg, scale, wavelet)
+    if response.ndim == 1:
+        return _detect(response, fs, refractory, ratio, init)
+    return [_detect(record, fs, refractory, ratio, init) for record in response.reshape(-1, response.shape[-1])]
+
+
+"""--------------------------------------------------------------------------------------------------
+RR INTERVALS AND INSTANTANEOUS HEART RATE
+INPUTS:
+    - peaks : indexes of the R peaks
+    - fs : frequence of acquisition
+OUTPUT:
+    - time : time (in seconds) of the end of each RR interval
+    - rr : RR intervals in milliseconds (their std is the one asked in TP2)
+    - heart_rate : instantaneous heart rate in beats per minute
+--------------------------------------------------------------------------------------------------"""
+def heart_rate(peaks, fs):
+    peaks = np.asarray(peaks)
+    rr    = np.diff(peaks) * 1000 / fs
+    return peaks[1:] / fs, rr, 60000 / rr
+
+
+"""--------------------------------------------------------------------------------------------------
+STREAMING R PEAK DETECTION
+Blocks of any size are given to process ; the peaks returned by the successive calls (and by finish at
+the end of the stream) are exactly those of detect_r_peaks on the whole record, none is repeated or
+missed at the limits of the blocks. A peak is returned once no later sample can move it, i.e. about
+refractory + the half length of the wavelet after it.
+INPUTS:
+    - fs : frequence of acquisition
+    - scale, wavelet, refractory, ratio, init : see detect_r_peaks
+--------------------------------------------------------------------------------------------------"""
+class StreamingRPeaks:
+
+    def __init__(self, fs, scale=8, wavelet="mexh", refractory=0.25, ratio=0.25, init=2.0):
+        self.kernel, self.lookahead = cwt_kernel(scale, wavelet)
+        self.detector = _Detector(fs, refractory, ratio, init)
+        self.history  = np.zeros(len(self.kernel) - 1)   # last input samples
+        self.skip     = self.lookahead                   # coefficients before the record, not kept
+        self.response = np.empty(0)                      # CWT from the sample offset
+        self.offset   = 0
+        self.searched = 0                                # candidates searched before this sample
+
+    # Add a block of samples, returns the indexes of the R peaks that are final
+    def process(self, block):
+        return self._search(self._convolve(np.asarray(block, dtype=np.float64).ravel()), final=False)
+
+    # End of the stream, returns the remaining R peaks
+    def finish(self):
+        return self._search(self._convolve(np.zeros(self.lookahead)), final=True)
+
+    # CWT coefficients of the block (delayed by lookahead samples)
+    def _convolve(self, block):
+        extended     = np.concatenate((self.history, block))
+        self.history = extended[len(block):]
+        new  = oaconvolve(extended, self.kernel)[len(self.history):len(extended)]
+        skip = min(self.skip, len(new))
+        self.skip -= skip
+        return new[skip:]
+
+    def _search(self, new, final):
+        self.detector.observe(new, self.offset + len(self.response))
+        response, offset = np.concatenate((self.response, new)), self.offset
+        half = self.detector.half
+        stop = offset + len(response) - (0 if final else half)
+        if stop > self.searched:
+            candidates = offset + _candidates(response, half, left_edge=offset == 0, right_edge=final)
+            candidates = candidates[(candidates >= self.searched) & (candidates < stop)]
+            self.detector.feed(candidates, response[candidates - offset])
+            self.searched = stop
+            start         = max(stop - half, offset)
+            response, offset = response[start - offset:], start
+        self.response, self.offset = response, offset
+        return self.detector.pop(None if final else self.searched)
+
+
+# Positive maxima over +-half samples, the buffer is padded with -inf at the edges of the record
+def _candidates(response, half, left_edge=True, right_edge=True):
+    left   = half if left_edge else 0
+    padded = np.concatenate((np.full(left, -np.inf), response, np.full(half if right_edge else 0, -np.inf)))
+    local  = maximum_filter1d(padded, 2 * half + 1, mode="nearest")[left:left + len(response)]
+    return np.flatnonzero((response == local) & (response > 0))
+
+
+def _detect(response, fs, refractory, ratio, init):
+    detector   = _Detector(fs, refractory, ratio, init)
+    candidates = _candidates(response, detector.half)
+    detector.observe(response, 0)
+    detector.feed(candidates, response[candidates])
+    return detector.pop(None)
+
+
+# Adaptive thresholds of Pan-Tompkins, candidate by candidate (in the order of the record)
+class _Detector:
+
+    def __init__(self, fs, refractory, ratio, init):
+        self.refractory = int(round(refractory * fs))
+        self.t_wave     = int(round(0.36 * fs))
+        self.half       = max(self.refractory // 2, 1)
+        self.ratio      = ratio
+        self.n_init     = int(round(init * fs))
+        self.init_part  = []                             # CWT of the first init seconds
+        self.init_seen  = 0
+        self.waiting    = []                             # candidates seen before the levels are known
+        self.signal_level, self.noise_level = None, None
+        self.peaks, self.heights = [], []
+        self.rr         = None
+        self.missed     = []                             # noise candidates since the last peak
+        self.n_popped   = 0
+
+    # CWT coefficients from the sample start, the first init seconds set the levels
+    def observe(self, response, start):
+        if start >= self.n_init:
+            return
+        part = response[:self.n_init - start]
+        self.init_part.append(part.copy())
+        self.init_seen += len(part)
+
+    def feed(self, indexes, heights):
+        self.waiting.extend(zip(indexes.tolist(), heights.tolist()))
+        if self.signal_level is None and self.init_seen < self.n_init:
+            return
+        if self.signal_level is None:
+            part = np.concatenate(self.init_part + [np.zeros(1)])
+            self.signal_level, self.noise_level, self.init_part = part.max(), np.median(np.abs(part)), []
+        waiting, self.waiting = self.waiting, []
+
+        for index, height in waiting:
+            threshold = self.noise_level + self.ratio * (self.signal_level - self.noise_level)
+            if self.peaks and index - self.peaks[-1] < self.refractory:
+                if height > self.heights[-1]:
+                    self.peaks[-1], self.heights[-1] = index, height
+                continue
+            t_wave = self.peaks and index - self.peaks[-1] < self.t_wave and height < self.heights[-1] / 2
+            if height < threshold or t_wave:
+                self.noise_level = 0.125 * height + 0.875 * self.noise_level
+                self.missed.append((height, index))
+                continue
+            if self.rr is not None and index - self.peaks[-1] > 1.66 * self.rr:
+                back = [(h, i) for h, i in self.missed if h >= threshold / 2 and index - i >= self.refractory]
+                if back:
+                    h, i = max(back)
+                    self._add(i, h)
+                    self.signal_level = 0.25 * h + 0.75 * self.signal_level
+            self._add(index, height)
+            self.signal_level = 0.125 * height + 0.875 * self.signal_level
+            self.missed       = []
+
+    def _add(self, index, height):
+        if self.peaks:
+            interval = index - self.peaks[-1]
+            self.rr  = interval if self.rr is None else 0.125 * interval + 0.875 * self.rr
+        self.peaks.append(index)
+        self.heights.append(height)
+
+    # Peaks not returned yet that no candidate after `searched` can change (all of them if None)
+    def pop(self, searched):
+        if searched is None:
+            self.init_seen = max(self.init_seen, self.n_init)
+            self.feed(np.empty(0, dtype=int), np.empty(0))
+            end = len(self.peaks)
+        else:
+            end = int(np.searchsorted(self.peaks, searched - self.refractory, side="right"))
+        peaks, self.n_popped = self.peaks[self.n_popped:end], max(end, self.n_popped)
+        return np.array(peaks, dtype=int)
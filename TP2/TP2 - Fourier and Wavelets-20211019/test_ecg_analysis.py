@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+pywt = pytest.importorskip("pywt")
+
+from ecg_analysis import StreamingRPeaks, cwt_kernel, cwt_response, detect_r_peaks, heart_rate
+
+FS = 360
+
+
+# R waves (narrow), T waves (wide, 250 ms later) and noise, RR around 60 / bpm seconds
+def _synthetic_ecg(bpm=72, seconds=30, seed=0):
+    rng   = np.random.default_rng(seed)
+    rr    = 60 / bpm * (1 + 0.03 * rng.standard_normal(int(seconds * bpm / 60) + 2))
+    beats = np.round(np.cumsum(np.r_[0.5, rr]) * FS).astype(int)
+    beats = beats[beats < seconds * FS - FS // 2]
+    time  = np.arange(seconds * FS)
+    ecg   = 0.05 * rng.standard_normal(len(time))
+    for beat in beats:
+        ecg += np.exp(-0.5 * ((time - beat) / (0.008 * FS)) ** 2)
+        ecg += 0.3 * np.exp(-0.5 * ((time - beat - 0.25 * FS) / (0.04 * FS)) ** 2)
+    return ecg, beats
+
+
+def test_cwt_response_matches_pywt():
+    signals = np.random.default_rng(1).standard_normal((3, 2000))
+    for scale in (3, 8, 20):
+        reference = np.array([pywt.cwt(x, [scale], "mexh")[0][0] for x in signals])
+        np.testing.assert_allclose(cwt_response(signals, scale), reference, atol=1e-12)
+        np.testing.assert_allclose(cwt_response(signals[0], scale), reference[0], atol=1e-12)
+    assert not cwt_kernel(8)[0].flags.writeable
+
+
+def test_r_peaks_and_heart_rate():
+    ecg, beats = _synthetic_ecg()
+    peaks      = detect_r_peaks(ecg, FS)
+    assert len(peaks) == len(beats)
+    assert np.abs(peaks - beats).max() <= 2
+    _, rr, bpm = heart_rate(peaks, FS)
+    np.testing.assert_allclose(rr, np.diff(beats) * 1000 / FS, atol=2 * 2000 / FS)
+    assert abs(np.mean(bpm) - 72) < 2
+    records = detect_r_peaks(np.stack((ecg, _synthetic_ecg(60, seed=1)[0])), FS)
+    np.testing.assert_array_equal(records[0], peaks)
+
+
+# Blocks of random sizes give the peaks of the whole record, each one once
+def test_streaming_matches_offline():
+    rng = np.random.default_rng(2)
+    for seed in range(3):
+        ecg, _   = _synthetic_ecg(60 + 20 * seed, seed=seed)
+        stream   = StreamingRPeaks(FS)
+        found    = []
+        position = 0
+        while position < len(ecg):
+            size = int(rng.integers(1, 400))
+            found.append(stream.process(ecg[position:position + size]))
+            position += size
+        found.append(stream.finish())
+        np.testing.assert_array_equal(np.concatenate(found), detect_r_peaks(ecg, FS))
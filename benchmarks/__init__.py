@@ -0,0 +1,20 @@
+#####################################################################################################
+# LGBIO2020 - Benchmarks
+# Benchmark of the signal processing and learning stages of the TPs and of the project, on synthetic
+# data of the same size : python -m benchmarks --help
+#####################################################################################################
+
+import os
+import sys
+
+# The stages import the modules of the project by their name (like the notebooks in Projects), the
+# folder is put on sys.path before any module of the package is imported
+_PROJECTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Projects")
+if _PROJECTS not in sys.path:
+    sys.path.insert(0, _PROJECTS)
+
+from .runner import compare, load_results, print_comparison, run_benchmark, save_results
+from .stages import SIZES, STAGES, make_data
+
+__all__ = ["compare", "load_results", "print_comparison", "run_benchmark", "save_results", "SIZES", "STAGES",
+           "make_data"]
@@ -0,0 +1,50 @@
+#####################################################################################################
+# LGBIO2020 - Benchmarks
+# Command line :
+#   python -m benchmarks                                   quick mode, results in benchmarks/results
+#   python -m benchmarks --full --baseline base.json       full mode, compared with a baseline
+#   python -m benchmarks --save-baseline base.json         results saved as the new baseline
+# The exit code is 1 when a stage is slower than the baseline.
+#####################################################################################################
+
+import argparse
+import os
+import sys
+import time
+
+from .runner import compare, load_results, print_comparison, run_benchmark, save_results
+from .stages import STAGES
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark of the LGBIO2020 stages")
+    parser.add_argument("--full", action="store_true", help="data of the size of the course (default : quick)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="stages to run (default : all)")
+    parser.add_argument("--repeat", type=int, help="timed runs per stage (default : 5 quick, 3 full)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file of the results (default : benchmarks/results/<mode>_<date>.json)")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare with")
+    parser.add_argument("--save-baseline", help="also save the results as this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default : 0.2)")
+    args = parser.parse_args(argv)
+
+    mode    = "full" if args.full else "quick"
+    results = run_benchmark(mode, args.stages, args.repeat, args.seed)
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                         "{}_{}.json".format(mode, time.strftime("%Y%m%d_%H%M%S")))
+    save_results(results, output)
+    print("results saved in {}".format(output))
+    if args.save_baseline:
+        save_results(results, args.save_baseline)
+
+    if args.baseline:
+        comparison = compare(results, load_results(args.baseline), args.tolerance)
+        print_comparison(comparison)
+        if any(row["regression"] for row in comparison):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#####################################################################################################
+# LGBIO2020 - Benchmarks
+# Timing and memory of the stages, results as JSON and comparison with a saved baseline
+#####################################################################################################
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from profiling import max_rss_mb                     # Projects is on sys.path (see __init__.py)
+
+from .stages import STAGES, SIZES, make_data
+
+
+"""--------------------------------------------------------------------------------------------------
+RUN THE BENCHMARK
+Each stage is run once under tracemalloc (peak of the memory allocated by the stage, numpy arrays
+included), then `repeat` times for the timing (wall and CPU time).
+INPUTS:
+    - mode : "quick" or "full"
+    - stages : names of the stages to run (all the stages of STAGES if None)
+    - repeat : number of timed runs of each stage
+    - seed : seed of the synthetic data
+    - verbose : True to print each stage when it is done
+OUTPUT:
+    - dictionary with the mode, the environment and, for each stage, its times in seconds (min,
+      median, all runs), its peak memory in MB and the size of the arrays it reads
+--------------------------------------------------------------------------------------------------"""
+def run_benchmark(mode="quick", stages=None, repeat=None, seed=0, verbose=True):
+    stages = list(STAGES) if stages is None else list(stages)
+    for name in stages:
+        if name not in STAGES:
+            raise KeyError("unknown stage {} (stages : {})".format(name, ", ".join(STAGES)))
+    repeat = (5 if mode == "quick" else 3) if repeat is None else repeat
+
+    start = time.perf_counter()
+    data  = make_data(mode, seed)
+    results = {"mode": mode, "sizes": SIZES[mode], "seed": seed, "repeat": repeat,
+               "date": time.strftime("%Y-%m-%d %H:%M:%S"), "environment": environment(),
+               "data_time": time.perf_counter() - start, "stages": {}}
+
+    for name in stages:
+        stage, inputs = STAGES[name]
+
+        tracemalloc.start()
+        stage(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        wall, cpu = [], []
+        for _ in range(repeat):
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            stage(data)
+            wall.append(time.perf_counter() - wall_start)
+            cpu.append(time.process_time() - cpu_start)
+
+        results["stages"][name] = {"min": min(wall), "median": float(np.median(wall)), "runs": wall,
+                                   "cpu_median": float(np.median(cpu)), "peak_mb": peak / 2 ** 20,
+                                   "input_mb": sum(np.asarray(data[key]).nbytes for key in inputs) / 2 ** 20}
+        if verbose:
+            print("{:16s} {:9.4f} s  {:9.1f} MB".format(name, results["stages"][name]["median"],
+                                                       results["stages"][name]["peak_mb"]))
+
+    results["max_rss_mb"] = max_rss_mb()
+    return results
+
+
+"""--------------------------------------------------------------------------------------------------
+COMPARISON WITH A BASELINE
+A stage is a regression when its median time is more than (1 + tolerance) times the one of the
+baseline, or when its peak memory is more than (1 + tolerance) times and 1 MB above the baseline.
+INPUTS:
+    - results : output of run_benchmark
+    - baseline : output of run_benchmark saved before (see load_results)
+    - tolerance : allowed relative slowdown
+OUTPUT:
+    - list of dictionaries (one per stage of both results) with the stage, the baseline and current
+      medians, their ratio, the ratio of the peak memory and regression (True or False)
+--------------------------------------------------------------------------------------------------"""
+def compare(results, baseline, tolerance=0.2):
+    if results["mode"] != baseline["mode"]:
+        raise ValueError("cannot compare a {} benchmark with a {} baseline".format(results["mode"], baseline["mode"]))
+    comparison = []
+    for name, stage in results["stages"].items():
+        if name not in baseline["stages"]:
+            continue
+        base = baseline["stages"][name]
+        ratio        = stage["median"] / base["median"] if base["median"] > 0 else np.inf
+        memory_ratio = stage["peak_mb"] / base["peak_mb"] if base["peak_mb"] > 0 else 1.0
+        comparison.append({"stage": name, "baseline": base["median"], "current": stage["median"],
+                           "ratio": ratio, "memory_ratio": memory_ratio,
+                           "regression": ratio > 1 + tolerance or
+                                         (memory_ratio > 1 + tolerance and stage["peak_mb"] - base["peak_mb"] > 1)})
+    return comparison
+
+
+def print_comparison(comparison):
+    print("{:16s} {:>10s} {:>10s} {:>7s} {:>7s}".format("stage", "baseline", "current", "time", "memory"))
+    for row in comparison:
+        print("{:16s} {:10.4f} {:10.4f} {:6.2f}x {:6.2f}x{}".format(
+            row["stage"], row["baseline"], row["current"], row["ratio"], row["memory_ratio"],
+            "  SLOWER" if row["regression"] else ""))
+
+
+def save_results(results, path):
+    if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# Versions and machine, to know if two results can be compared
+def environment():
+    import scipy
+    import sklearn
+    try:
+        import pywt
+    except ImportError:
+        pywt = None
+    return {"python": sys.version.split()[0], "numpy": np.__version__, "scipy": scipy.__version__,
+            "sklearn": sklearn.__version__, "pywt": pywt.__version__ if pywt else None,
+            "platform": platform.platform(),
+            "processor": platform.processor(), "cpu_count": os.cpu_count()}
@@ -0,0 +1,142 @@
+#####################################################################################################
+# LGBIO2020 - Benchmarks
+# Stages of the benchmark : the operations of the notebooks (FFT of the recording, db4 level-7 wavelet
+# filtering, segmentation, band powers, CWT of TP2, FastICA of TP1, K-fold of TP3 and the project) and
+# the synthetic data they run on
+#####################################################################################################
+
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.decomposition import FastICA
+from sklearn.neural_network import MLPClassifier
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from evaluation import Kfold_function
+from features import band_power_features
+from segmentation import nan_mask, segment_starts
+
+from .synthetic import synthetic_ecg, synthetic_eeg, synthetic_foetal_mixture, synthetic_nerve
+
+# pywt (and wavelet_filter) is only imported by the stages that use it, so the stages can be listed
+# and the other ones run without PyWavelets. The first run of a stage is not timed (see run_benchmark).
+
+# Size of the data of each mode : "full" has the size of the data of the course
+SIZES = {
+    "quick": {"eeg_channels": 32, "eeg_samples": 65536, "ecg_duration": 120, "nerve_samples": 16384,
+              "mixture_samples": 2500, "kfold_windows": 400},
+    "full":  {"eeg_channels": 32, "eeg_samples": 655456, "ecg_duration": 1800, "nerve_samples": 81920,
+              "mixture_samples": 2500, "kfold_windows": 2483},
+}
+
+
+"""--------------------------------------------------------------------------------------------------
+DATA OF THE BENCHMARK
+INPUTS:
+    - mode : "quick" or "full" (see SIZES)
+    - seed : seed of the random generators
+OUTPUT:
+    - dictionary of the synthetic signals and of a feature matrix for the K-fold stages
+--------------------------------------------------------------------------------------------------"""
+def make_data(mode="quick", seed=0):
+    if mode not in SIZES:
+        raise ValueError("mode must be one of {}, not {}".format(list(SIZES), mode))
+    size = SIZES[mode]
+
+    eeg, target = synthetic_eeg(size["eeg_channels"], size["eeg_samples"], seed=seed)
+    data = {"eeg": eeg, "target": target, "fs": 1000,
+            "ecg_a": synthetic_ecg(size["ecg_duration"], 360, seed=seed),
+            "ecg_n": synthetic_ecg(size["ecg_duration"], 500, seed=seed + 1),
+            "nerve": synthetic_nerve(size["nerve_samples"], seed=seed),
+            "mixture": synthetic_foetal_mixture(n_samples=size["mixture_samples"], seed=seed)}
+
+    valid = nan_mask(target)
+    data["valid_target"] = target[valid]
+    data["deleted"]      = np.compress(valid, eeg, axis=1)
+    data["starts"]       = segment_starts(data["valid_target"])
+
+    # Features of the K-fold stages : band powers of segments (repeated if the recording is short)
+    starts = np.resize(data["starts"], size["kfold_windows"])
+    data["X"] = band_power_features(data["deleted"], data["fs"], starts=starts)
+    data["y"] = data["valid_target"][starts]
+    return data
+
+
+def fft_recording(data):
+    for channel in data["eeg"]:
+        np.fft.fftshift(np.fft.fft(channel))
+
+
+def wavedec_waverec(data):
+    import pywt
+    # Loop of the notebook : A7, D4, D3, D2, D1 set to zero
+    for channel in data["eeg"]:
+        coeffs = pywt.wavedec(channel, "db4", level=7)
+        for i in (0, 4, 5, 6, 7):
+            coeffs[i] = np.zeros_like(coeffs[i])
+        pywt.waverec(coeffs, "db4")
+
+
+def wavelet_filter(data):
+    from wavelet_filter import WaveletBandFilter
+    WaveletBandFilter("db4", 7, ("D7", "D6", "D5")).filter(data["eeg"])
+
+
+def segmentation(data):
+    segment_starts(data["valid_target"], 500, 100, 1500)
+
+
+def band_power(data):
+    band_power_features(data["deleted"], data["fs"], 500, starts=data["starts"])
+
+
+def cwt_mexh_ecg_a(data):
+    import pywt
+    pywt.cwt(data["ecg_a"], [8], "mexh")
+
+
+def cwt_mexh_ecg_n(data):
+    import pywt
+    pywt.cwt(data["ecg_n"], [8], "mexh")
+
+
+def nerve_dwt(data):
+    import pywt
+    coeffs    = pywt.wavedec(data["nerve"], "haar", level=6)
+    coeffs[0] = np.zeros(len(coeffs[0]))
+    pywt.waverec(coeffs, "haar")
+
+
+def fastica(data):
+    FastICA(n_components=6, random_state=0, max_iter=200).fit_transform(data["mixture"].T)
+
+
+def kfold_tree(data):
+    Kfold_function(DecisionTreeClassifier(max_depth=5, random_state=0), data["X"], data["y"], 10)
+
+
+def kfold_svc(data):
+    Kfold_function(SVC(gamma="auto"), data["X"], data["y"], 10, preprocessing=[("scaler", {})])
+
+
+def kfold_mlp(data):
+    Kfold_function(MLPClassifier(random_state=1, max_iter=300), data["X"], data["y"], 10,
+                   preprocessing=[("scaler", {})])
+
+
+# Stages in the order of the pipeline, with the names of the arrays they read
+STAGES = OrderedDict([
+    ("fft_recording",   (fft_recording, ["eeg"])),
+    ("wavedec_waverec", (wavedec_waverec, ["eeg"])),
+    ("wavelet_filter",  (wavelet_filter, ["eeg"])),
+    ("segmentation",    (segmentation, ["valid_target"])),
+    ("band_power",      (band_power, ["deleted"])),
+    ("cwt_mexh_ecg_a",  (cwt_mexh_ecg_a, ["ecg_a"])),
+    ("cwt_mexh_ecg_n",  (cwt_mexh_ecg_n, ["ecg_n"])),
+    ("nerve_dwt",       (nerve_dwt, ["nerve"])),
+    ("fastica",         (fastica, ["mixture"])),
+    ("kfold_tree",      (kfold_tree, ["X"])),
+    ("kfold_svc",       (kfold_svc, ["X"])),
+    ("kfold_mlp",       (kfold_mlp, ["X"])),
+])
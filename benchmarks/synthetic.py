@@ -0,0 +1,115 @@
+#####################################################################################################
+# LGBIO2020 - Benchmarks
+# Synthetic signals with the size and the sampling of the data of the course : EEG of the project
+# (32 channels at 1 kHz with a 0/1 target and NaN gaps), ECG of TP2 (360 and 500 Hz), nerve activity
+# of TP2 (16384 Hz) and mixed maternal/foetal ECG of TP1
+#####################################################################################################
+
+import numpy as np
+from scipy.signal import lfilter
+
+
+"""--------------------------------------------------------------------------------------------------
+SYNTHETIC EEG WITH A TARGET
+Pink-like background noise with alpha (10 Hz) and beta (20 Hz) rhythms whose amplitude depends on the
+target. The target alternates between 0 and 1 by blocks of 2 to 20 s, with NaN gaps like target.csv.
+INPUTS:
+    - n_channels : number of channels
+    - n_samples : number of samples (655456 for the recording of the project)
+    - fs : frequence of acquisition
+    - nan_ratio : fraction of the samples where the target is NaN
+    - seed : seed of the random generator
+OUTPUTS:
+    - signals : matrix of [n_channels x n_samples] dimensions
+    - target : vector of [n_samples] length
+--------------------------------------------------------------------------------------------------"""
+def synthetic_eeg(n_channels=32, n_samples=655456, fs=1000, nan_ratio=0.044, seed=0):
+    rng = np.random.default_rng(seed)
+
+    lengths = rng.integers(2 * fs, 20 * fs, n_samples // (2 * fs) + 1)
+    labels  = np.arange(len(lengths)) % 2
+    target  = np.repeat(labels, lengths)[:n_samples].astype(np.float64)
+    n_gaps  = max(int(nan_ratio * n_samples) // fs, 1)
+    for start in rng.integers(0, n_samples - fs, n_gaps):
+        target[start:start + fs] = np.nan
+
+    time    = np.arange(n_samples) / fs
+    gain    = np.where(target == 1, 2.0, 1.0)
+    signals = lfilter([1], [1, -0.95], rng.standard_normal((n_channels, n_samples)), axis=1)
+    phases  = rng.uniform(0, 2 * np.pi, (n_channels, 2, 1))
+    signals += gain * 3 * np.sin(2 * np.pi * 10 * time + phases[:, 0])
+    signals += (3 - gain) * 2 * np.sin(2 * np.pi * 20 * time + phases[:, 1])
+    return signals, target
+
+
+"""--------------------------------------------------------------------------------------------------
+SYNTHETIC ECG
+P, QRS and T waves (gaussians) at each beat, heart rate variability, baseline drift and 50 Hz noise.
+INPUTS:
+    - duration : duration in seconds
+    - fs : frequence of acquisition (360 for ecgA, 500 for ecgN)
+    - heart_rate : mean heart rate in beats per minute
+    - seed : seed of the random generator
+OUTPUT:
+    - ecg : vector of [duration * fs] length
+--------------------------------------------------------------------------------------------------"""
+def synthetic_ecg(duration=1800, fs=360, heart_rate=70, seed=0):
+    rng       = np.random.default_rng(seed)
+    n_samples = int(duration * fs)
+    intervals = 60 / heart_rate * (1 + 0.05 * rng.standard_normal(int(duration * heart_rate / 60) + 2))
+    beats     = np.round(np.cumsum(intervals) * fs).astype(int)
+    beats     = beats[beats < n_samples]
+
+    # One beat centered on its R peak, from -0.3 s to +0.5 s
+    t     = np.arange(-int(0.3 * fs), int(0.5 * fs)) / fs
+    waves = [(0.15, -0.20, 0.025), (-0.1, -0.03, 0.008), (1.0, 0.0, 0.010), (-0.25, 0.03, 0.008), (0.3, 0.25, 0.040)]
+    beat  = sum(a * np.exp(-(t - mu) ** 2 / (2 * sigma ** 2)) for a, mu, sigma in waves)
+
+    train = np.zeros(n_samples + len(t))
+    train[beats] = 1 + 0.1 * rng.standard_normal(len(beats))
+    ecg   = np.convolve(train, beat)[int(0.3 * fs):int(0.3 * fs) + n_samples]
+
+    time  = np.arange(n_samples) / fs
+    ecg  += 0.3 * np.sin(2 * np.pi * 0.3 * time) + 0.05 * np.sin(2 * np.pi * 50 * time)
+    return ecg + 0.02 * rng.standard_normal(n_samples)
+
+
+"""--------------------------------------------------------------------------------------------------
+SYNTHETIC NERVE ACTIVITY (NERVE_nrv.csv)
+Biphasic spikes on a drifting baseline around 3e4, with noise.
+INPUTS:
+    - n_samples : number of samples (81920 in the file of TP2)
+    - fs : frequence of acquisition
+    - rate : mean number of spikes per second
+    - seed : seed of the random generator
+OUTPUT:
+    - nerve : vector of [n_samples] length
+--------------------------------------------------------------------------------------------------"""
+def synthetic_nerve(n_samples=81920, fs=16384, rate=40, seed=0):
+    rng    = np.random.default_rng(seed)
+    time   = np.arange(n_samples) / fs
+    spikes = np.zeros(n_samples)
+    spikes[rng.integers(0, n_samples, int(rate * n_samples / fs))] = rng.uniform(20, 60, int(rate * n_samples / fs))
+    t      = np.arange(-16, 32) / fs
+    shape  = np.exp(-(t / 2e-4) ** 2) - 0.5 * np.exp(-((t - 6e-4) / 4e-4) ** 2)
+    nerve  = np.convolve(spikes, shape, mode="same")
+    return 2.997e4 + 2 * np.sin(2 * np.pi * 0.5 * time) + nerve + rng.standard_normal(n_samples)
+
+
+"""--------------------------------------------------------------------------------------------------
+SYNTHETIC MIXTURE OF MATERNAL AND FOETAL ECG (foetal_ecg.csv of TP1)
+INPUTS:
+    - n_channels : number of electrodes
+    - n_samples : number of samples
+    - fs : frequence of acquisition
+    - seed : seed of the random generator
+OUTPUT:
+    - matrix of [n_channels x n_samples] dimensions
+--------------------------------------------------------------------------------------------------"""
+def synthetic_foetal_mixture(n_channels=8, n_samples=2500, fs=250, seed=0):
+    rng     = np.random.default_rng(seed)
+    sources = np.array([synthetic_ecg(n_samples / fs, fs, 75, seed),
+                        0.3 * synthetic_ecg(n_samples / fs, fs, 140, seed + 1),
+                        rng.uniform(-1, 1, n_samples)])[:, :n_samples]
+    mixing  = rng.standard_normal((n_channels, len(sources)))
+    return mixing @ sources + 0.01 * rng.standard_normal((n_channels, n_samples))